@@ -2,10 +2,12 @@
 Metrics API Endpoints
 Provides aggregated metrics and analytics
 """
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query, status
 from pydantic import BaseModel
-from typing import List, Optional
-from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+from asgiref.sync import sync_to_async
+from app.core.orm import setup_django
 
 router = APIRouter()
 
@@ -13,10 +15,11 @@ router = APIRouter()
 class MetricSummary(BaseModel):
     """Metric summary model"""
     metric_name: str
-    avg_value: float
-    min_value: float
-    max_value: float
+    avg_value: Optional[float] = None
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
     data_points: int
+    group: Dict[str, Optional[str]] = {}
 
 
 class DashboardMetrics(BaseModel):
@@ -45,18 +48,64 @@ async def get_dashboard_metrics():
 
 @router.get("/summary")
 async def get_metrics_summary(
-    time_range: int = Query(default=24, description="Time range in hours"),
+    time_range: int = Query(default=24, ge=1, description="Time range in hours"),
     group_by: Optional[str] = Query(default=None, description="Group by field")
 ):
     """
     Get metrics summary for specified time range
+    
+    One row per metric, split further by ``group_by`` (``source`` or tag
+    keys, comma-separated). Computed by the same bucketed aggregation engine
+    as the Django ``metrics/buckets`` endpoint, over a single bucket that
+    starts on a whole minute, hour or day (the finest rollup tier still
+    retained that far back) so it is answered from rollups.
     """
-    # TODO: Implement summary calculation
+    setup_django()
+    from apps.metrics.aggregation import bucketed_aggregates, parse_group_by
+    from apps.monitoring.services.rollups import TIERS, floor_time, is_retained
+    
+    try:
+        keys = parse_group_by(group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if "metric_name" in keys:
+        keys.remove("metric_name")
+    
+    end_time = datetime.now(timezone.utc)
+    resolution = next(
+        (tier for tier in TIERS if is_retained(tier, floor_time(end_time - timedelta(hours=time_range), tier), end_time)),
+        TIERS[-1]
+    )
+    start_time = floor_time(end_time - timedelta(hours=time_range), resolution)
+    step = -(-int((end_time - start_time).total_seconds()) // resolution) * resolution
+    
+    result = await sync_to_async(bucketed_aggregates)(
+        start_time,
+        end_time,
+        step,
+        aggs=["avg", "min", "max", "count"],
+        group_by=["metric_name"] + keys,
+        origin=start_time
+    )
+    
+    metrics = []
+    for group in result["groups"]:
+        values = {agg: series[0] for agg, series in group["values"].items()}
+        metrics.append(MetricSummary(
+            metric_name=group["group"]["metric_name"],
+            avg_value=values["avg"],
+            min_value=values["min"],
+            max_value=values["max"],
+            data_points=values["count"] or 0,
+            group={key: group["group"][key] for key in keys}
+        ))
+    
     return {
         "time_range_hours": time_range,
-        "start_time": (datetime.now() - timedelta(hours=time_range)).isoformat(),
-        "end_time": datetime.now().isoformat(),
-        "metrics": []
+        "group_by": keys,
+        "start_time": start_time.isoformat(),
+        "end_time": end_time.isoformat(),
+        "metrics": metrics
     }
 
 
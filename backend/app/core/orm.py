@@ -0,0 +1,16 @@
+"""
+Django ORM Access
+Lets FastAPI routes reuse the query engines of the Django apps
+"""
+import os
+
+
+def setup_django():
+    """Configure Django once so its models and services can be imported"""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "quantum.settings")
+
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
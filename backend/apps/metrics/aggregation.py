@@ -0,0 +1,277 @@
+"""
+Time-bucketed GROUP BY aggregation.
+
+Points are grouped into ``step``-second buckets aligned to ``origin`` (the
+Unix epoch by default) and by any of the series' source, metric name or tag
+values, with the bucketing done in SQL by ``date_bin``. When every bucket is
+a whole number of rollup buckets the rollups are read instead of raw rows.
+Raw reads add the points compacted into chunks, bucketed with NumPy and
+combined with the SQL results per group and bucket.
+Results come back as parallel arrays aligned to one shared list of bucket
+timestamps, with None for empty buckets.
+"""
+
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db import connection
+from django.db.models import Avg, Count, DateTimeField, F, FloatField, Func, Max, Min, Q, Sum
+from django.db.models.fields.json import KeyTextTransform
+from django.utils import timezone
+
+from apps.monitoring.models import MonitoringData, MonitoringRollup, MonitoringSeries
+from apps.monitoring.services.chunks import MICROSECONDS, chunk_points, from_micros, to_micros
+from apps.monitoring.services.rollups import TIERS, is_retained
+
+AGGREGATES = ('avg', 'min', 'max', 'sum', 'count', 'last')
+SERIES_FIELDS = ('source', 'metric_name')
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class DateBin(Func):
+    """
+    ``date_bin``: the start of the ``step``-second bin containing the
+    expression, with bins aligned to ``origin``.
+    """
+    output_field = DateTimeField()
+
+    def __init__(self, expression, step, origin=EPOCH):
+        super().__init__(expression)
+        self.step = int(step)
+        self.origin = origin
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        return f'date_bin(%s::interval, {sql}, %s)', [f'{self.step} seconds', *params, self.origin]
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        origin = int(self.origin.timestamp())
+        return (
+            f"datetime(%s + ((CAST(strftime('%%s', {sql}) AS INTEGER) - %s) / %s) * %s, 'unixepoch')",
+            [origin, *params, origin, self.step, self.step]
+        )
+
+
+def _last(field, ordering):
+    # Value of the row with the latest ``ordering`` in the group
+    return Func(
+        ArrayAgg(field, ordering=f'-{ordering}'),
+        template='(%(expressions)s)[1]',
+        output_field=FloatField()
+    )
+
+
+def parse_group_by(value):
+    """
+    Parse ``group_by`` (e.g. ``source,region``) into a list of keys. Anything
+    other than ``source`` or ``metric_name`` is a tag key.
+    """
+    keys = [key.strip() for key in str(value or '').split(',') if key.strip()]
+    if len(set(keys)) != len(keys):
+        raise ValueError('group_by keys must be unique')
+    return keys
+
+
+def parse_aggregates(value):
+    aggs = [agg.strip().lower() for agg in str(value or 'avg').split(',') if agg.strip()]
+    unknown = [agg for agg in aggs if agg not in AGGREGATES]
+    if unknown or not aggs:
+        raise ValueError(f"agg must be a list of: {', '.join(AGGREGATES)}")
+    return list(dict.fromkeys(aggs))
+
+
+def _group_expressions(group_by, prefix):
+    expressions = {}
+    for index, key in enumerate(group_by):
+        if key in SERIES_FIELDS:
+            expressions[f'group_{index}'] = F(f'{prefix}{key}')
+        else:
+            expressions[f'group_{index}'] = KeyTextTransform(key, f'{prefix}tags')
+    return expressions
+
+
+def _group_key(series, group_by):
+    # The tag value as KeyTextTransform reads it: ``->>`` gives text on
+    # PostgreSQL, JSON_EXTRACT the scalar itself elsewhere
+    key = []
+    for name in group_by:
+        if name in SERIES_FIELDS:
+            key.append(series[name])
+            continue
+        value = (series['tags'] or {}).get(name)
+        if connection.vendor == 'postgresql' and value is not None and not isinstance(value, str):
+            value = json.dumps(value)
+        key.append(value)
+    return tuple(key)
+
+
+def _compacted_slots(condition, start, end, step, group_by):
+    """
+    Return ``{(group key, bucket index): stats}`` for the points in
+    ``[start, end)`` compacted into chunks, where ``stats`` holds their
+    count/sum/min/max and the value and time of the latest one.
+    """
+    series_ids, micros, values = chunk_points(start, end, condition)
+    if not len(micros):
+        return {}
+
+    distinct, series_index = np.unique(series_ids, return_inverse=True)
+    catalog = {
+        series['id']: _group_key(series, group_by)
+        for series in MonitoringSeries.objects.filter(id__in=distinct.tolist()).values(
+            'id', 'source', 'metric_name', 'tags'
+        )
+    }
+    keys = list(dict.fromkeys(catalog.values()))
+    positions = {key: position for position, key in enumerate(keys)}
+    key_index = np.array([positions[catalog[series_id]] for series_id in distinct.tolist()])[series_index]
+    slots = (micros - to_micros(start)) // (step * MICROSECONDS)
+
+    order = np.lexsort((micros, slots, key_index))
+    key_index, slots, micros, values = key_index[order], slots[order], micros[order], values[order]
+    first = np.flatnonzero(np.r_[True, (np.diff(key_index) != 0) | (np.diff(slots) != 0)])
+    last = np.r_[first[1:], len(values)] - 1
+    return {
+        (keys[key], slot): {
+            'count': count, 'sum': total, 'min': low, 'max': high,
+            'last': latest, 'last_at': from_micros(latest_at),
+        }
+        for key, slot, count, total, low, high, latest, latest_at in zip(
+            key_index[first].tolist(), slots[first].tolist(), (last - first + 1).tolist(),
+            np.add.reduceat(values, first).tolist(), np.minimum.reduceat(values, first).tolist(),
+            np.maximum.reduceat(values, first).tolist(), values[last].tolist(), micros[last].tolist()
+        )
+    }
+
+
+def _combine(row, stats):
+    """
+    Add the compacted ``stats`` of a bucket to its raw aggregates in ``row``.
+    """
+    row['agg_count'] += stats['count']
+    row['agg_sum'] += stats['sum']
+    if 'agg_min' in row:
+        row['agg_min'] = min(row['agg_min'], stats['min'])
+    if 'agg_max' in row:
+        row['agg_max'] = max(row['agg_max'], stats['max'])
+    if 'agg_last' in row and stats['last_at'] > row['agg_last_at']:
+        row['agg_last'] = stats['last']
+
+
+def choose_tier(start, step, origin, aggs):
+    """
+    Return the coarsest rollup resolution that tiles every bucket exactly and
+    is retained back to ``start``, or None when raw rows must be read.
+    """
+    if 'last' in aggs:
+        return None
+    offset = int(origin.timestamp())
+    now = timezone.now()
+    eligible = [
+        resolution for resolution in TIERS
+        if not step % resolution and not offset % resolution and is_retained(resolution, start, now)
+    ]
+    return max(eligible) if eligible else None
+
+
+def bucketed_aggregates(start, end, step, aggs=('avg',), group_by=(), metric_names=None, source=None, origin=EPOCH):
+    """
+    Aggregate the points in ``[start, end)`` into ``step``-second buckets.
+
+    ``start`` is aligned down to a bucket boundary. ``metric_names`` and
+    ``source`` narrow the series read (all series when None).
+
+    Returns ``{'resolution', 'timestamps', 'groups'}`` where each group is
+    ``{'group': {key: value}, 'values': {agg: [...]}}`` with one value per
+    timestamp.
+    """
+    step = int(step)
+    if step < 1:
+        raise ValueError('step must be at least one second')
+    if 'last' in aggs and connection.vendor != 'postgresql':
+        raise ValueError('agg=last requires PostgreSQL')
+
+    start = origin + ((start - origin) // timedelta(seconds=step)) * timedelta(seconds=step)
+    n_buckets = -(-int((end - start).total_seconds()) // step)
+    if n_buckets > settings.METRICS_MAX_BUCKETS:
+        raise ValueError(
+            f'{n_buckets} buckets requested; at most {settings.METRICS_MAX_BUCKETS} are allowed'
+        )
+
+    condition = Q()
+    if metric_names is not None:
+        condition &= Q(series__metric_name__in=metric_names)
+    if source:
+        condition &= Q(series__source=source)
+
+    resolution = choose_tier(start, step, origin, aggs)
+    groups = _group_expressions(group_by, 'series__')
+    compacted = {}
+    if resolution is None:
+        compacted = _compacted_slots(condition, start, end, step, group_by)
+        queryset = MonitoringData.objects.filter(
+            condition, timestamp__gte=start, timestamp__lt=end
+        ).annotate(slot=DateBin('timestamp', step, origin))
+        expressions = {
+            'avg': Avg('metric_value'),
+            'min': Min('metric_value'),
+            'max': Max('metric_value'),
+            'sum': Sum('metric_value'),
+            'count': Count('id'),
+            'last': _last('metric_value', 'timestamp'),
+        }
+        needed = {f'agg_{agg}': expressions[agg] for agg in aggs}
+        if compacted:
+            # Partial aggregates that compacted points can be added to
+            needed.update(agg_sum=expressions['sum'], agg_count=expressions['count'])
+            if 'last' in aggs:
+                needed['agg_last_at'] = Max('timestamp')
+    else:
+        queryset = MonitoringRollup.objects.filter(
+            condition, resolution=resolution, bucket__gte=start, bucket__lt=end
+        ).annotate(slot=DateBin('bucket', step, origin))
+        needed = {'agg_sum': Sum('sum'), 'agg_count': Sum('count')}
+        if 'min' in aggs:
+            needed['agg_min'] = Min('min')
+        if 'max' in aggs:
+            needed['agg_max'] = Max('max')
+
+    rows = queryset.values('slot', **groups).annotate(**needed).order_by()
+
+    timestamps = [start + timedelta(seconds=step * index) for index in range(n_buckets)]
+    results = {}
+
+    def store(key, index, row):
+        if key not in results:
+            results[key] = {agg: [None] * n_buckets for agg in aggs}
+        for agg in aggs:
+            results[key][agg][index] = row[f'agg_{agg}']
+
+    for row in rows:
+        key = tuple(row[name] for name in groups)
+        index = int((row['slot'] - start).total_seconds()) // step
+        stats = compacted.pop((key, index), None)
+        if stats is not None:
+            _combine(row, stats)
+        if (resolution is not None or stats is not None) and 'avg' in aggs:
+            row['agg_avg'] = row['agg_sum'] / row['agg_count'] if row['agg_count'] else None
+        store(key, index, row)
+
+    # Buckets with compacted points only
+    for (key, index), stats in compacted.items():
+        row = {f'agg_{name}': value for name, value in stats.items()}
+        row['agg_avg'] = stats['sum'] / stats['count']
+        store(key, index, row)
+
+    return {
+        'resolution': resolution,
+        'timestamps': timestamps,
+        'groups': [
+            {'group': dict(zip(group_by, key)), 'values': values}
+            for key, values in sorted(results.items(), key=lambda item: [str(part) for part in item[0]])
+        ],
+    }
@@ -0,0 +1,190 @@
+"""
+Async API views for metrics endpoints made of several independent queries.
+
+The queries of one request run concurrently (see ``concurrency.py``), so the
+response takes as long as the slowest query rather than the sum of them,
+and the event loop is not blocked while they run.
+"""
+
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.monitoring.models import MonitoringSource
+from apps.monitoring.services.counters import count_points, estimate_total
+from apps.monitoring.services.heavy_hitters import top_metrics as heavy_hitters
+from apps.monitoring.services.response_cache import cached, metric_scope
+from apps.monitoring.services.rollups import summarize
+from apps.monitoring.services.sketches import quantiles
+from apps.ml.models import MLPrediction
+from apps.authentication.permissions import IsViewer
+
+from .concurrency import QueryTimeout, gather_queries
+from .utils import parse_percentiles
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines.
+
+    Authentication, permission checks and throttling run in a worker thread
+    as for a sync view; the handler itself runs on the event loop.
+    """
+
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+def _cached(name, scopes, compute, *args):
+    """
+    ``cached`` for the coroutine function ``compute(*args)``, awaited from
+    async code.
+    """
+    return sync_to_async(cached, thread_sensitive=False)(name, scopes, lambda: async_to_sync(compute)(*args))
+
+
+async def dashboard_data(estimate=False):
+    """
+    Compute the dashboard payload (uncached), running its queries concurrently.
+    """
+    now = timezone.now()
+    last_24h = now - timedelta(hours=24)
+    last_hour = now - timedelta(hours=1)
+
+    results = await gather_queries({
+        'total_data_points': estimate_total if estimate else count_points,
+        'data_points_24h': lambda: count_points(since=last_24h),
+        'data_points_1h': lambda: count_points(since=last_hour),
+        'active_sources': MonitoringSource.objects.filter(is_active=True).count,
+        'predictions_24h': MLPrediction.objects.filter(created_at__gte=last_24h).count,
+        'top_metrics': lambda: heavy_hitters(last_24h, limit=10),
+    })
+    top_metrics = results.pop('top_metrics')
+
+    return {
+        'summary': results,
+        'top_metrics': top_metrics,
+        'timestamp': now.isoformat()
+    }
+
+
+class DashboardView(AsyncAPIView):
+    """
+    Get aggregated metrics for dashboard.
+
+    GET /api/v1/metrics/dashboard/?estimate=true
+
+    Point counts come from the ingest-maintained counters. With
+    ``estimate=true`` the total is the planner's row estimate instead,
+    which needs no scan at all but lags until the next ANALYZE.
+
+    Served from the response cache; it goes stale on any ingest and
+    otherwise after ``METRICS_CACHE_TTL`` seconds. On a miss the six
+    queries run concurrently, each limited to ``METRICS_QUERY_TIMEOUT``.
+    """
+    permission_classes = [IsViewer]
+
+    async def get(self, request):
+        estimate = request.query_params.get('estimate') == 'true'
+        name = 'dashboard:estimate' if estimate else 'dashboard'
+        try:
+            data = await _cached(name, ['global'], dashboard_data, estimate)
+        except QueryTimeout as e:
+            return Response({'error': str(e)}, status=504)
+        return Response(data)
+
+
+async def aggregate_statistics(metric_name, hours, percentiles):
+    """
+    Compute the statistics of ``metric_name`` over the last ``hours``
+    (uncached), reading the rollups and the quantile sketches concurrently.
+    """
+    end_time = timezone.now()
+    start_time = end_time - timedelta(hours=hours)
+    queries = {'statistics': lambda: summarize(start_time, end_time, metric_name=metric_name)}
+    if percentiles:
+        queries['percentiles'] = lambda: quantiles(
+            start_time, end_time, [p / 100 for p in percentiles], metric_name=metric_name
+        )
+    results = await gather_queries(queries)
+
+    statistics = results['statistics']
+    if percentiles:
+        estimates = results['percentiles']
+        # Sketch bins are approximate; the exact extremes bound every estimate
+        if statistics['count']:
+            estimates = [
+                value if value is None else min(max(value, statistics['min']), statistics['max'])
+                for value in estimates
+            ]
+        statistics['percentiles'] = {f'p{p:g}': value for p, value in zip(percentiles, estimates)}
+    return statistics
+
+
+class AggregatesView(AsyncAPIView):
+    """
+    Get aggregated statistics for a metric.
+
+    GET /api/v1/metrics/aggregates/?metric_name=cpu_usage&hours=24&percentiles=50,95,99
+
+    Whole hours and minutes of the window are read from rollups; only the
+    unaligned edges touch raw data. ``percentiles`` are estimated from the
+    merged quantile sketches of the same buckets, within 1% of the true
+    value, in parallel with the rollup read. Results are cached until new
+    data for the metric arrives or ``METRICS_CACHE_TTL`` passes.
+    """
+    permission_classes = [IsViewer]
+
+    async def get(self, request):
+        metric_name = request.query_params.get('metric_name')
+
+        if not metric_name:
+            return Response(
+                {'error': 'metric_name parameter is required'},
+                status=400
+            )
+
+        try:
+            hours = int(request.query_params.get('hours', 24))
+            percentiles = parse_percentiles(request.query_params.get('percentiles', ''))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+        name = f'aggregates:{metric_name}:{hours}:{",".join(f"{p:g}" for p in percentiles)}'
+        try:
+            aggregates = await _cached(
+                name, [metric_scope(metric_name)], aggregate_statistics, metric_name, hours, percentiles
+            )
+        except QueryTimeout as e:
+            return Response({'error': str(e)}, status=504)
+
+        return Response({
+            'metric_name': metric_name,
+            'time_range_hours': hours,
+            'statistics': aggregates
+        })
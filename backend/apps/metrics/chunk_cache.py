@@ -0,0 +1,113 @@
+"""
+Incremental cache of time-aligned timeseries chunks.
+
+A window is split into chunks aligned to multiples of ``CHUNK_SECONDS`` for
+its resolution. Chunks that ended more than ``METRICS_CHUNK_SEAL_SECONDS``
+ago are sealed: they are cached per normalized query and reused by every
+later request whose window covers them, so a repeated "last 6 hours" read
+only queries the unsealed tail. Ingest bumps the ``sealed:<digest>`` version
+of a metric when it writes points that old (see ``signals.py``), which
+invalidates its sealed chunks.
+"""
+
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.monitoring.pagination import CURSOR_ID
+from apps.monitoring.services.response_cache import data_versions, sealed_scope
+from apps.monitoring.services.rollups import floor_time
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'metrics:chunk:'
+
+# Chunk width in seconds per resolution (None is raw points)
+CHUNK_SECONDS = {
+    None: 600,
+    60: 3600,
+    3600: 86400,
+    86400: 30 * 86400,
+}
+
+
+def _chunk_key(query, chunk_start):
+    return KEY_PREFIX + hashlib.md5(repr((query, chunk_start.timestamp())).encode()).hexdigest()
+
+
+def cached_window(selectors, start_time, resolution, read):
+    """
+    Return the rows of ``selectors`` since ``start_time`` in time order.
+
+    ``read(since)`` must return the rows with a ``timestamp`` at or after
+    ``since``, ordered by time. It is called once, from the start of the
+    first chunk that is not cached, and the sealed chunks it returns are
+    cached for later requests.
+    """
+    width = CHUNK_SECONDS[resolution]
+    query = (tuple(sorted(set(selectors), key=lambda s: (s.metric_name, s.source or '', s.tags))), resolution)
+    sealed_before = floor_time(timezone.now() - timedelta(seconds=settings.METRICS_CHUNK_SEAL_SECONDS), width)
+    first_chunk = floor_time(start_time, width)
+    sealed = []
+    chunk_start = first_chunk
+    while chunk_start < sealed_before:
+        sealed.append(chunk_start)
+        chunk_start += timedelta(seconds=width)
+
+    versions = data_versions(sorted({sealed_scope(selector.metric_name) for selector in selectors}))
+    entries = {}
+    if versions is not None and sealed:
+        try:
+            entries = cache.get_many([_chunk_key(query, chunk) for chunk in sealed])
+        except Exception as e:
+            logger.warning(f"Chunk cache unavailable: {str(e)}")
+
+    # Reuse the cached prefix of sealed chunks and read everything after it
+    rows = []
+    read_from = sealed_before if sealed else first_chunk
+    for chunk in sealed:
+        entry = entries.get(_chunk_key(query, chunk))
+        if entry is None or entry['versions'] != versions:
+            read_from = chunk
+            break
+        rows.extend(entry['rows'])
+
+    fresh = list(read(read_from))
+    for row in fresh:
+        row.pop(CURSOR_ID, None)
+    rows.extend(fresh)
+
+    if versions is not None and read_from < sealed_before:
+        _store_chunks(query, versions, fresh, read_from, sealed_before, width)
+
+    since = start_time if resolution is None else floor_time(start_time, resolution)
+    if rows and rows[0]['timestamp'] < since:
+        rows = [row for row in rows if row['timestamp'] >= since]
+    return rows
+
+
+def _store_chunks(query, versions, rows, read_from, sealed_before, width):
+    chunks = {}
+    chunk_start = read_from
+    while chunk_start < sealed_before:
+        chunks[chunk_start] = []
+        chunk_start += timedelta(seconds=width)
+    for row in rows:
+        if row['timestamp'] >= sealed_before:
+            break
+        chunks[floor_time(row['timestamp'], width)].append(row)
+
+    try:
+        cache.set_many(
+            {
+                _chunk_key(query, chunk): {'versions': versions, 'rows': chunk_rows}
+                for chunk, chunk_rows in chunks.items()
+            },
+            timeout=settings.METRICS_CHUNK_CACHE_TTL
+        )
+    except Exception as e:
+        logger.warning(f"Could not store timeseries chunks: {str(e)}")
@@ -0,0 +1,61 @@
+"""
+Compact columnar response shape for timeseries endpoints.
+
+With ``shape=columnar`` a series is sent as parallel arrays instead of a list
+of point dicts: ``t`` holds integer epoch milliseconds and ``v`` the values,
+next to ``min``/``max``/``count`` for rollups. With ``deltas=true`` ``t``
+holds the first timestamp followed by the difference to the previous one,
+which for regularly spaced series is a run of identical small integers.
+"""
+
+import numpy as np
+
+SHAPES = ('rows', 'columnar')
+ROLLUP_COLUMNS = ('min', 'max', 'count')
+
+
+def parse_shape(params):
+    """
+    Return ``(columnar, deltas)`` from the ``shape`` and ``deltas`` parameters.
+    """
+    shape = params.get('shape') or 'rows'
+    if shape not in SHAPES:
+        raise ValueError(f"shape must be one of: {', '.join(SHAPES)}")
+    deltas = str(params.get('deltas', '')).lower() == 'true'
+    if deltas and shape != 'columnar':
+        raise ValueError('deltas=true requires shape=columnar')
+    return shape == 'columnar', deltas
+
+
+def encode_times(timestamps, deltas=False):
+    """
+    Datetimes as a list of integer epoch milliseconds, delta-encoded if asked.
+    """
+    millis = np.rint(np.array([moment.timestamp() for moment in timestamps], dtype=np.float64) * 1000)
+    millis = millis.astype(np.int64)
+    if deltas and len(millis):
+        millis[1:] = np.diff(millis)
+    return millis.tolist()
+
+
+def columnar_series(rows, deltas=False, group_key='source'):
+    """
+    Split time-ordered point dicts into one columnar series per ``group_key``
+    value, in order of first appearance.
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault(row[group_key], []).append(row)
+
+    series = []
+    for key, group in groups.items():
+        columns = {
+            group_key: key,
+            't': encode_times([row['timestamp'] for row in group], deltas),
+            'v': [row['metric_value'] for row in group],
+        }
+        for column in ROLLUP_COLUMNS:
+            if column in group[0]:
+                columns[column] = [row[column] for row in group]
+        series.append(columns)
+    return series
@@ -0,0 +1,77 @@
+"""
+Concurrent execution of independent read queries from async views.
+
+Django's async ORM runs every query through one thread-sensitive worker, so
+awaiting several of them still runs them one after another. Instead each
+query here runs on a bounded pool of ``METRICS_QUERY_WORKERS`` threads, each
+with its own database connection, while the event loop is free. A query is
+given ``METRICS_QUERY_TIMEOUT`` seconds: PostgreSQL cancels it through
+``statement_timeout``, so a timed-out query does not keep its worker busy.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection, transaction
+
+QUERY_CANCELED = '57014'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class QueryTimeout(Exception):
+    """
+    A query did not finish within its timeout.
+    """
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.METRICS_QUERY_WORKERS, thread_name_prefix='metrics-query'
+            )
+    return _executor
+
+
+def _run(name, query, timeout):
+    # Pool threads keep their connection only as long as CONN_MAX_AGE allows
+    close_old_connections()
+    try:
+        with transaction.atomic():
+            if timeout and connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL statement_timeout = %s', [max(int(timeout * 1000), 1)])
+            return query()
+    except OperationalError as e:
+        if getattr(e.__cause__, 'pgcode', None) == QUERY_CANCELED:
+            raise QueryTimeout(f'{name} did not finish within {timeout:g}s')
+        raise
+    finally:
+        close_old_connections()
+
+
+async def gather_queries(queries, timeout=None):
+    """
+    Run the independent ``{name: callable}`` queries concurrently and return
+    ``{name: result}``.
+
+    Raises QueryTimeout if any of them takes longer than ``timeout`` seconds
+    (default ``METRICS_QUERY_TIMEOUT``; 0 disables the limit).
+    """
+    timeout = settings.METRICS_QUERY_TIMEOUT if timeout is None else timeout
+    run = sync_to_async(_run, thread_sensitive=False, executor=_get_executor())
+
+    async def run_one(name, query):
+        try:
+            return await asyncio.wait_for(run(name, query, timeout), timeout or None)
+        except asyncio.TimeoutError:
+            raise QueryTimeout(f'{name} did not finish within {timeout:g}s')
+
+    results = await asyncio.gather(*(run_one(name, query) for name, query in queries.items()))
+    return dict(zip(queries, results))
@@ -0,0 +1,125 @@
+"""
+Downsampling of time series for charting.
+
+Both methods pick a subset of the original points, so every value returned
+was actually observed:
+
+- ``lttb``: Largest-Triangle-Three-Buckets, which keeps the points that best
+  preserve the visual shape of the line.
+- ``minmax``: the lowest and highest point of every bucket, which guarantees
+  that spikes survive.
+"""
+
+import numpy as np
+
+METHODS = ('lttb', 'minmax')
+
+
+def lttb(x, y, threshold):
+    """
+    Return the indices of ``threshold`` points chosen by LTTB.
+
+    ``x`` must be sorted ascending.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Bucket i (1..threshold-2) covers [edges[i-1], edges[i]); first and last points stand alone
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    starts, ends = edges[:-1], edges[1:]
+
+    # Average of each bucket, used as the third triangle vertex for the previous bucket
+    widths = ends - starts
+    avg_x = np.add.reduceat(x[:-1], starts) / widths
+    avg_y = np.add.reduceat(y[:-1], starts) / widths
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for bucket in range(threshold - 2):
+        start, end = starts[bucket], ends[bucket]
+        bx, by = x[start:end], y[start:end]
+        areas = np.abs(
+            (x[a] - next_x[bucket]) * (by - y[a])
+            - (x[a] - bx) * (next_y[bucket] - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[bucket + 1] = a
+    return selected
+
+
+def minmax(x, low, high, buckets):
+    """
+    Return the sorted indices of the lowest ``low`` and highest ``high``
+    point in each of ``buckets`` equal-width buckets over ``x``.
+
+    ``x`` must be sorted ascending. For raw points ``low`` and ``high`` are
+    the same values; for rollups they are the bucket min and max.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    high = np.asarray(high, dtype=np.float64)
+    n = len(x)
+    if n <= 2 * buckets or buckets < 1:
+        return np.arange(n)
+
+    span = x[-1] - x[0]
+    if span <= 0:
+        bucket_of = np.zeros(n, dtype=np.int64)
+    else:
+        bucket_of = np.minimum(((x - x[0]) / span * buckets).astype(np.int64), buckets - 1)
+
+    # Within each bucket, order by value: the first row is the minimum, the last the maximum
+    by_low = np.lexsort((low, bucket_of))
+    by_high = np.lexsort((high, bucket_of))
+    sorted_buckets = bucket_of[by_low]
+    first = np.flatnonzero(np.r_[True, sorted_buckets[1:] != sorted_buckets[:-1]])
+    last = np.r_[first[1:] - 1, n - 1]
+
+    return np.unique(np.concatenate([by_low[first], by_high[last], [0, n - 1]]))
+
+
+def downsample_rows(rows, max_points, method='lttb', time_key='timestamp', value_key='metric_value', group_key=None):
+    """
+    Downsample a list of time-ordered row dicts to at most about
+    ``max_points`` points per series.
+
+    Rows are grouped by ``group_key`` (e.g. ``source``) and each group is
+    downsampled on its own. Rollup rows with ``min``/``max`` use them for the
+    ``minmax`` method. Returns the kept rows in their original order.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown downsampling method: {method!r}")
+    if not rows:
+        return rows
+
+    groups = {}
+    for index, row in enumerate(rows):
+        groups.setdefault(row[group_key] if group_key else None, []).append(index)
+
+    x = np.array([row[time_key].timestamp() for row in rows], dtype=np.float64)
+    y = np.array([row[value_key] for row in rows], dtype=np.float64)
+
+    keep = []
+    for indices in groups.values():
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) <= max_points:
+            keep.append(indices)
+        elif method == 'lttb':
+            keep.append(indices[lttb(x[indices], y[indices], max_points)])
+        else:
+            if 'min' in rows[0]:
+                low = np.array([rows[index]['min'] for index in indices], dtype=np.float64)
+                high = np.array([rows[index]['max'] for index in indices], dtype=np.float64)
+            else:
+                low = high = y[indices]
+            keep.append(indices[minmax(x[indices], low, high, max(max_points // 2, 1))])
+
+    return [rows[index] for index in np.sort(np.concatenate(keep))]
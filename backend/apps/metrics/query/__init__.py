@@ -0,0 +1,13 @@
+"""
+PromQL-like query language over monitoring data.
+
+``parse`` turns query text into a syntax tree, ``plan_query`` resolves its
+selectors and checks its cost, and ``evaluate`` runs the plan on NumPy
+arrays; ``explain`` describes a plan without running it.
+"""
+
+from .evaluator import Vector, evaluate
+from .parser import QueryError, parse, render
+from .planner import explain, plan_query
+
+__all__ = ['QueryError', 'Vector', 'evaluate', 'explain', 'parse', 'plan_query', 'render']
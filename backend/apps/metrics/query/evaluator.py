@@ -0,0 +1,273 @@
+"""
+Vectorized evaluation of a planned query.
+
+Each scan is read once and laid out as one sorted array per column, with
+every series offset into its own key range. Window lookups for all series
+and all steps are then a single ``searchsorted``, and window aggregates are
+differences of prefix sums, so nothing loops over points in Python.
+Intermediate results are ``Vector``s: a list of label dicts and a
+``(series, steps)`` float matrix with NaN where there is no value.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from apps.monitoring.models import MonitoringData, MonitoringRollup
+from apps.monitoring.services.chunks import as_datetimes, chunk_points
+
+from .parser import INSTANT_FUNCTIONS, Aggregate, BinaryOp, Call, Negate, Number, QueryError, Selector
+
+Vector = namedtuple('Vector', ['labels', 'values'])
+
+MICROSECONDS = 1_000_000
+
+
+class _Columns:
+    """
+    Rows of one scan as flat arrays sorted by (series, time), with ``keys``
+    encoding the series index and the time offset from the scan start.
+    """
+
+    def __init__(self, scan, rows, value_columns):
+        self.scan = scan
+        self.n_series = len(scan.series_ids)
+        self.span = int((scan.end - scan.start).total_seconds() * MICROSECONDS) + 1
+        self.start_us = int(scan.start.timestamp() * MICROSECONDS)
+
+        position = {series_id: index for index, series_id in enumerate(scan.series_ids)}
+        series = np.fromiter((position[row[0]] for row in rows), dtype=np.int64, count=len(rows))
+        micros = np.fromiter(
+            (int(row[1].timestamp() * MICROSECONDS) for row in rows), dtype=np.int64, count=len(rows)
+        )
+        self.times = micros / MICROSECONDS
+        self.series = series
+        self.keys = series * self.span + (micros - self.start_us)
+        self.columns = {
+            name: np.fromiter((row[2 + index] for row in rows), dtype=np.float64, count=len(rows))
+            for index, name in enumerate(value_columns)
+        }
+
+    def windows(self, timestamps, window):
+        """
+        ``(lo, hi)`` index matrices of the rows in ``[t - window, t)`` for
+        every series and step.
+        """
+        ends = np.array([int(t.timestamp() * MICROSECONDS) for t in timestamps], dtype=np.int64) - self.start_us
+        starts = ends - int(window * MICROSECONDS)
+        offsets = (np.arange(self.n_series, dtype=np.int64) * self.span)[:, None]
+        lo = np.searchsorted(self.keys, offsets + starts[None, :], side='left')
+        hi = np.searchsorted(self.keys, offsets + ends[None, :], side='left')
+        return lo, hi
+
+
+def _read(scan):
+    if scan.resolution is None:
+        rows = MonitoringData.objects.filter(
+            series_id__in=scan.series_ids, timestamp__gte=scan.start, timestamp__lt=scan.end
+        ).order_by('series_id', 'timestamp').values_list('series_id', 'timestamp', 'metric_value')
+        if not scan.series_ids:
+            return _Columns(scan, [], ['value'])
+        rows = list(rows)
+        series_ids, micros, values = chunk_points(scan.start, scan.end, series_id__in=scan.series_ids)
+        if len(micros):
+            # Compacted points interleave with late raw points of the same series
+            rows = sorted(
+                rows + list(zip(series_ids.tolist(), as_datetimes(micros), values.tolist())),
+                key=lambda row: (row[0], row[1])
+            )
+        return _Columns(scan, rows, ['value'])
+
+    rows = MonitoringRollup.objects.filter(
+        series_id__in=scan.series_ids, resolution=scan.resolution,
+        bucket__gte=scan.start, bucket__lt=scan.end
+    ).order_by('series_id', 'bucket').values_list('series_id', 'bucket', 'count', 'sum', 'min', 'max')
+    return _Columns(scan, list(rows) if scan.series_ids else [], ['count', 'sum', 'min', 'max'])
+
+
+def _window_sum(column, lo, hi):
+    prefix = np.concatenate([[0.0], np.cumsum(column)])
+    return prefix[hi] - prefix[lo]
+
+
+def _window_reduce(ufunc, column, lo, hi):
+    result = np.full(lo.shape, np.nan)
+    nonempty = hi > lo
+    if nonempty.any():
+        # reduceat over interleaved (lo, hi) pairs reduces each [lo, hi) slice
+        padded = np.append(column, np.nan)
+        bounds = np.stack([lo[nonempty], hi[nonempty]], axis=1).ravel()
+        result[nonempty] = ufunc.reduceat(padded, bounds)[::2]
+    return result
+
+
+def _counter_corrected(columns):
+    # Add back the value before every counter reset, without crossing series
+    values = columns.columns['value']
+    if len(values) < 2:
+        return values
+    reset = (np.diff(values) < 0) & (columns.series[1:] == columns.series[:-1])
+    return values + np.concatenate([[0.0], np.cumsum(np.where(reset, values[:-1], 0.0))])
+
+
+def _evaluate_scan(function, columns, timestamps):
+    lo, hi = columns.windows(timestamps, columns.scan.window)
+    counts = (hi - lo).astype(np.float64)
+    empty = counts == 0
+    last = np.clip(hi - 1, 0, None)
+
+    if columns.scan.resolution is not None:
+        count = _window_sum(columns.columns['count'], lo, hi)
+        total = _window_sum(columns.columns['sum'], lo, hi)
+        empty = count == 0
+        if function == 'count_over_time':
+            result = count
+        elif function == 'sum_over_time':
+            result = total
+        elif function == 'avg_over_time':
+            result = total / np.where(empty, 1, count)
+        elif function == 'min_over_time':
+            result = _window_reduce(np.minimum, columns.columns['min'], lo, hi)
+        else:
+            result = _window_reduce(np.maximum, columns.columns['max'], lo, hi)
+        return np.where(empty, np.nan, result)
+
+    values = columns.columns['value']
+    if not len(values):
+        return np.full(lo.shape, np.nan)
+
+    if function is None:
+        result = values[last]
+    elif function == 'count_over_time':
+        result = counts
+    elif function == 'sum_over_time':
+        result = _window_sum(values, lo, hi)
+    elif function == 'avg_over_time':
+        result = _window_sum(values, lo, hi) / np.where(empty, 1, counts)
+    elif function == 'min_over_time':
+        result = _window_reduce(np.minimum, values, lo, hi)
+    elif function == 'max_over_time':
+        result = _window_reduce(np.maximum, values, lo, hi)
+    else:
+        # rate, increase and delta need two samples in the window
+        empty = counts < 2
+        first = np.clip(lo, 0, len(values) - 1)
+        source = values if function == 'delta' else _counter_corrected(columns)
+        result = source[last] - source[first]
+        if function == 'rate':
+            elapsed = columns.times[last] - columns.times[first]
+            result = result / np.where(elapsed > 0, elapsed, np.nan)
+    return np.where(empty, np.nan, result)
+
+
+def _without_name(labels):
+    return {key: value for key, value in labels.items() if key != '__name__'}
+
+
+def _aggregate(op, by, vector):
+    values = vector.values
+    if not len(vector.labels):
+        return vector
+    keys = [tuple(labels.get(label) for label in by) for labels in vector.labels]
+    unique = list(dict.fromkeys(keys))
+    position = {key: index for index, key in enumerate(unique)}
+    groups = np.array([position[key] for key in keys], dtype=np.int64)
+
+    shape = (len(unique), values.shape[1])
+    present = ~np.isnan(values)
+    counts = np.zeros(shape)
+    np.add.at(counts, groups, present)
+    if op in ('sum', 'avg'):
+        result = np.zeros(shape)
+        np.add.at(result, groups, np.where(present, values, 0.0))
+        if op == 'avg':
+            result = result / np.where(counts == 0, 1, counts)
+    elif op == 'count':
+        result = counts
+    else:
+        result = np.full(shape, np.nan)
+        (np.fmin if op == 'min' else np.fmax).at(result, groups, values)
+    result[counts == 0] = np.nan
+
+    labels = [{label: value for label, value in zip(by, key) if value is not None} for key in unique]
+    return Vector(labels, result)
+
+
+_OPERATORS = {
+    '+': np.add,
+    '-': np.subtract,
+    '*': np.multiply,
+    '/': np.divide,
+}
+
+
+def _binary(op, left, right):
+    function = _OPERATORS[op]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if not isinstance(left, Vector) and not isinstance(right, Vector):
+            return float(function(left, right))
+        if not isinstance(right, Vector):
+            return Vector([_without_name(labels) for labels in left.labels], function(left.values, right))
+        if not isinstance(left, Vector):
+            return Vector([_without_name(labels) for labels in right.labels], function(left, right.values))
+
+        # One-to-one matching on all labels except the metric name
+        def index(vector, side):
+            rows = {}
+            for row, labels in enumerate(vector.labels):
+                key = tuple(sorted(_without_name(labels).items()))
+                if key in rows:
+                    raise QueryError(f'Duplicate series on the {side} side of {op!r}: {dict(key)}')
+                rows[key] = row
+            return rows
+
+        left_rows, right_rows = index(left, 'left'), index(right, 'right')
+        matched = [key for key in left_rows if key in right_rows]
+        values = function(
+            left.values[[left_rows[key] for key in matched]],
+            right.values[[right_rows[key] for key in matched]]
+        ).reshape(len(matched), left.values.shape[1])
+        return Vector([dict(key) for key in matched], values)
+
+
+def evaluate(plan):
+    """
+    Execute ``plan`` and return a Vector, or a float for constant queries.
+    """
+    columns = {key: _read(scan) for key, scan in plan.scans.items()}
+    n_steps = len(plan.timestamps)
+
+    def walk(node):
+        if isinstance(node, Number):
+            return node.value
+        if isinstance(node, Selector):
+            data = columns[node]
+            return Vector(data.scan.labels, _evaluate_scan(None, data, plan.timestamps))
+        if isinstance(node, Call):
+            if node.function in INSTANT_FUNCTIONS:
+                operand = walk(node.args[0])
+                if isinstance(operand, Vector):
+                    return Vector(operand.labels, np.abs(operand.values))
+                return abs(operand)
+            data = columns[(node.function, node.args[0])]
+            labels = [_without_name(labels) for labels in data.scan.labels]
+            return Vector(labels, _evaluate_scan(node.function, data, plan.timestamps))
+        if isinstance(node, Aggregate):
+            operand = walk(node.expr)
+            if not isinstance(operand, Vector):
+                raise QueryError(f'{node.op}() needs a series expression, not a number')
+            return _aggregate(node.op, node.by, operand)
+        if isinstance(node, BinaryOp):
+            return _binary(node.op, walk(node.left), walk(node.right))
+        if isinstance(node, Negate):
+            operand = walk(node.expr)
+            if isinstance(operand, Vector):
+                return Vector(operand.labels, -operand.values)
+            return -operand
+        raise QueryError(f'Cannot evaluate {node!r}')
+
+    result = walk(plan.expr)
+    if isinstance(result, Vector):
+        values = result.values.reshape(len(result.labels), n_steps)
+        return Vector(result.labels, values)
+    return result
@@ -0,0 +1,278 @@
+"""
+Parser for the metrics query language, a small subset of PromQL:
+
+    rate(http_requests{source="web-1"}[5m])
+    sum by (source) (avg_over_time(cpu_usage{region=~"eu-.*"}[10m]))
+    (memory_used / memory_total) * 100
+
+Selectors name a metric and optionally filter on ``source`` and tag labels
+with ``=``, ``!=``, ``=~`` and ``!~``; a metric name that is not a plain
+identifier can be given as ``{__name__="..."}``. Expressions combine with
+``+ - * /``, aggregations (``sum``, ``avg``, ``min``, ``max``, ``count``
+with an optional ``by (labels)``) and the functions in ``FUNCTIONS``.
+"""
+
+import re
+from collections import namedtuple
+
+from ..utils import parse_duration
+
+
+class QueryError(ValueError):
+    """
+    An invalid query, or one that exceeds the query cost limits.
+    """
+
+
+Number = namedtuple('Number', ['value'])
+Selector = namedtuple('Selector', ['metric_name', 'matchers'])
+RangeSelector = namedtuple('RangeSelector', ['selector', 'range_seconds'])
+Call = namedtuple('Call', ['function', 'args'])
+Aggregate = namedtuple('Aggregate', ['op', 'by', 'expr'])
+BinaryOp = namedtuple('BinaryOp', ['op', 'left', 'right'])
+Negate = namedtuple('Negate', ['expr'])
+
+# Functions over a range selector, evaluated per series over each window
+RANGE_FUNCTIONS = (
+    'rate', 'increase', 'delta',
+    'avg_over_time', 'sum_over_time', 'min_over_time', 'max_over_time', 'count_over_time',
+)
+# Functions over an instant vector, applied point-wise
+INSTANT_FUNCTIONS = ('abs',)
+FUNCTIONS = RANGE_FUNCTIONS + INSTANT_FUNCTIONS
+AGGREGATIONS = ('sum', 'avg', 'min', 'max', 'count')
+MATCH_OPS = ('=', '!=', '=~', '!~')
+NAME_LABEL = '__name__'
+
+_TOKEN_RE = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<duration>\d+(?:\.\d+)?[smhd](?![\w:.]))
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<ident>[A-Za-z_:][\w:.]*)
+  | (?P<op>=~|!~|!=|[=+\-*/(){}\[\],])
+''', re.VERBOSE)
+
+# Regex matchers run as PostgreSQL AREs, which have no named groups, atomic
+# groups, conditionals or inline flags (not at the very start of the pattern,
+# where they would end up). Escapes and bracket expressions are skipped over.
+_UNPORTABLE_REGEX_RE = re.compile(r'\\.|\[\^?\]?(?:\\.|[^\]\\])*\]|(\(\?(?:<(?![=!])|[^:=!<]))')
+
+Token = namedtuple('Token', ['kind', 'value', 'position'])
+
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = _TOKEN_RE.match(text, position)
+        if not match:
+            raise QueryError(f'Unexpected character {text[position]!r} at position {position}')
+        kind = match.lastgroup
+        if kind != 'space':
+            tokens.append(Token(kind, match.group(), position))
+        position = match.end()
+    tokens.append(Token('end', '', position))
+    return tokens
+
+
+def _unquote(literal):
+    return re.sub(r'\\(.)', r'\1', literal[1:-1])
+
+
+class _Parser:
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.index = 0
+
+    @property
+    def current(self):
+        return self.tokens[self.index]
+
+    def advance(self):
+        token = self.current
+        self.index += 1
+        return token
+
+    def accept(self, value):
+        if self.current.kind == 'op' and self.current.value == value:
+            return self.advance()
+        return None
+
+    def expect(self, value):
+        token = self.accept(value)
+        if token is None:
+            self.fail(f'expected {value!r}')
+        return token
+
+    def fail(self, message):
+        token = self.current
+        found = token.value or 'end of query'
+        raise QueryError(f'{message} at position {token.position}, found {found!r}')
+
+    def parse(self):
+        expr = self.additive()
+        if self.current.kind != 'end':
+            self.fail('unexpected token')
+        return expr
+
+    def additive(self):
+        expr = self.multiplicative()
+        while self.current.kind == 'op' and self.current.value in '+-':
+            op = self.advance().value
+            expr = BinaryOp(op, expr, self.multiplicative())
+        return expr
+
+    def multiplicative(self):
+        expr = self.unary()
+        while self.current.kind == 'op' and self.current.value in '*/':
+            op = self.advance().value
+            expr = BinaryOp(op, expr, self.unary())
+        return expr
+
+    def unary(self):
+        if self.accept('-'):
+            return Negate(self.unary())
+        if self.accept('+'):
+            return self.unary()
+        return self.primary()
+
+    def primary(self):
+        token = self.current
+        if token.kind == 'number':
+            self.advance()
+            return Number(float(token.value))
+        if self.accept('('):
+            expr = self.additive()
+            self.expect(')')
+            return expr
+        if token.kind == 'ident' and token.value in AGGREGATIONS and self._next_is('(', 'by'):
+            return self.aggregate()
+        if token.kind == 'ident' and self._next_is('('):
+            return self.call()
+        if token.kind == 'ident' or (token.kind == 'op' and token.value == '{'):
+            return self.selector()
+        self.fail('expected a number, selector, function or aggregation')
+
+    def _next_is(self, *values):
+        token = self.tokens[self.index + 1]
+        return token.value in values and token.kind in ('op', 'ident')
+
+    def aggregate(self):
+        op = self.advance().value
+        by = self.by_clause()
+        self.expect('(')
+        expr = self.additive()
+        self.expect(')')
+        if by is None:
+            by = self.by_clause()
+        return Aggregate(op, tuple(by or ()), expr)
+
+    def by_clause(self):
+        if not (self.current.kind == 'ident' and self.current.value == 'by'):
+            return None
+        self.advance()
+        self.expect('(')
+        labels = []
+        while not self.accept(')'):
+            if self.current.kind != 'ident':
+                self.fail('expected a label name')
+            labels.append(self.advance().value)
+            if not self.accept(','):
+                self.expect(')')
+                break
+        return labels
+
+    def call(self):
+        name = self.advance().value
+        if name not in FUNCTIONS:
+            self.fail(f'unknown function {name!r}')
+        self.expect('(')
+        args = [self.additive()]
+        while self.accept(','):
+            args.append(self.additive())
+        self.expect(')')
+        return Call(name, tuple(args))
+
+    def selector(self):
+        metric_name = None
+        if self.current.kind == 'ident':
+            metric_name = self.advance().value
+
+        matchers = []
+        if self.accept('{'):
+            while not self.accept('}'):
+                if self.current.kind != 'ident':
+                    self.fail('expected a label name')
+                label = self.advance().value
+                if not (self.current.kind == 'op' and self.current.value in MATCH_OPS):
+                    self.fail('expected one of =, !=, =~, !~')
+                op = self.advance().value
+                if self.current.kind != 'string':
+                    self.fail('expected a quoted label value')
+                value = _unquote(self.advance().value)
+                if op in ('=~', '!~'):
+                    try:
+                        re.compile(value)
+                    except re.error as e:
+                        raise QueryError(f'Invalid regular expression {value!r}: {e}')
+                    if any(match.group(1) for match in _UNPORTABLE_REGEX_RE.finditer(value)):
+                        raise QueryError(
+                            f'Unsupported regular expression {value!r}: only (?:, (?=, (?!, (?<= and (?<! groups are allowed'
+                        )
+                if label == NAME_LABEL and op == '=' and metric_name is None:
+                    metric_name = value
+                else:
+                    matchers.append((label, op, value))
+                if not self.accept(','):
+                    self.expect('}')
+                    break
+
+        if metric_name is None:
+            raise QueryError('Every selector needs a metric name')
+        if any(label == NAME_LABEL for label, _, _ in matchers):
+            raise QueryError('__name__ can only be matched once, with =')
+
+        selector = Selector(metric_name, tuple(matchers))
+        if self.accept('['):
+            if self.current.kind not in ('duration', 'number'):
+                self.fail('expected a duration such as 5m')
+            try:
+                seconds = parse_duration(self.advance().value)
+            except ValueError as e:
+                raise QueryError(str(e))
+            self.expect(']')
+            return RangeSelector(selector, seconds)
+        return selector
+
+
+def parse(text):
+    """
+    Parse a query into its syntax tree. Raises QueryError.
+    """
+    if not text or not text.strip():
+        raise QueryError('query is required')
+    return _Parser(text).parse()
+
+
+def render(node):
+    """
+    Format a syntax tree back into canonical query text.
+    """
+    if isinstance(node, Number):
+        return f'{node.value:g}'
+    if isinstance(node, Selector):
+        matchers = ', '.join(f'{label}{op}"{value}"' for label, op, value in node.matchers)
+        return f'{node.metric_name}{{{matchers}}}' if matchers else node.metric_name
+    if isinstance(node, RangeSelector):
+        return f'{render(node.selector)}[{node.range_seconds:g}s]'
+    if isinstance(node, Call):
+        return f"{node.function}({', '.join(render(arg) for arg in node.args)})"
+    if isinstance(node, Aggregate):
+        by = f" by ({', '.join(node.by)})" if node.by else ''
+        return f'{node.op}{by} ({render(node.expr)})'
+    if isinstance(node, BinaryOp):
+        return f'({render(node.left)} {node.op} {render(node.right)})'
+    if isinstance(node, Negate):
+        return f'-{render(node.expr)}'
+    raise TypeError(f'Unknown node {node!r}')
@@ -0,0 +1,250 @@
+"""
+Query planning: resolve selectors, choose scans and estimate their cost.
+
+Every distinct selector is resolved against the series catalog with its
+matchers translated to SQL, and becomes one scan over exactly the time range
+its windows need. ``*_over_time`` functions whose windows and step are whole
+rollup buckets scan the coarsest such rollup tier instead of raw rows. The
+plan is costed from the 1-hour rollup counts before anything is read, so
+expensive queries are refused up front.
+"""
+
+import json
+import re
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DataError
+from django.db.models import Q, Sum, TextField
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from apps.monitoring.models import MonitoringRollup, MonitoringSeries
+from apps.monitoring.services.rollups import TIERS, ceil_time, floor_time, is_retained
+
+from .parser import (
+    RANGE_FUNCTIONS, Aggregate, BinaryOp, Call, Negate, QueryError, RangeSelector, Selector, render,
+)
+
+# Range functions that can be answered from rollup count/sum/min/max
+ROLLUP_FUNCTIONS = ('avg_over_time', 'sum_over_time', 'min_over_time', 'max_over_time', 'count_over_time')
+
+Scan = namedtuple('Scan', [
+    'key', 'selector', 'window', 'resolution', 'start', 'end', 'series_ids', 'labels', 'estimated_rows',
+])
+QueryPlan = namedtuple('QueryPlan', ['expr', 'timestamps', 'step', 'scans', 'estimated_rows'])
+
+
+def series_labels(source, metric_name, tags):
+    labels = {'__name__': metric_name, 'source': source}
+    for key, value in (tags or {}).items():
+        labels[key] = value if isinstance(value, str) else json.dumps(value)
+    return labels
+
+
+def _matcher_condition(alias, op, value):
+    matches_empty = {
+        '=': value == '',
+        '!=': value != '',
+        '=~': re.fullmatch(value, '') is not None,
+        '!~': re.fullmatch(value, '') is None,
+    }[op]
+    if op == '=':
+        condition = Q(**{alias: value})
+    elif op == '!=':
+        condition = ~Q(**{alias: value})
+    elif op == '=~':
+        condition = Q(**{f'{alias}__regex': f'^(?:{value})$'})
+    else:
+        condition = ~Q(**{f'{alias}__regex': f'^(?:{value})$'})
+    # A missing tag behaves as an empty label value
+    if alias == 'source':
+        return condition
+    missing = Q(**{f'{alias}__isnull': True})
+    return (condition & ~missing) | missing if matches_empty else condition & ~missing
+
+
+def resolve_series(selector):
+    """
+    Return ``(series_ids, labels)`` of the catalog series matching ``selector``.
+    """
+    queryset = MonitoringSeries.objects.filter(metric_name=selector.metric_name)
+    for index, (label, op, value) in enumerate(selector.matchers):
+        if label == 'source':
+            alias = 'source'
+        else:
+            # Cast so that plain text lookups apply rather than JSON ones
+            alias = f'label_{index}'
+            queryset = queryset.annotate(**{alias: Cast(KeyTextTransform(label, 'tags'), TextField())})
+        queryset = queryset.filter(_matcher_condition(alias, op, value))
+
+    limit = settings.METRICS_QUERY_MAX_SERIES
+    try:
+        rows = list(queryset.order_by('id').values_list('id', 'source', 'metric_name', 'tags')[:limit + 1])
+    except DataError as e:
+        # A regex the parser accepted but the database does not
+        raise QueryError(f'{render(selector)} cannot be evaluated: {e}')
+    if len(rows) > limit:
+        raise QueryError(f'{render(selector)} matches more than {limit} series')
+    return [row[0] for row in rows], [series_labels(*row[1:]) for row in rows]
+
+
+def choose_tier(function, window, step, start):
+    """
+    Coarsest rollup resolution that tiles every window of ``function``
+    exactly and is still retained at ``start``, or None for raw data.
+    """
+    if function not in ROLLUP_FUNCTIONS:
+        return None
+    now = timezone.now()
+    eligible = [
+        resolution for resolution in TIERS
+        if not step % resolution and not window % resolution and is_retained(resolution, start, now)
+    ]
+    return max(eligible) if eligible else None
+
+
+def _estimate_rows(series_ids, resolution, start, end):
+    if not series_ids:
+        return 0
+    if resolution is not None:
+        buckets = int((end - start).total_seconds()) // resolution + 1
+        return len(series_ids) * buckets
+    counted = MonitoringRollup.objects.filter(
+        series_id__in=series_ids,
+        resolution=MonitoringRollup.RESOLUTION_HOUR,
+        bucket__gte=floor_time(start, MonitoringRollup.RESOLUTION_HOUR),
+        bucket__lt=end
+    ).aggregate(total=Sum('count'))['total']
+    return counted or 0
+
+
+def _check_types(node, range_allowed=False):
+    """
+    Reject range selectors outside range functions and vice versa.
+    """
+    if isinstance(node, RangeSelector):
+        if not range_allowed:
+            raise QueryError(f'Range selector {render(node)} must be the argument of a range function')
+    elif isinstance(node, Call):
+        expected = 1
+        if len(node.args) != expected:
+            raise QueryError(f'{node.function}() takes exactly {expected} argument')
+        if node.function in RANGE_FUNCTIONS:
+            if not isinstance(node.args[0], RangeSelector):
+                raise QueryError(f'{node.function}() needs a range selector such as metric[5m]')
+        else:
+            _check_types(node.args[0])
+    elif isinstance(node, Aggregate):
+        _check_types(node.expr)
+    elif isinstance(node, BinaryOp):
+        _check_types(node.left)
+        _check_types(node.right)
+    elif isinstance(node, Negate):
+        _check_types(node.expr)
+
+
+def _scan_requests(node):
+    """
+    Yield ``(key, selector, function, window)`` for every selector in
+    ``node``; ``window`` is None for instant selectors.
+    """
+    if isinstance(node, Selector):
+        yield node, node, None, None
+    elif isinstance(node, Call) and node.function in RANGE_FUNCTIONS:
+        range_selector = node.args[0]
+        yield (node.function, range_selector), range_selector.selector, node.function, range_selector.range_seconds
+    elif isinstance(node, Call):
+        yield from _scan_requests(node.args[0])
+    elif isinstance(node, Aggregate):
+        yield from _scan_requests(node.expr)
+    elif isinstance(node, BinaryOp):
+        yield from _scan_requests(node.left)
+        yield from _scan_requests(node.right)
+    elif isinstance(node, Negate):
+        yield from _scan_requests(node.expr)
+
+
+def plan_query(expr, start, end, step):
+    """
+    Plan evaluating ``expr`` at every multiple of ``step`` seconds in
+    ``[start, end]``. Raises QueryError when it would exceed the cost limits.
+    """
+    step = int(step)
+    if step < 1:
+        raise QueryError('step must be at least one second')
+    first, last = ceil_time(start, step), floor_time(end, step)
+    n_steps = int((last - first).total_seconds()) // step + 1 if last >= first else 0
+    if n_steps > settings.METRICS_MAX_BUCKETS:
+        raise QueryError(f'{n_steps} steps requested; at most {settings.METRICS_MAX_BUCKETS} are allowed')
+    timestamps = [first + timedelta(seconds=step * index) for index in range(n_steps)]
+
+    _check_types(expr)
+
+    scans = {}
+    resolved = {}
+    for key, selector, function, window in _scan_requests(expr):
+        if key in scans:
+            continue
+        if selector not in resolved:
+            resolved[selector] = resolve_series(selector)
+        series_ids, labels = resolved[selector]
+
+        window = window or settings.METRICS_QUERY_LOOKBACK
+        scan_start = first - timedelta(seconds=window)
+        resolution = choose_tier(function, window, step, scan_start)
+        scans[key] = Scan(
+            key=key,
+            selector=selector,
+            window=window,
+            resolution=resolution,
+            start=scan_start,
+            end=last,
+            series_ids=series_ids,
+            labels=labels,
+            estimated_rows=_estimate_rows(series_ids, resolution, scan_start, last),
+        )
+
+    total_series = len({series_id for scan in scans.values() for series_id in scan.series_ids})
+    if total_series > settings.METRICS_QUERY_MAX_SERIES:
+        raise QueryError(f'Query reads {total_series} series; at most {settings.METRICS_QUERY_MAX_SERIES} are allowed')
+
+    estimated_rows = sum(scan.estimated_rows for scan in scans.values())
+    if estimated_rows > settings.METRICS_QUERY_MAX_ROWS:
+        raise QueryError(
+            f'Query would scan about {estimated_rows} rows; at most {settings.METRICS_QUERY_MAX_ROWS} '
+            f'are allowed. Narrow the selectors, shorten the range or use a larger step.'
+        )
+
+    return QueryPlan(expr, timestamps, step, scans, estimated_rows)
+
+
+def explain(plan):
+    """
+    Describe a plan without executing it.
+    """
+    return {
+        'query': render(plan.expr),
+        'steps': len(plan.timestamps),
+        'step': plan.step,
+        'estimated_rows': plan.estimated_rows,
+        'scans': [
+            {
+                'selector': render(scan.selector),
+                'window_seconds': scan.window,
+                'source': 'raw' if scan.resolution is None else f'rollup:{scan.resolution}s',
+                'start': scan.start,
+                'end': scan.end,
+                'series': len(scan.series_ids),
+                'estimated_rows': scan.estimated_rows,
+            }
+            for scan in plan.scans.values()
+        ],
+        'limits': {
+            'max_rows': settings.METRICS_QUERY_MAX_ROWS,
+            'max_series': settings.METRICS_QUERY_MAX_SERIES,
+            'max_steps': settings.METRICS_MAX_BUCKETS,
+        },
+    }
@@ -0,0 +1,178 @@
+"""
+Query engine shared by the single and batch timeseries endpoints.
+
+A request is a list of series selectors (a metric name, optionally narrowed
+to one source and by tag filters) over a shared window and resolution. All selectors are read
+with a single query ordered by time, and the rows are then split back per
+selector. Whole-window reads go through the chunk cache (``chunk_cache``)
+and include points compacted into storage chunks; paged and streamed raw
+reads, which page by row id, cover the raw table only and are refused for
+windows reaching back into the chunks (see ``chunks.require_raw``).
+"""
+
+import heapq
+from collections import namedtuple
+from operator import itemgetter
+
+import numpy as np
+from django.db.models import F, Q
+
+from apps.monitoring.models import MonitoringData, MonitoringRollup, MonitoringSeries
+from apps.monitoring.pagination import CURSOR_ID, keyset_queryset
+from apps.monitoring.services.chunks import as_datetimes, chunk_points
+from apps.monitoring.services.rollups import floor_time
+from apps.monitoring.services.tags import tag_condition, tags_match
+
+from .chunk_cache import cached_window
+from .downsampling import downsample_rows
+
+SeriesSelector = namedtuple('SeriesSelector', ['metric_name', 'source', 'tags'], defaults=((),))
+
+
+def series_filter(selectors):
+    """
+    Q object matching the series of any of ``selectors``.
+    """
+    condition = Q()
+    for selector in selectors:
+        lookups = {'series__metric_name': selector.metric_name}
+        if selector.source:
+            lookups['series__source'] = selector.source
+        condition |= Q(**lookups) & tag_condition(selector.tags)
+    return condition
+
+
+def timeseries_queryset(selectors, start_time, resolution=None, cursor=None, with_metric_name=False,
+                        with_tags=False):
+    """
+    Values queryset of the points for ``selectors`` since ``start_time``,
+    ordered by (timestamp, id) and positioned after ``cursor``.
+
+    Raw rows are read when ``resolution`` is None, otherwise rollups of that
+    resolution, with ``metric_value`` holding the bucket average. Rows carry
+    their keyset tiebreaker under ``CURSOR_ID``.
+    """
+    names = {'source': F('series__source')}
+    if with_metric_name:
+        names['metric_name'] = F('series__metric_name')
+    if with_tags:
+        names['tags'] = F('series__tags')
+
+    if resolution is None:
+        queryset = MonitoringData.objects.filter(
+            series_filter(selectors),
+            timestamp__gte=start_time
+        )
+        return keyset_queryset(queryset, cursor).values(
+            'timestamp', 'metric_value', **names, **{CURSOR_ID: F('id')}
+        )
+
+    queryset = MonitoringRollup.objects.filter(
+        series_filter(selectors),
+        resolution=resolution,
+        bucket__gte=floor_time(start_time, resolution)
+    )
+    # One rollup per series and bucket, so (bucket, series) is unique
+    return keyset_queryset(
+        queryset, cursor, time_field='bucket', id_field='series_id'
+    ).annotate(
+        metric_value=F('sum') / F('count')
+    ).values(
+        'metric_value', 'min', 'max', 'count',
+        timestamp=F('bucket'), **names, **{CURSOR_ID: F('series_id')}
+    )
+
+
+def compacted_rows(selectors, start_time, with_metric_name=False, with_tags=False):
+    """
+    Point dicts, in time order, of the compacted raw points for ``selectors``
+    since ``start_time``, shaped like ``timeseries_queryset`` rows.
+    """
+    series_ids, micros, values = chunk_points(start_time, None, series_filter(selectors))
+    if not len(micros):
+        return []
+
+    fields = ['source']
+    if with_metric_name:
+        fields.append('metric_name')
+    if with_tags:
+        fields.append('tags')
+    series = {
+        row.pop('id'): row
+        for row in MonitoringSeries.objects.filter(id__in=set(series_ids.tolist())).values('id', *fields)
+    }
+
+    order = np.argsort(micros, kind='stable')
+    return [
+        {'timestamp': timestamp, 'metric_value': value, **series[series_id]}
+        for series_id, timestamp, value in zip(
+            series_ids[order].tolist(), as_datetimes(micros[order]), values[order].tolist()
+        )
+    ]
+
+
+def effective_bucket_seconds(start_time, end_time, resolution=None, max_points=None):
+    """
+    Width in seconds that one returned point stands for (None for raw points).
+    """
+    if not max_points:
+        return resolution
+    return max(resolution or 0, (end_time - start_time).total_seconds() / max_points)
+
+
+def split_by_selector(rows, selectors):
+    """
+    Distribute rows that carry ``metric_name`` and ``source`` (and ``tags``
+    when any selector filters on them) over the selectors they match,
+    preserving order. A row may match several.
+    """
+    exact = {}
+    by_metric = {}
+    for index, selector in enumerate(selectors):
+        if selector.source:
+            exact.setdefault((selector.metric_name, selector.source), []).append(index)
+        else:
+            by_metric.setdefault(selector.metric_name, []).append(index)
+
+    split = [[] for _ in selectors]
+    for row in rows:
+        for index in exact.get((row['metric_name'], row['source']), ()):
+            if tags_match(row.get('tags'), selectors[index].tags):
+                split[index].append(row)
+        for index in by_metric.get(row['metric_name'], ()):
+            if tags_match(row.get('tags'), selectors[index].tags):
+                split[index].append(row)
+    return split
+
+
+def fetch_timeseries(selectors, start_time, resolution=None, max_points=None, method='lttb'):
+    """
+    Read the whole window for every selector in one query.
+
+    Sealed chunks of the window come from the chunk cache, so the query only
+    covers the part of the window that is not cached. Returns one list of
+    point dicts per selector, each downsampled per source to about
+    ``max_points`` points when given.
+    """
+    with_tags = any(selector.tags for selector in selectors)
+
+    def read(since):
+        rows = timeseries_queryset(selectors, since, resolution, with_metric_name=True, with_tags=with_tags)
+        if resolution is not None:
+            return rows
+        return heapq.merge(
+            compacted_rows(selectors, since, with_metric_name=True, with_tags=with_tags), rows,
+            key=itemgetter('timestamp')
+        )
+
+    rows = cached_window(selectors, start_time, resolution, read)
+
+    results = []
+    for selector_rows in split_by_selector(rows, selectors):
+        if max_points:
+            selector_rows = downsample_rows(selector_rows, max_points, method, group_key='source')
+        results.append([
+            {key: value for key, value in row.items() if key not in ('metric_name', 'tags')}
+            for row in selector_rows
+        ])
+    return results
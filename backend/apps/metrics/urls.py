@@ -4,11 +4,15 @@ URL routing for metrics endpoints.
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .async_views import AggregatesView, DashboardView
 from .views import MetricsViewSet
 
 router = DefaultRouter()
 router.register(r'metrics', MetricsViewSet, basename='metrics')
 
 urlpatterns = [
+    # Async views, ahead of the router so they keep the viewset's URLs
+    path('metrics/dashboard/', DashboardView.as_view(), name='metrics-dashboard'),
+    path('metrics/aggregates/', AggregatesView.as_view(), name='metrics-aggregates'),
     path('', include(router.urls)),
 ]
@@ -0,0 +1,45 @@
+"""
+Query parameter helpers for metrics endpoints.
+"""
+
+import re
+
+_DURATION_RE = re.compile(r'^(\d+(?:\.\d+)?)([smhd]?)$')
+_UNIT_SECONDS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_duration(value):
+    """
+    Parse a duration such as ``300``, ``30s``, ``5m``, ``1h`` or ``1d`` into seconds.
+
+    Raises ValueError for anything else.
+    """
+    match = _DURATION_RE.match(str(value).strip().lower())
+    if not match:
+        raise ValueError(f'Invalid duration: {value!r}')
+    seconds = float(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+    if seconds <= 0:
+        raise ValueError(f'Duration must be positive: {value!r}')
+    return seconds
+
+
+def parse_percentiles(value):
+    """
+    Parse a comma-separated list of percentiles such as ``50,95,99.9``.
+
+    Returns a sorted list of unique floats in [0, 100] (empty for an empty
+    value). Raises ValueError for anything else.
+    """
+    percentiles = set()
+    for item in str(value).split(','):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            percentile = float(item)
+        except ValueError:
+            raise ValueError(f'Invalid percentile: {item!r}')
+        if not 0 <= percentile <= 100:
+            raise ValueError(f'Percentile must be between 0 and 100: {item!r}')
+        percentiles.add(percentile)
+    return sorted(percentiles)
@@ -5,14 +5,42 @@ API views for metrics and dashboard endpoints.
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Avg, Count, Max, Min
+from django.conf import settings
 from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
 from datetime import timedelta
 
-from apps.monitoring.models import MonitoringData, MonitoringSource
-from apps.ml.models import MLPrediction
+import numpy as np
+
+from apps.monitoring.models import MonitoringRollup
+from apps.monitoring.pagination import keyset_page
+from apps.monitoring.services.chunks import require_raw
+from apps.monitoring.services.heavy_hitters import top_metrics as heavy_hitters
+from apps.monitoring.services.response_cache import data_versions, metric_scope, response_etag
+from apps.monitoring.services.rollups import choose_resolution
+from apps.monitoring.services.tags import parse_tag_filters
+from apps.monitoring.streaming import stream_json
 from apps.authentication.permissions import IsViewer
 
+from . import query as metrics_query
+from .aggregation import bucketed_aggregates, parse_aggregates, parse_group_by
+from .columnar import columnar_series, encode_times, parse_shape
+from .downsampling import METHODS as DOWNSAMPLING_METHODS
+from .timeseries import SeriesSelector, effective_bucket_seconds, fetch_timeseries, timeseries_queryset
+from .utils import parse_duration
+
+RESOLUTION_LABELS = dict(MonitoringRollup.RESOLUTION_CHOICES)
+
+
+def _json_rows(matrix):
+    """
+    Rows of a float matrix as lists, with None in place of NaN.
+    """
+    values = matrix.astype(object)
+    values[np.isnan(matrix)] = None
+    return values.tolist()
+
 
 class MetricsViewSet(viewsets.ViewSet):
     """
@@ -23,53 +51,36 @@ class MetricsViewSet(viewsets.ViewSet):
     """
     permission_classes = [IsViewer]
     
-    @action(detail=False, methods=['get'])
-    def dashboard(self, request):
+    @action(detail=False, methods=['get'], url_path='top-metrics')
+    def top_metrics(self, request):
         """
-        Get aggregated metrics for dashboard.
+        Get the metrics with the most data points, overall or for one source.
+        
+        GET /api/v1/metrics/top-metrics?hours=24&limit=10&source=server1
         
-        GET /api/v1/metrics/dashboard
+        Answered by merging hourly heavy-hitter summaries, so the window
+        starts on a whole hour. Each ``count`` may overestimate the true
+        count by at most its ``error``.
         """
-        now = timezone.now()
-        last_24h = now - timedelta(hours=24)
-        last_hour = now - timedelta(hours=1)
-        
-        # Data ingestion stats
-        total_data_points = MonitoringData.objects.count()
-        data_points_24h = MonitoringData.objects.filter(
-            timestamp__gte=last_24h
-        ).count()
-        data_points_1h = MonitoringData.objects.filter(
-            timestamp__gte=last_hour
-        ).count()
-        
-        # Active sources
-        active_sources = MonitoringSource.objects.filter(
-            is_active=True
-        ).count()
-        
-        # ML predictions
-        predictions_24h = MLPrediction.objects.filter(
-            created_at__gte=last_24h
-        ).count()
-        
-        # Top metrics by volume
-        top_metrics = MonitoringData.objects.filter(
-            timestamp__gte=last_24h
-        ).values('metric_name').annotate(
-            count=Count('id')
-        ).order_by('-count')[:10]
+        try:
+            hours = int(request.query_params.get('hours', 24))
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        
+        if not 1 <= limit <= settings.MONITORING_TOP_METRICS_CAPACITY:
+            return Response(
+                {'error': f'limit must be between 1 and {settings.MONITORING_TOP_METRICS_CAPACITY}'},
+                status=400
+            )
+        
+        source = request.query_params.get('source')
+        start_time = timezone.now() - timedelta(hours=hours)
         
         return Response({
-            'summary': {
-                'total_data_points': total_data_points,
-                'data_points_24h': data_points_24h,
-                'data_points_1h': data_points_1h,
-                'active_sources': active_sources,
-                'predictions_24h': predictions_24h,
-            },
-            'top_metrics': list(top_metrics),
-            'timestamp': now.isoformat()
+            'source': source,
+            'time_range_hours': hours,
+            'top_metrics': heavy_hitters(start_time, limit=limit, source=source),
         })
     
     @action(detail=False, methods=['get'])
@@ -77,11 +88,36 @@ class MetricsViewSet(viewsets.ViewSet):
         """
         Get time-series data for a specific metric.
         
-        GET /api/v1/metrics/timeseries?metric_name=cpu_usage&source=server1&hours=24
+        GET /api/v1/metrics/timeseries?metric_name=cpu_usage&source=server1&tag=env=prod&hours=24&step=5m&max_points=800
+        
+        ``tag`` may be repeated to keep only series whose tags match:
+        ``key=value``, ``key=v1,v2`` (any of) or ``key!=value`` (excluded).
+        
+        When ``step`` or ``max_points`` is given, the coarsest rollup tier
+        (1m/1h/1d) that satisfies it is returned instead of raw rows. With
+        ``max_points``, each series is then downsampled to about that many
+        points (``downsample=lttb``, the default, or ``minmax`` to keep every
+        bucket's extremes); ``bucket_seconds`` reports the effective width.
+        
+        With ``limit`` the points are paginated by (timestamp, id); pass
+        ``next_cursor`` back as ``cursor`` for the next page. With
+        ``stream=true`` the points are streamed in chunks instead. Raw points
+        paged or streamed this way do not include compacted ones, so a window
+        reaching back before the newest chunk is rejected.
+        
+        Whole-window responses carry an ETag; a poll with a matching
+        ``If-None-Match`` gets 304 Not Modified while no new data arrived.
+        
+        ``shape=columnar`` returns one object per source with parallel ``t``
+        (epoch milliseconds) and ``v`` arrays; add ``deltas=true`` to
+        delta-encode ``t``. ``Accept: application/msgpack`` selects MessagePack.
+        
+        Use ``timeseries-batch`` to fetch several series in one round trip.
         """
         metric_name = request.query_params.get('metric_name')
         source = request.query_params.get('source')
         hours = int(request.query_params.get('hours', 24))
+        cursor = request.query_params.get('cursor')
         
         if not metric_name:
             return Response(
@@ -89,55 +125,269 @@ class MetricsViewSet(viewsets.ViewSet):
                 status=400
             )
         
-        start_time = timezone.now() - timedelta(hours=hours)
-        
-        queryset = MonitoringData.objects.filter(
-            metric_name=metric_name,
-            timestamp__gte=start_time
-        )
+        try:
+            step = parse_duration(request.query_params['step']) if 'step' in request.query_params else None
+            max_points = int(request.query_params['max_points']) if 'max_points' in request.query_params else None
+            limit = int(request.query_params['limit']) if 'limit' in request.query_params else None
+            columnar, deltas = parse_shape(request.query_params)
+            tags = parse_tag_filters(request.query_params.getlist('tag'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
         
-        if source:
-            queryset = queryset.filter(source=source)
+        method = request.query_params.get('downsample', 'lttb')
+        if method not in DOWNSAMPLING_METHODS:
+            return Response(
+                {'error': f"downsample must be one of: {', '.join(DOWNSAMPLING_METHODS)}"},
+                status=400
+            )
         
-        # Get data points
-        data_points = queryset.values('timestamp', 'metric_value', 'source').order_by('timestamp')
+        end_time = timezone.now()
+        start_time = end_time - timedelta(hours=hours)
+        resolution = choose_resolution(start_time, end_time, step=step, max_points=max_points)
         
-        return Response({
+        selectors = [SeriesSelector(metric_name, source, tags)]
+        fields = {
             'metric_name': metric_name,
-            'data': list(data_points),
-            'count': len(data_points)
+            'resolution': RESOLUTION_LABELS.get(resolution, 'raw'),
+            'bucket_seconds': resolution,
+        }
+        
+        # Paged and streamed reads skip downsampling, which needs the whole window
+        stream = request.query_params.get('stream') == 'true'
+        etag = None
+        if stream or limit is not None:
+            try:
+                if resolution is None:
+                    require_raw(start_time)
+                data_points = timeseries_queryset(selectors, start_time, resolution, cursor)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=400)
+            
+            if stream:
+                if columnar:
+                    return Response({'error': 'shape=columnar cannot be streamed'}, status=400)
+                return stream_json(request, data_points, fields)
+            
+            data_points, next_cursor = keyset_page(data_points, limit)
+        else:
+            versions = data_versions([metric_scope(metric_name)])
+            data_points = fetch_timeseries(selectors, start_time, resolution, max_points, method)[0]
+            next_cursor = None
+            if max_points:
+                fields['downsample'] = method
+                fields['bucket_seconds'] = effective_bucket_seconds(start_time, end_time, resolution, max_points)
+            
+            # With the data versions unchanged the window can only have lost
+            # its oldest points, and both downsamplers keep the first point.
+            # Each encoding of the same data is a different representation.
+            if versions is not None:
+                etag = response_etag(
+                    versions, request.accepted_renderer.format, metric_name, source, tags, hours, resolution,
+                    max_points, method, columnar, deltas, len(data_points),
+                    data_points[0]['timestamp'] if data_points else None,
+                    data_points[-1]['timestamp'] if data_points else None
+                )
+                if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                    response = Response(status=304, headers={'ETag': etag})
+                    patch_vary_headers(response, ['Accept'])
+                    return response
+        
+        response = Response({
+            **fields,
+            'data': columnar_series(data_points, deltas) if columnar else data_points,
+            'count': len(data_points),
+            'next_cursor': next_cursor
         })
+        if etag:
+            response['ETag'] = etag
+            patch_vary_headers(response, ['Accept'])
+        return response
+    
+    @action(detail=False, methods=['post'], url_path='timeseries-batch')
+    def timeseries_batch(self, request):
+        """
+        Get time-series data for several series in one request.
+        
+        POST /api/v1/metrics/timeseries-batch
+        {
+            "series": [
+                {"metric_name": "cpu_usage", "source": "server1"},
+                {"metric_name": "memory_usage", "tags": ["env=prod", "region!=eu"]}
+            ],
+            "hours": 24, "step": "5m", "max_points": 800, "downsample": "lttb",
+            "shape": "columnar", "deltas": true
+        }
+        
+        Every series shares the window and resolution and is read with a
+        single query; ``timeseries`` is the one-series case of this endpoint,
+        including its ``shape``/``deltas`` options. A selector's ``tags`` are
+        filters in the syntax of the ``tag`` parameter.
+        """
+        selectors = request.data.get('series') if isinstance(request.data, dict) else None
+        if not isinstance(selectors, list) or not selectors:
+            return Response(
+                {'error': 'series must be a non-empty list of {metric_name, source} selectors'},
+                status=400
+            )
+        
+        max_series = settings.METRICS_BATCH_MAX_SERIES
+        if len(selectors) > max_series:
+            return Response(
+                {'error': f'At most {max_series} series can be requested at once'},
+                status=400
+            )
+        
+        if not all(isinstance(selector, dict) and selector.get('metric_name') for selector in selectors):
+            return Response(
+                {'error': 'Every series selector requires a metric_name'},
+                status=400
+            )
+        try:
+            selectors = [
+                SeriesSelector(
+                    str(selector['metric_name']),
+                    selector.get('source') or None,
+                    parse_tag_filters(selector.get('tags') or [])
+                )
+                for selector in selectors
+            ]
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        
+        try:
+            hours = int(request.data.get('hours', 24))
+            step = parse_duration(request.data['step']) if request.data.get('step') else None
+            max_points = int(request.data['max_points']) if request.data.get('max_points') else None
+            columnar, deltas = parse_shape(request.data)
+        except (TypeError, ValueError) as e:
+            return Response({'error': str(e)}, status=400)
+        
+        method = request.data.get('downsample', 'lttb')
+        if method not in DOWNSAMPLING_METHODS:
+            return Response(
+                {'error': f"downsample must be one of: {', '.join(DOWNSAMPLING_METHODS)}"},
+                status=400
+            )
+        
+        end_time = timezone.now()
+        start_time = end_time - timedelta(hours=hours)
+        resolution = choose_resolution(start_time, end_time, step=step, max_points=max_points)
+        
+        results = fetch_timeseries(selectors, start_time, resolution, max_points, method)
+        
+        response = {
+            'resolution': RESOLUTION_LABELS.get(resolution, 'raw'),
+            'bucket_seconds': effective_bucket_seconds(start_time, end_time, resolution, max_points),
+            'series': [
+                {
+                    'metric_name': selector.metric_name,
+                    'source': selector.source,
+                    'data': columnar_series(data_points, deltas) if columnar else data_points,
+                    'count': len(data_points)
+                }
+                for selector, data_points in zip(selectors, results)
+            ]
+        }
+        if max_points:
+            response['downsample'] = method
+        
+        return Response(response)
     
     @action(detail=False, methods=['get'])
-    def aggregates(self, request):
+    def buckets(self, request):
         """
-        Get aggregated statistics for a metric.
+        Aggregate a metric into fixed time buckets, grouped by source or tags.
+        
+        GET /api/v1/metrics/buckets?metric_name=cpu_usage&hours=24&step=5m&agg=avg,max&group_by=source
         
-        GET /api/v1/metrics/aggregates?metric_name=cpu_usage&hours=24
+        ``agg`` is any of avg/min/max/sum/count/last and ``group_by`` any of
+        ``source`` or tag keys. Buckets are aligned to multiples of ``step``
+        since the epoch and computed in the database, from rollups when
+        ``step`` is a whole number of rollup buckets. Every group carries one
+        array per aggregate, parallel to ``timestamps``.
         """
         metric_name = request.query_params.get('metric_name')
-        hours = int(request.query_params.get('hours', 24))
-        
         if not metric_name:
             return Response(
                 {'error': 'metric_name parameter is required'},
                 status=400
             )
         
-        start_time = timezone.now() - timedelta(hours=hours)
-        
-        aggregates = MonitoringData.objects.filter(
-            metric_name=metric_name,
-            timestamp__gte=start_time
-        ).aggregate(
-            avg=Avg('metric_value'),
-            min=Min('metric_value'),
-            max=Max('metric_value'),
-            count=Count('id')
-        )
+        try:
+            hours = int(request.query_params.get('hours', 24))
+            step = parse_duration(request.query_params.get('step', '5m'))
+            aggs = parse_aggregates(request.query_params.get('agg'))
+            group_by = parse_group_by(request.query_params.get('group_by'))
+            end_time = timezone.now()
+            result = bucketed_aggregates(
+                end_time - timedelta(hours=hours),
+                end_time,
+                step,
+                aggs=aggs,
+                group_by=group_by,
+                metric_names=[metric_name],
+                source=request.query_params.get('source')
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
         
         return Response({
             'metric_name': metric_name,
-            'time_range_hours': hours,
-            'statistics': aggregates
+            'step': int(step),
+            'agg': aggs,
+            'group_by': group_by,
+            'resolution': RESOLUTION_LABELS.get(result['resolution'], 'raw'),
+            'timestamps': result['timestamps'],
+            'groups': result['groups'],
         })
+    
+    @action(detail=False, methods=['get'])
+    def query(self, request):
+        """
+        Evaluate a PromQL-like expression over a time range.
+        
+        GET /api/v1/metrics/query?query=sum by (source) (rate(requests{region="eu"}[5m]))&hours=6&step=1m
+        
+        The expression is evaluated at every multiple of ``step`` in the
+        window. Queries are costed before they run and refused above
+        ``METRICS_QUERY_MAX_ROWS`` / ``METRICS_QUERY_MAX_SERIES``; with
+        ``explain=true`` only the plan and its cost are returned.
+        
+        With ``shape=columnar`` the shared grid is sent as ``t`` (epoch
+        milliseconds, delta-encoded with ``deltas=true``) and each series'
+        values as ``v``.
+        """
+        try:
+            hours = float(request.query_params.get('hours', 1))
+            step = parse_duration(request.query_params.get('step', '1m'))
+            columnar, deltas = parse_shape(request.query_params)
+            expr = metrics_query.parse(request.query_params.get('query', ''))
+            end_time = timezone.now()
+            plan = metrics_query.plan_query(expr, end_time - timedelta(hours=hours), end_time, step)
+            if request.query_params.get('explain') == 'true':
+                return Response(metrics_query.explain(plan))
+            result = metrics_query.evaluate(plan)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        
+        n_steps = len(plan.timestamps)
+        values_key = 'v' if columnar else 'values'
+        if isinstance(result, metrics_query.Vector):
+            series = [
+                {'labels': labels, values_key: values}
+                for labels, values in zip(result.labels, _json_rows(result.values))
+                if any(value is not None for value in values)
+            ]
+        else:
+            series = [{'labels': {}, values_key: _json_rows(np.full((1, n_steps), result))[0]}]
+        
+        response = {
+            'query': metrics_query.render(expr),
+            'step': plan.step,
+        }
+        if columnar:
+            response['t'] = encode_times(plan.timestamps, deltas)
+        else:
+            response['timestamps'] = plan.timestamps
+        response['result'] = series
+        return Response(response)
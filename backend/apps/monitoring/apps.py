@@ -5,3 +5,6 @@ class MonitoringConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.monitoring'
     verbose_name = 'Monitoring'
+
+    def ready(self):
+        from . import signals  # noqa: F401
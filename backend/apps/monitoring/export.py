@@ -0,0 +1,254 @@
+"""
+Columnar bulk export of monitoring data as Arrow IPC streams or Parquet.
+
+Rows are read from a server-side cursor ``MONITORING_EXPORT_BATCH_ROWS`` at a
+time, without joining the series catalog, merged in time order with the
+points compacted into chunks (decoded one chunk window at a time), and each
+batch becomes one Arrow record batch (one Parquet row group). ``source``, ``metric_name`` and
+``tags`` are dictionary-encoded against dictionaries that only ever grow as
+new series are seen, so an Arrow stream sends each value once as a
+dictionary delta. Memory is bounded by one batch plus the dictionaries.
+"""
+
+import heapq
+import json
+from operator import itemgetter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+from .models import MonitoringData, MonitoringSeries
+from .services.chunks import as_datetimes, chunk_windows
+
+FORMATS = {
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrow'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+DICTIONARY_COLUMNS = ('source', 'metric_name', 'tags')
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError('pyarrow is required for columnar exports')
+    return pyarrow
+
+
+def _compacted_rows(condition, start, end):
+    for series_ids, micros, values in chunk_windows(start, end, condition):
+        yield from zip(series_ids.tolist(), as_datetimes(micros), values.tolist())
+
+
+def export_rows(condition, start=None, end=None, batch_rows=None):
+    """
+    Iterate over the ``(series_id, timestamp, metric_value)`` rows of the
+    series matching ``condition`` in ``[start, end)`` (either end may be
+    None), oldest first, raw and compacted points alike.
+    """
+    bounds = {}
+    if start is not None:
+        bounds['timestamp__gte'] = start
+    if end is not None:
+        bounds['timestamp__lt'] = end
+    rows = MonitoringData.objects.filter(condition, **bounds).order_by('timestamp').values_list(
+        'series_id', 'timestamp', 'metric_value'
+    )
+    return heapq.merge(
+        _compacted_rows(condition, start, end),
+        rows.iterator(chunk_size=batch_rows or settings.MONITORING_EXPORT_BATCH_ROWS),
+        key=itemgetter(1)
+    )
+
+
+class _Sink:
+    """
+    Write-only file object that hands back whatever was written since the
+    last ``drain``.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class ColumnarEncoder:
+    """
+    Encode chunks of ``(series_id, timestamp, metric_value)`` rows.
+
+    Call ``missing_series`` with a chunk's rows, register the series it
+    returns through ``add_series``, then ``encode`` the chunk. ``encode``
+    and ``close`` return the bytes produced so far; when ``sink`` is a file,
+    everything is written to it instead and they return ``b''``.
+    """
+
+    def __init__(self, output, sink=None):
+        if output not in FORMATS:
+            raise ValueError(f"Unknown export format {output!r}; use one of {', '.join(FORMATS)}")
+        pa = self.pa = _pyarrow()
+        self.output = output
+        self.sink = sink if sink is not None else _Sink()
+        self.rows = 0
+
+        self.series = {}
+        self.values = {column: [] for column in DICTIONARY_COLUMNS}
+        self.positions = {column: {} for column in DICTIONARY_COLUMNS}
+        self.arrays = {}
+
+        self.schema = pa.schema([
+            ('timestamp', pa.timestamp('us', tz='UTC')),
+            ('source', pa.dictionary(pa.int32(), pa.string())),
+            ('metric_name', pa.dictionary(pa.int32(), pa.string())),
+            ('tags', pa.dictionary(pa.int32(), pa.string())),
+            ('metric_value', pa.float64()),
+        ])
+        if output == 'arrow':
+            options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+            self.writer = pa.ipc.new_stream(self.sink, self.schema, options=options)
+        else:
+            self.writer = pa.parquet.ParquetWriter(self.sink, self.schema, compression='zstd')
+
+    def missing_series(self, rows):
+        return {row[0] for row in rows} - self.series.keys()
+
+    def add_series(self, series):
+        """
+        Register ``(id, source, metric_name, tags)`` catalog rows.
+        """
+        for series_id, source, metric_name, tags in series:
+            labels = (source, metric_name, json.dumps(tags or {}, sort_keys=True))
+            self.series[series_id] = tuple(
+                self._index(column, value) for column, value in zip(DICTIONARY_COLUMNS, labels)
+            )
+
+    def _index(self, column, value):
+        positions = self.positions[column]
+        if value not in positions:
+            positions[value] = len(self.values[column])
+            self.values[column].append(value)
+            self.arrays.pop(column, None)
+        return positions[value]
+
+    def _dictionary(self, column):
+        if column not in self.arrays:
+            self.arrays[column] = self.pa.array(self.values[column], type=self.pa.string())
+        return self.arrays[column]
+
+    def encode(self, rows):
+        if rows:
+            pa = self.pa
+            series_ids, timestamps, values = zip(*rows)
+            codes = list(zip(*(self.series[series_id] for series_id in series_ids)))
+            columns = [pa.array(timestamps, type=pa.timestamp('us', tz='UTC'))]
+            for column, indices in zip(DICTIONARY_COLUMNS, codes):
+                columns.append(pa.DictionaryArray.from_arrays(
+                    pa.array(indices, type=pa.int32()), self._dictionary(column)
+                ))
+            columns.append(pa.array(values, type=pa.float64()))
+            self.writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=self.schema))
+            self.rows += len(rows)
+        return self._drain()
+
+    def close(self):
+        self.writer.close()
+        return self._drain()
+
+    def _drain(self):
+        return self.sink.drain() if isinstance(self.sink, _Sink) else b''
+
+
+def _catalog(series_ids):
+    return MonitoringSeries.objects.filter(id__in=series_ids).values_list('id', 'source', 'metric_name', 'tags')
+
+
+def _chunks(rows, batch_rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= batch_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _sync_stream(encoder, rows, batch_rows):
+    yield encoder.encode([])
+    for chunk in _chunks(rows, batch_rows):
+        missing = encoder.missing_series(chunk)
+        if missing:
+            encoder.add_series(_catalog(missing))
+        yield encoder.encode(chunk)
+    yield encoder.close()
+
+
+def write_export(condition, output, sink, start=None, end=None, batch_rows=None):
+    """
+    Export the rows of ``export_rows`` to ``sink`` (a path or a binary file
+    object).
+
+    Returns the number of rows written.
+    """
+    batch_rows = batch_rows or settings.MONITORING_EXPORT_BATCH_ROWS
+    encoder = ColumnarEncoder(output, sink)
+    for _ in _sync_stream(encoder, export_rows(condition, start, end, batch_rows), batch_rows):
+        pass
+    return encoder.rows
+
+
+async def _async_stream(encoder, rows, batch_rows):
+    # Each step reads and encodes one batch in the ORM's sync thread, which
+    # keeps the cursor on one connection and the encoding off the event loop
+    chunks = _sync_stream(encoder, rows, batch_rows)
+    while True:
+        data = await sync_to_async(next)(chunks, None)
+        if data is None:
+            break
+        yield data
+
+
+def stream_export(request, condition, output, start=None, end=None, batch_rows=None):
+    """
+    Stream the rows of ``export_rows`` as an Arrow IPC stream or a Parquet
+    file.
+
+    Under ASGI each batch is read and encoded in a worker thread; under WSGI
+    the server-side cursor is iterated directly.
+    """
+    batch_rows = batch_rows or settings.MONITORING_EXPORT_BATCH_ROWS
+    encoder = ColumnarEncoder(output)
+    rows = export_rows(condition, start, end, batch_rows)
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        content = _async_stream(encoder, rows, batch_rows)
+    else:
+        content = _sync_stream(encoder, rows, batch_rows)
+
+    content_type, extension = FORMATS[output]
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="monitoring-data.{extension}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
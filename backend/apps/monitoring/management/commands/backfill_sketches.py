@@ -0,0 +1,66 @@
+"""
+Fold monitoring data stored before sketches were maintained into them.
+"""
+
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.monitoring.models import MonitoringData, MonitoringRollup, MonitoringSketch
+from apps.monitoring.services.chunks import MICROSECONDS, chunk_windows
+from apps.monitoring.services.sketches import update_sketches
+
+
+class Command(BaseCommand):
+    help = (
+        'Add monitoring data points (raw and compacted) from before --until (default: the first '
+        'sketched minute) to the quantile sketches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='How far back to backfill.')
+        parser.add_argument('--until', help='ISO timestamp; points at or after it are left alone.')
+        parser.add_argument('--chunk-size', type=int, default=50_000)
+
+    def handle(self, *args, **options):
+        if options['until']:
+            try:
+                until = datetime.fromisoformat(options['until'])
+            except ValueError:
+                raise CommandError(f"Invalid --until timestamp: {options['until']!r}")
+            if timezone.is_naive(until):
+                until = timezone.make_aware(until)
+        else:
+            first = MonitoringSketch.objects.filter(
+                resolution=MonitoringRollup.RESOLUTION_MINUTE
+            ).order_by('bucket').values_list('bucket', flat=True).first()
+            until = first or timezone.now()
+
+        start = until - timedelta(days=options['days'])
+        rows = MonitoringData.objects.filter(
+            timestamp__gte=start, timestamp__lt=until
+        ).order_by().values_list('series_id', 'timestamp', 'metric_value')
+
+        total = 0
+        chunk = []
+        for row in rows.iterator(chunk_size=options['chunk_size']):
+            chunk.append(row)
+            if len(chunk) >= options['chunk_size']:
+                total += self._fold(chunk)
+                chunk = []
+        total += self._fold(chunk)
+
+        for series_ids, micros, values in chunk_windows(start, until):
+            update_sketches(series_ids, micros // MICROSECONDS, values)
+            total += len(values)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Folded {total} points from [{start.isoformat()}, {until.isoformat()}) into sketches"
+        ))
+
+    def _fold(self, chunk):
+        if chunk:
+            series_ids, timestamps, values = zip(*chunk)
+            update_sketches(series_ids, [timestamp.timestamp() for timestamp in timestamps], values)
+        return len(chunk)
@@ -0,0 +1,166 @@
+"""
+Compare the previous and current monitoring_data index sets on ingest and
+read time.
+"""
+
+import csv
+import io
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+# Each set is built on its own scratch copy of the monitoring_data columns
+INDEX_SETS = {
+    'btree': [
+        'CREATE INDEX ON {table} (timestamp)',
+        'CREATE INDEX ON {table} (series_id, timestamp)',
+    ],
+    'covering': [
+        'CREATE INDEX ON {table} (series_id, timestamp) INCLUDE (metric_value, id)',
+        'CREATE INDEX ON {table} (timestamp DESC)',
+    ],
+}
+
+# The hot read paths: series windows (timeseries, PromQL), their statistics
+# (rollup edges), time-only scans (counters, sketch backfill, export) and
+# unfiltered newest-first pages (monitoring list and query)
+QUERIES = {
+    'series_range': '''
+        SELECT timestamp, metric_value, id FROM {table}
+        WHERE series_id = ANY(%(series)s) AND timestamp >= %(since)s
+        ORDER BY series_id, timestamp, id
+    ''',
+    'series_stats': '''
+        SELECT count(id), sum(metric_value), min(metric_value), max(metric_value) FROM {table}
+        WHERE series_id = ANY(%(series)s) AND timestamp >= %(since)s
+    ''',
+    'time_count': '''
+        SELECT count(*) FROM {table}
+        WHERE timestamp >= %(since)s AND timestamp < %(until)s
+    ''',
+    'newest_page': '''
+        SELECT id, series_id, timestamp, metric_value FROM {table}
+        ORDER BY timestamp DESC
+        LIMIT 100
+    ''',
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark ingest and query time of the previous and current index sets on monitoring_data.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--series', type=int, default=1000)
+        parser.add_argument(
+            '--query-series', type=int, default=10,
+            help='Number of series read by the series queries.'
+        )
+        parser.add_argument(
+            '--window', type=float, default=0.1,
+            help='Fraction of the time span read by each query.'
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('benchmark_indexes requires PostgreSQL')
+
+        span = options['rows'] // options['series']
+        start = timezone.now() - timedelta(seconds=span)
+        payload = self._generate(options['rows'], options['series'], start)
+        since = start + timedelta(seconds=span * (1 - options['window']))
+        params = {
+            'series': random.sample(range(1, options['series'] + 1), min(options['query_series'], options['series'])),
+            'since': since,
+            'until': timezone.now(),
+        }
+
+        self.stdout.write(
+            f"{'indexes':<16}{'rows/sec':>12}{'index MB':>10}"
+            + ''.join(f'{name + " ms":>16}' for name in QUERIES)
+        )
+        plans = {}
+        for index_set, statements in INDEX_SETS.items():
+            table = f"bench_{index_set.replace('+', '_')}"
+            with connection.cursor() as cursor:
+                try:
+                    ingest, index_bytes, timings, plans[index_set] = self._run(
+                        cursor, table, statements, payload, params, options['repeat']
+                    )
+                finally:
+                    cursor.execute(f'DROP TABLE IF EXISTS {table}')
+            self.stdout.write(
+                f"{index_set:<16}{options['rows'] / ingest:>12,.0f}{index_bytes / 2 ** 20:>10.1f}"
+                + ''.join(f'{timings[name] * 1000:>16.2f}' for name in QUERIES)
+            )
+
+        for index_set, nodes in plans.items():
+            self.stdout.write(f"{index_set}: " + ', '.join(f'{name}={node}' for name, node in nodes.items()))
+
+    def _run(self, cursor, table, statements, payload, params, repeat):
+        cursor.execute(f'''
+            CREATE TEMPORARY TABLE {table} (
+                id bigserial,
+                series_id bigint NOT NULL,
+                timestamp timestamp with time zone NOT NULL,
+                metric_value double precision NOT NULL,
+                PRIMARY KEY (id, timestamp)
+            )
+        ''')
+        for statement in statements:
+            cursor.execute(statement.format(table=table))
+
+        payload.seek(0)
+        started = time.perf_counter()
+        cursor.copy_expert(
+            f'COPY {table} (series_id, timestamp, metric_value) FROM STDIN WITH (FORMAT csv)', payload
+        )
+        ingest = time.perf_counter() - started
+
+        # Index-only scans need the visibility map that VACUUM sets
+        cursor.execute(f'VACUUM ANALYZE {table}')
+        cursor.execute('SELECT pg_indexes_size(%s)', [table])
+        index_bytes = cursor.fetchone()[0]
+
+        timings, nodes = {}, {}
+        for name, sql in QUERIES.items():
+            sql = sql.format(table=table)
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                cursor.execute(sql, params)
+                cursor.fetchall()
+                samples.append(time.perf_counter() - started)
+            timings[name] = statistics.median(samples)
+
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            nodes[name] = self._scan_node(cursor.fetchone()[0][0]['Plan'])
+        return ingest, index_bytes, timings, nodes
+
+    def _scan_node(self, plan):
+        if 'Relation Name' in plan:
+            return plan['Node Type']
+        for child in plan.get('Plans', []):
+            node = self._scan_node(child)
+            if node:
+                return node
+        return None
+
+    @staticmethod
+    def _generate(rows, series, start):
+        # One point per series per second, written in time order like live ingest
+        payload = io.StringIO()
+        writer = csv.writer(payload, lineterminator='\n')
+        for i in range(rows):
+            writer.writerow((
+                i % series + 1,
+                (start + timedelta(seconds=i // series)).isoformat(),
+                repr(random.random() * 100),
+            ))
+        return payload
@@ -0,0 +1,98 @@
+"""
+Compare ORM and COPY write throughput for monitoring data.
+"""
+
+import random
+import time
+from datetime import timedelta
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.monitoring.models import MonitoringData
+from apps.monitoring.services.bulk_writer import copy_points
+from apps.monitoring.services.series import series_catalog
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark rows/sec of ORM bulk_create versus COPY for monitoring_data writes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[10_000, 100_000, 1_000_000],
+            help='Batch sizes to benchmark.'
+        )
+        parser.add_argument(
+            '--methods', nargs='+', choices=['orm', 'copy'], default=['orm', 'copy'],
+            help='Write paths to benchmark.'
+        )
+        parser.add_argument('--sources', type=int, default=50)
+        parser.add_argument('--metrics', type=int, default=20)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Keep the generated rows instead of rolling back.'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'method':<8}{'rows':>12}{'seconds':>12}{'rows/sec':>14}")
+        for size in options['sizes']:
+            # Points are generated lazily; subtract the generation cost so only
+            # the write path is measured.
+            started = time.perf_counter()
+            for _ in self._generate(size, options['sources'], options['metrics']):
+                pass
+            generation = time.perf_counter() - started
+
+            for method in options['methods']:
+                points = self._generate(size, options['sources'], options['metrics'])
+                elapsed = max(self._run(method, points, options['keep']) - generation, 1e-9)
+                self.stdout.write(f"{method:<8}{size:>12,}{elapsed:>12.2f}{size / elapsed:>14,.0f}")
+
+    def _run(self, method, points, keep):
+        started = time.perf_counter()
+        try:
+            with transaction.atomic():
+                self._write(method, points)
+                elapsed = time.perf_counter() - started
+                if not keep:
+                    raise _Rollback()
+        except _Rollback:
+            pass
+        return elapsed
+
+    @staticmethod
+    def _write(method, points):
+        points = iter(points)
+        while True:
+            batch = list(islice(points, 5000))
+            if not batch:
+                return
+            rows = [
+                (series_id, point['timestamp'], point['metric_value'])
+                for series_id, point in zip(series_catalog.resolve(batch), batch)
+            ]
+            if method == 'copy':
+                copy_points(rows)
+            else:
+                MonitoringData.objects.bulk_create(
+                    MonitoringData(series_id=series_id, timestamp=timestamp, metric_value=value)
+                    for series_id, timestamp, value in rows
+                )
+
+    @staticmethod
+    def _generate(size, sources, metrics):
+        start = timezone.now() - timedelta(seconds=size)
+        for i in range(size):
+            yield {
+                'timestamp': start + timedelta(seconds=i),
+                'source': f'bench-source-{i % sources}',
+                'metric_name': f'bench_metric_{i % metrics}',
+                'metric_value': random.random() * 100,
+                'tags': {'env': 'bench', 'shard': str(i % 4)},
+            }
@@ -0,0 +1,67 @@
+"""
+Move cold monitoring_data points into compressed chunks.
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from apps.monitoring.models import MonitoringData
+from apps.monitoring.services.compaction import compact_cold_data
+
+
+class Command(BaseCommand):
+    help = 'Compact monitoring_data points older than --days into Gorilla-encoded per-series chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=float, default=None,
+            help='Compact points older than this (defaults to MONITORING_COMPACT_AFTER_DAYS).'
+        )
+
+    def handle(self, *args, **options):
+        before = None
+        if options['days'] is not None:
+            before = timezone.now() - timedelta(days=options['days'])
+
+        started = time.perf_counter()
+        result = compact_cold_data(before)
+        elapsed = time.perf_counter() - started
+
+        for name in result['partitions']:
+            self.stdout.write(f'Dropped {name}')
+        if not result['points']:
+            self.stdout.write('Nothing to compact')
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted {result['points']} points into {result['chunks']} chunks in {elapsed:.1f}s: "
+            f"{result['bytes'] / result['points']:.1f} bytes/point"
+        ))
+        raw = self._raw_bytes_per_row()
+        if raw:
+            self.stdout.write(
+                f"Raw rows take {raw:.1f} bytes each with indexes "
+                f"({raw * result['points'] / result['bytes']:.1f}x the chunked size)"
+            )
+
+    @staticmethod
+    def _raw_bytes_per_row():
+        if connection.vendor != 'postgresql':
+            return None
+        table = MonitoringData._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                '''
+                SELECT COALESCE(SUM(pg_total_relation_size(oid)), 0), COALESCE(SUM(GREATEST(reltuples, 0)), 0)
+                FROM pg_class
+                WHERE oid = %s::regclass
+                   OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)
+                ''',
+                [table, table]
+            )
+            size, rows = cursor.fetchone()
+        return size / rows if rows else None
@@ -0,0 +1,117 @@
+"""
+Consume monitoring data points from Kafka (or the in-memory broker).
+"""
+
+import json
+import random
+import signal
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from apps.monitoring.services.brokers import get_consumer_client, memory_broker
+from apps.monitoring.services.consumer import IngestConsumer
+
+
+class Command(BaseCommand):
+    help = (
+        'Read monitoring data points from broker topics in batches and write them '
+        'through the bulk ingest path. Run one per pod with a shared group id to scale out.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--broker', choices=['kafka', 'memory'], default=None,
+            help='Broker backend (defaults to MONITORING_KAFKA_BROKER).'
+        )
+        parser.add_argument('--topics', nargs='+', default=None, help='Topics (defaults to MONITORING_KAFKA_TOPICS).')
+        parser.add_argument('--group', default=None, help='Consumer group id (defaults to MONITORING_KAFKA_GROUP_ID).')
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--batch-timeout', type=float, default=None)
+        parser.add_argument('--max-messages', type=int, default=None, help='Stop after this many messages.')
+        parser.add_argument(
+            '--generate', type=int, default=0,
+            help='Load test: produce this many synthetic points to the in-memory broker first.'
+        )
+        parser.add_argument(
+            '--consumers', type=int, default=1,
+            help='Number of consumers in the group to run in this process (in-memory broker only).'
+        )
+
+    def handle(self, *args, **options):
+        broker = options['broker'] or settings.MONITORING_KAFKA_BROKER
+        topics = options['topics'] or settings.MONITORING_KAFKA_TOPICS
+        group_id = options['group'] or settings.MONITORING_KAFKA_GROUP_ID
+
+        if broker != 'memory' and (options['generate'] or options['consumers'] > 1):
+            raise CommandError('--generate and --consumers are only supported with --broker memory')
+
+        if options['generate']:
+            self._generate(topics[0], options['generate'])
+
+        consumers = [
+            IngestConsumer(
+                get_consumer_client(group_id, topics, broker),
+                batch_size=options['batch_size'],
+                batch_timeout=options['batch_timeout'],
+            )
+            for _ in range(options['consumers'])
+        ]
+
+        def stop(signum, frame):
+            for consumer in consumers:
+                consumer.stop()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        started = time.perf_counter()
+        if len(consumers) == 1:
+            consumers[0].run(options['max_messages'])
+        else:
+            threads = [
+                threading.Thread(target=self._run_until_drained, args=(consumer, group_id), daemon=True)
+                for consumer in consumers
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - started
+
+        accepted = sum(consumer.stats['accepted'] for consumer in consumers)
+        rejected = sum(consumer.stats['rejected'] for consumer in consumers)
+        messages = sum(consumer.stats['messages'] for consumer in consumers)
+        self.stdout.write(
+            f'Consumed {messages} messages: {accepted} points accepted, {rejected} rejected '
+            f'in {elapsed:.2f}s ({accepted / max(elapsed, 1e-9):,.0f} points/sec)'
+        )
+
+    def _run_until_drained(self, consumer, group_id):
+        try:
+            while not consumer.stopped:
+                messages = consumer.poll_batch()
+                if messages:
+                    consumer.process(messages)
+                elif not memory_broker.lag(group_id):
+                    break
+        finally:
+            consumer.client.close()
+            connection.close()
+
+    def _generate(self, topic, count):
+        now = timezone.now()
+        for index in range(count):
+            memory_broker.produce(topic, json.dumps({
+                'source': f'source-{index % 50}',
+                'metric_name': f'metric_{index % 20}',
+                'metric_value': random.random() * 100,
+                'timestamp': (now - timedelta(seconds=index)).isoformat(),
+                'tags': {},
+            }))
+        self.stdout.write(f'Produced {count} points to the in-memory broker')
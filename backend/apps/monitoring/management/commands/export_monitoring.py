@@ -0,0 +1,75 @@
+"""
+Export a slice of monitoring data to an Arrow IPC stream or Parquet file.
+"""
+
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.monitoring.export import FORMATS, write_export
+from apps.monitoring.services.tags import parse_tag_filters, tag_condition
+
+
+def _timestamp(value, option):
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise CommandError(f'Invalid {option} timestamp: {value!r}')
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+class Command(BaseCommand):
+    help = (
+        'Write monitoring data points (raw and compacted) matching the filters to PATH as an Arrow IPC '
+        'stream or a Parquet file (chosen by --format or the file extension).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Output file.')
+        parser.add_argument('--format', choices=list(FORMATS), help='Defaults to the extension of PATH.')
+        parser.add_argument('--source')
+        parser.add_argument('--metric-name')
+        parser.add_argument(
+            '--tag', action='append', default=[],
+            help='Tag filter (key=value, key=v1,v2 or key!=value); may be repeated.'
+        )
+        parser.add_argument('--start', help='ISO timestamp; rows at or after it are exported.')
+        parser.add_argument('--end', help='ISO timestamp; rows at or before it are exported.')
+        parser.add_argument('--batch-rows', type=int, help='Rows per record batch / row group.')
+
+    def handle(self, *args, **options):
+        output = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if output not in FORMATS:
+            raise CommandError(f"Cannot infer the format of {options['path']!r}; pass --format")
+
+        condition = Q()
+        if options['source']:
+            condition &= Q(series__source=options['source'])
+        if options['metric_name']:
+            condition &= Q(series__metric_name=options['metric_name'])
+        try:
+            tags = parse_tag_filters(options['tag'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if tags:
+            condition &= tag_condition(tags)
+        start = _timestamp(options['start'], '--start') if options['start'] else None
+        # --end is inclusive
+        end = _timestamp(options['end'], '--end') + timedelta(microseconds=1) if options['end'] else None
+
+        started = time.perf_counter()
+        try:
+            rows = write_export(
+                condition, output, options['path'], start=start, end=end, batch_rows=options['batch_rows']
+            )
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {rows} rows to {options['path']} in {elapsed:.1f}s "
+            f"({rows / elapsed if elapsed else 0:,.0f} rows/s)"
+        ))
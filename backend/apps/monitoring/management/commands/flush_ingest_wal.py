@@ -0,0 +1,35 @@
+"""
+Drain the write-behind ingest log into Postgres.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.monitoring.services.wal import flush_wal
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay orphaned write-behind segments and flush all sealed segments '
+        'into monitoring_data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default=None, help='WAL directory (defaults to MONITORING_WAL_DIR).')
+        parser.add_argument('--loop', action='store_true', help='Keep flushing on an interval.')
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help='Seconds between flushes with --loop (defaults to MONITORING_WAL_FLUSH_INTERVAL).'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or settings.MONITORING_WAL_FLUSH_INTERVAL
+        while True:
+            count = flush_wal(options['directory'])
+            if count or not options['loop']:
+                self.stdout.write(f'Flushed {count} monitoring data points')
+            if not options['loop']:
+                return
+            time.sleep(interval)
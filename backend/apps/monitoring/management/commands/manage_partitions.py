@@ -0,0 +1,44 @@
+"""
+Create upcoming monitoring_data partitions and apply retention.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.monitoring.services.partitions import (
+    drop_expired_partitions,
+    ensure_partitions,
+    is_partitioned,
+    list_partitions,
+)
+
+
+class Command(BaseCommand):
+    help = 'Pre-create future monitoring_data partitions and drop partitions past retention.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--premake-days', type=int, default=None,
+            help='Days of partitions to create ahead (defaults to MONITORING_PARTITION_PREMAKE_DAYS).'
+        )
+        parser.add_argument(
+            '--retention-days', type=int, default=None,
+            help='Drop partitions older than this (defaults to MONITORING_RAW_RETENTION_DAYS).'
+        )
+        parser.add_argument('--no-drop', action='store_true', help='Only create partitions.')
+        parser.add_argument('--list', action='store_true', help='List partitions and exit.')
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            raise CommandError('monitoring_data is not a partitioned table on this database.')
+
+        if options['list']:
+            for name, start, end in list_partitions():
+                self.stdout.write(f'{name}  [{start.isoformat()}, {end.isoformat()})')
+            return
+
+        for name in ensure_partitions(premake_days=options['premake_days']):
+            self.stdout.write(f'Created {name}')
+
+        if not options['no_drop']:
+            for name in drop_expired_partitions(retention_days=options['retention_days']):
+                self.stdout.write(f'Dropped {name}')
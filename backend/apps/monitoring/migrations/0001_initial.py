@@ -0,0 +1,47 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonitoringSource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('description', models.TextField(blank=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('last_seen', models.DateTimeField(blank=True, null=True)),
+                ('metadata', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'monitoring_sources',
+            },
+        ),
+        migrations.CreateModel(
+            name='MonitoringData',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(db_index=True)),
+                ('source', models.CharField(db_index=True, max_length=255)),
+                ('metric_name', models.CharField(db_index=True, max_length=255)),
+                ('metric_value', models.FloatField()),
+                ('tags', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'monitoring_data',
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['timestamp', 'source'], name='monitoring__timesta_34ba8f_idx'), models.Index(fields=['timestamp', 'metric_name'], name='monitoring__timesta_009f49_idx'), models.Index(fields=['source', 'metric_name'], name='monitoring__source_13af31_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,124 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:05
+
+import hashlib
+import json
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def _series_key(source, metric_name, tags):
+    """
+    Digest identifying a series, as computed when this migration was written.
+    """
+    identity = json.dumps([source, metric_name, tags or {}], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(identity.encode()).hexdigest()
+
+
+def populate_series(apps, schema_editor):
+    """
+    Intern every existing (source, metric_name, tags) combination and point
+    its data rows at the new series.
+    """
+    MonitoringData = apps.get_model('monitoring', 'MonitoringData')
+    MonitoringSeries = apps.get_model('monitoring', 'MonitoringSeries')
+
+    # order_by() drops Meta.ordering, which would otherwise add timestamp to the DISTINCT
+    combinations = list(
+        MonitoringData.objects.values_list('source', 'metric_name', 'tags').order_by().distinct().iterator()
+    )
+    series = {}
+    for source, metric_name, tags in combinations:
+        key = _series_key(source, metric_name, tags)
+        series.setdefault(key, MonitoringSeries(key=key, source=source, metric_name=metric_name, tags=tags or {}))
+    MonitoringSeries.objects.bulk_create(series.values(), batch_size=BATCH_SIZE)
+
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            '''
+            UPDATE monitoring_data AS data SET series_id = series.id
+            FROM monitoring_series AS series
+            WHERE data.source = series.source
+              AND data.metric_name = series.metric_name
+              AND data.tags = series.tags
+            '''
+        )
+        # jsonb compares equal tags equal; only falsy tags other than {} are left
+        combinations = [combination for combination in combinations if not combination[2] and combination[2] != {}]
+
+    ids = dict(MonitoringSeries.objects.values_list('key', 'id'))
+    for source, metric_name, tags in combinations:
+        MonitoringData.objects.filter(
+            series__isnull=True, source=source, metric_name=metric_name, tags=tags
+        ).update(series_id=ids[_series_key(source, metric_name, tags)])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonitoringSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=40, unique=True)),
+                ('source', models.CharField(max_length=255)),
+                ('metric_name', models.CharField(max_length=255)),
+                ('tags', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'monitoring series',
+                'db_table': 'monitoring_series',
+                'indexes': [models.Index(fields=['metric_name', 'source'], name='monitoring__metric__1f3077_idx'), models.Index(fields=['source'], name='monitoring__source_d9de15_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='monitoringdata',
+            name='series',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='data_points', to='monitoring.monitoringseries'),
+        ),
+        migrations.RunPython(populate_series, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='monitoringdata',
+            name='monitoring__timesta_34ba8f_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='monitoringdata',
+            name='monitoring__timesta_009f49_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='monitoringdata',
+            name='monitoring__source_13af31_idx',
+        ),
+        migrations.RemoveField(
+            model_name='monitoringdata',
+            name='created_at',
+        ),
+        migrations.RemoveField(
+            model_name='monitoringdata',
+            name='metric_name',
+        ),
+        migrations.RemoveField(
+            model_name='monitoringdata',
+            name='source',
+        ),
+        migrations.RemoveField(
+            model_name='monitoringdata',
+            name='tags',
+        ),
+        migrations.AlterField(
+            model_name='monitoringdata',
+            name='series',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='data_points', to='monitoring.monitoringseries'),
+        ),
+        migrations.AddIndex(
+            model_name='monitoringdata',
+            index=models.Index(fields=['series', 'timestamp'], name='monitoring__series__ce15f4_idx'),
+        ),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:20
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_monitoring_data(apps, schema_editor):
+    """
+    Rebuild monitoring_data as a table range-partitioned by timestamp.
+
+    The existing rows are copied into partitions covering their time
+    span, and the indexes Django created are recreated under the same names
+    on the partitioned parent so later migrations can keep managing them.
+
+    Partitions are laid out like ``services.partitions`` does, without
+    importing it: windows of ``MONITORING_PARTITION_DAYS`` days aligned to
+    the epoch and named after their lower bound.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, 'monitoring_data')
+        indexes = [
+            (name, info['columns'])
+            for name, info in constraints.items()
+            if info['index'] and not info['primary_key'] and not info['unique']
+        ]
+
+        cursor.execute('ALTER TABLE monitoring_data RENAME TO monitoring_data_unpartitioned')
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+        for name, info in constraints.items():
+            if info['primary_key']:
+                cursor.execute(
+                    f'ALTER TABLE monitoring_data_unpartitioned '
+                    f'RENAME CONSTRAINT {connection.ops.quote_name(name)} TO monitoring_data_unpartitioned_pkey'
+                )
+
+        # Identity columns are not supported on partitioned tables before
+        # PostgreSQL 17, so ids come from a plain sequence owned by the column.
+        cursor.execute('CREATE SEQUENCE monitoring_data_id_seq_partitioned')
+        cursor.execute('''
+            CREATE TABLE monitoring_data (
+                id bigint NOT NULL DEFAULT nextval('monitoring_data_id_seq_partitioned'),
+                series_id bigint NOT NULL
+                    REFERENCES monitoring_series (id) DEFERRABLE INITIALLY DEFERRED,
+                timestamp timestamp with time zone NOT NULL,
+                metric_value double precision NOT NULL,
+                PRIMARY KEY (id, timestamp)
+            ) PARTITION BY RANGE (timestamp)
+        ''')
+        cursor.execute('ALTER SEQUENCE monitoring_data_id_seq_partitioned OWNED BY monitoring_data.id')
+        cursor.execute('CREATE TABLE monitoring_data_default PARTITION OF monitoring_data DEFAULT')
+
+        cursor.execute('SELECT min(timestamp), max(id) FROM monitoring_data_unpartitioned')
+        oldest, max_id = cursor.fetchone()
+        if max_id is not None:
+            cursor.execute("SELECT setval('monitoring_data_id_seq_partitioned', %s)", [max_id])
+
+        # Cover the existing rows; anything newer than the premake horizon lands in the default partition
+        now = timezone.now()
+        width = timedelta(days=getattr(settings, 'MONITORING_PARTITION_DAYS', 1))
+        horizon = now + timedelta(days=getattr(settings, 'MONITORING_PARTITION_PREMAKE_DAYS', 7))
+        window = EPOCH + ((oldest or now) - EPOCH) // width * width
+        while window <= horizon:
+            cursor.execute(
+                f'CREATE TABLE monitoring_data_p{window:%Y%m%d} PARTITION OF monitoring_data '
+                'FOR VALUES FROM (%s) TO (%s)',
+                [window, window + width]
+            )
+            window += width
+
+        cursor.execute('''
+            INSERT INTO monitoring_data (id, series_id, timestamp, metric_value)
+            SELECT id, series_id, timestamp, metric_value FROM monitoring_data_unpartitioned
+        ''')
+        # Run the deferred foreign key checks now: CREATE INDEX refuses a table with pending trigger events
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        for name, columns in indexes:
+            column_list = ', '.join(connection.ops.quote_name(column) for column in columns)
+            cursor.execute(
+                f'CREATE INDEX {connection.ops.quote_name(name)} ON monitoring_data ({column_list})'
+            )
+        cursor.execute('DROP TABLE monitoring_data_unpartitioned')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0002_series_catalog'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_monitoring_data, migrations.RunPython.noop),
+    ]
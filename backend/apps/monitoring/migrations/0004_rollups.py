@@ -0,0 +1,61 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    Build every rollup tier from the raw data already stored.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        for resolution in (60, 3600, 86400):
+            cursor.execute('''
+                INSERT INTO monitoring_rollups (series_id, resolution, bucket, count, sum, min, max)
+                SELECT
+                    series_id,
+                    %s,
+                    to_timestamp(floor(extract(epoch FROM timestamp) / %s) * %s) AS bucket,
+                    count(*),
+                    sum(metric_value),
+                    min(metric_value),
+                    max(metric_value)
+                FROM monitoring_data
+                GROUP BY series_id, bucket
+            ''', [resolution, resolution, resolution])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0003_partition_monitoring_data'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonitoringRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.PositiveIntegerField(choices=[(60, '1m'), (3600, '1h'), (86400, '1d')])),
+                ('bucket', models.DateTimeField()),
+                ('count', models.BigIntegerField()),
+                ('sum', models.FloatField()),
+                ('min', models.FloatField()),
+                ('max', models.FloatField()),
+                ('series', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='monitoring.monitoringseries')),
+            ],
+            options={
+                'db_table': 'monitoring_rollups',
+                'indexes': [models.Index(fields=['resolution', 'bucket'], name='monitoring__resolut_ff3b3c_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monitoringrollup',
+            constraint=models.UniqueConstraint(fields=('series', 'resolution', 'bucket'), name='monitoring_rollup_unique_bucket'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
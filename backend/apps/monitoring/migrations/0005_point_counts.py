@@ -0,0 +1,51 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:09
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncMinute
+from django.utils import timezone
+
+
+def backfill_point_counts(apps, schema_editor):
+    """
+    Count the points already stored: one row per minute inside the counter
+    retention, and everything older in the base row.
+    """
+    MonitoringData = apps.get_model('monitoring', 'MonitoringData')
+    MonitoringPointCount = apps.get_model('monitoring', 'MonitoringPointCount')
+
+    cutoff = timezone.now() - timedelta(hours=settings.MONITORING_COUNTER_MINUTE_RETENTION_HOURS)
+    cutoff = cutoff.replace(second=0, microsecond=0)
+    minutes = MonitoringData.objects.filter(timestamp__gte=cutoff).order_by().annotate(
+        minute=TruncMinute('timestamp', tzinfo=dt_timezone.utc)
+    ).values('minute').annotate(count=Count('id'))
+
+    rows = [MonitoringPointCount(bucket=row['minute'], count=row['count']) for row in minutes]
+    older = MonitoringData.objects.filter(timestamp__lt=cutoff).count()
+    rows.append(MonitoringPointCount(bucket=datetime(1970, 1, 1, tzinfo=dt_timezone.utc), count=older))
+    MonitoringPointCount.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0004_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonitoringPointCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(unique=True)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'monitoring_point_counts',
+            },
+        ),
+        migrations.RunPython(backfill_point_counts, migrations.RunPython.noop),
+    ]
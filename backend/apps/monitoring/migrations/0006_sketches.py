@@ -0,0 +1,32 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0005_point_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonitoringSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.PositiveIntegerField(choices=[(60, '1m'), (3600, '1h'), (86400, '1d')])),
+                ('bucket', models.DateTimeField()),
+                ('sketch', models.BinaryField()),
+                ('series', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='sketches', to='monitoring.monitoringseries')),
+            ],
+            options={
+                'db_table': 'monitoring_sketches',
+                'indexes': [models.Index(fields=['resolution', 'bucket'], name='monitoring__resolut_7b01f8_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monitoringsketch',
+            constraint=models.UniqueConstraint(fields=('series', 'resolution', 'bucket'), name='monitoring_sketch_unique_bucket'),
+        ),
+    ]
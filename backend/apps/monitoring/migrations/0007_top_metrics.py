@@ -0,0 +1,76 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:16
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.utils import timezone
+
+
+def backfill_top_metrics(apps, schema_editor):
+    """
+    Build exact hourly summaries from the 1-hour rollups, keeping the
+    largest counters up to the configured capacity.
+    """
+    MonitoringRollup = apps.get_model('monitoring', 'MonitoringRollup')
+    MonitoringTopMetrics = apps.get_model('monitoring', 'MonitoringTopMetrics')
+
+    rollups = MonitoringRollup.objects.filter(resolution=3600)
+    days = settings.MONITORING_TOP_METRICS_RETENTION_DAYS
+    if days:
+        rollups = rollups.filter(bucket__gte=timezone.now() - timedelta(days=days))
+    counts = rollups.values('bucket', 'series__source', 'series__metric_name').annotate(
+        count=Sum('count')
+    ).order_by()
+
+    summaries = {}
+    for row in counts:
+        for source in ('', row['series__source']):
+            metrics = summaries.setdefault((source, row['bucket']), {})
+            metric_name = row['series__metric_name']
+            metrics[metric_name] = metrics.get(metric_name, 0) + row['count']
+
+    capacity = settings.MONITORING_TOP_METRICS_CAPACITY
+    MonitoringTopMetrics.objects.bulk_create([
+        MonitoringTopMetrics(
+            source=source,
+            bucket=bucket,
+            total=sum(metrics.values()),
+            counters=[
+                [metric_name, count, 0]
+                for metric_name, count in sorted(metrics.items(), key=lambda item: (-item[1], item[0]))[:capacity]
+            ]
+        )
+        for (source, bucket), metrics in summaries.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0006_sketches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonitoringTopMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(blank=True, max_length=255)),
+                ('bucket', models.DateTimeField()),
+                ('total', models.BigIntegerField(default=0)),
+                ('counters', models.JSONField(default=list)),
+            ],
+            options={
+                'verbose_name_plural': 'monitoring top metrics',
+                'db_table': 'monitoring_top_metrics',
+                'indexes': [models.Index(fields=['bucket'], name='monitoring__bucket_24e803_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monitoringtopmetrics',
+            constraint=models.UniqueConstraint(fields=('source', 'bucket'), name='monitoring_top_metrics_unique_bucket'),
+        ),
+        migrations.RunPython(backfill_top_metrics, migrations.RunPython.noop),
+    ]
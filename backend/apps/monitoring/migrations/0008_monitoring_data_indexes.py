@@ -0,0 +1,59 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:32
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+BRIN_INDEX = django.contrib.postgres.indexes.BrinIndex(
+    fields=['timestamp'], name='monitoring_data_ts_brin', pages_per_range=32
+)
+
+
+def add_brin_index(apps, schema_editor):
+    """
+    BRIN is PostgreSQL-only; other backends keep no timestamp index.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(apps.get_model('monitoring', 'MonitoringData'), BRIN_INDEX)
+
+
+def remove_brin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('monitoring', 'MonitoringData'), BRIN_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0007_top_metrics'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='monitoringdata',
+            options={},
+        ),
+        migrations.RemoveIndex(
+            model_name='monitoringdata',
+            name='monitoring__series__ce15f4_idx',
+        ),
+        migrations.AlterField(
+            model_name='monitoringdata',
+            name='timestamp',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='monitoringdata',
+            index=models.Index(fields=['series', 'timestamp'], include=('metric_value', 'id'), name='monitoring_data_series_ts_cov'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='monitoringdata',
+                    index=BRIN_INDEX,
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(add_brin_index, remove_brin_index),
+            ],
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:34
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+TAGS_INDEX = django.contrib.postgres.indexes.GinIndex(
+    fields=['tags'], name='monitoring_series_tags_gin', opclasses=['jsonb_path_ops']
+)
+
+
+def add_tags_index(apps, schema_editor):
+    """
+    GIN is PostgreSQL-only; other backends filter tags without an index.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(apps.get_model('monitoring', 'MonitoringSeries'), TAGS_INDEX)
+
+
+def remove_tags_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('monitoring', 'MonitoringSeries'), TAGS_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0008_monitoring_data_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='monitoringseries',
+                    index=TAGS_INDEX,
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(add_tags_index, remove_tags_index),
+            ],
+        ),
+    ]
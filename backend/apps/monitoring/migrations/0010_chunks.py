@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0009_series_tags_gin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonitoringChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('count', models.PositiveIntegerField()),
+                ('sum', models.FloatField()),
+                ('min', models.FloatField()),
+                ('max', models.FloatField()),
+                ('data', models.BinaryField()),
+                ('series', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='monitoring.monitoringseries')),
+            ],
+            options={
+                'db_table': 'monitoring_chunks',
+                'indexes': [models.Index(fields=['start'], name='monitoring__start_a85a2b_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monitoringchunk',
+            constraint=models.UniqueConstraint(fields=('series', 'start', 'end'), name='monitoring_chunk_unique_window'),
+        ),
+    ]
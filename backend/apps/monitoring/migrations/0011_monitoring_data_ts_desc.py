@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-18 07:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0010_chunks'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='monitoringdata',
+            index=models.Index(fields=['-timestamp'], name='monitoring_data_ts_desc'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.1 on 2026-10-18 07:35
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+BRIN_INDEX = django.contrib.postgres.indexes.BrinIndex(
+    fields=['timestamp'], name='monitoring_data_ts_brin', pages_per_range=32
+)
+
+
+def remove_brin_index(apps, schema_editor):
+    """
+    The timestamp B-tree serves every time-range filter the BRIN index did.
+    Only PostgreSQL ever had the BRIN index.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('monitoring', 'MonitoringData'), BRIN_INDEX)
+
+
+def add_brin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(apps.get_model('monitoring', 'MonitoringData'), BRIN_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0011_monitoring_data_ts_desc'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveIndex(
+                    model_name='monitoringdata',
+                    name='monitoring_data_ts_brin',
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(remove_brin_index, add_brin_index),
+            ],
+        ),
+    ]
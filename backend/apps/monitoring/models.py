@@ -2,35 +2,267 @@
 Database models for monitoring data.
 """
 
+from datetime import datetime, timezone as dt_timezone
+
 from django.db import models
 from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.indexes import GinIndex
 
 
-class MonitoringData(models.Model):
+class MonitoringSeries(models.Model):
     """
-    Time-series monitoring data from various sources.
+    Catalog of distinct (source, metric_name, tags) combinations.
+    
+    Each combination is interned once and referenced from data rows by its
+    integer id. ``key`` is a digest of the canonical identity, see
+    ``services.series.series_key``.
     """
-    timestamp = models.DateTimeField(db_index=True)
-    source = models.CharField(max_length=255, db_index=True)
-    metric_name = models.CharField(max_length=255, db_index=True)
-    metric_value = models.FloatField()
+    key = models.CharField(max_length=40, unique=True)
+    source = models.CharField(max_length=255)
+    metric_name = models.CharField(max_length=255)
     tags = models.JSONField(default=dict, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        db_table = 'monitoring_series'
+        verbose_name_plural = 'monitoring series'
+        indexes = [
+            models.Index(fields=['metric_name', 'source']),
+            models.Index(fields=['source']),
+            # Inverted index of tag key/value pairs for ``tags @> ...`` filters
+            GinIndex(fields=['tags'], opclasses=['jsonb_path_ops'], name='monitoring_series_tags_gin'),
+        ]
+    
+    def __str__(self):
+        return f"{self.source} - {self.metric_name}"
+
+
+class MonitoringData(models.Model):
+    """
+    Time-series monitoring data from various sources.
+    
+    Rows store only the series id, timestamp and value; the source,
+    metric name and tags live on the referenced ``MonitoringSeries``.
+    
+    There is no default ordering: aggregates and scans should not pay for a
+    sort they do not need, so readers order explicitly.
+    """
+    series = models.ForeignKey(
+        MonitoringSeries,
+        on_delete=models.CASCADE,
+        related_name='data_points',
+        db_index=False
+    )
+    timestamp = models.DateTimeField()
+    metric_value = models.FloatField()
+    
     class Meta:
         db_table = 'monitoring_data'
         indexes = [
-            models.Index(fields=['timestamp', 'source']),
-            models.Index(fields=['timestamp', 'metric_name']),
-            models.Index(fields=['source', 'metric_name']),
+            # Series range reads (and keyset pages, which also need the id)
+            # are answered by index-only scans
+            models.Index(
+                fields=['series', 'timestamp'],
+                include=['metric_value', 'id'],
+                name='monitoring_data_series_ts_cov'
+            ),
+            # Time-only filters and unfiltered newest-first pages, which
+            # would otherwise sort the newest partition
+            models.Index(fields=['-timestamp'], name='monitoring_data_ts_desc'),
         ]
-        ordering = ['-timestamp']
+    
+    @property
+    def source(self):
+        return self.series.source
+    
+    @property
+    def metric_name(self):
+        return self.series.metric_name
+    
+    @property
+    def tags(self):
+        return self.series.tags
     
     def __str__(self):
         return f"{self.source} - {self.metric_name} @ {self.timestamp}"
 
 
+class MonitoringChunk(models.Model):
+    """
+    Compressed points of one series over one fixed time window.
+    
+    Cold rows are moved here from ``MonitoringData`` by
+    ``services.chunks.compact_cold_data``; a point is stored in exactly one
+    of the two tables. ``data`` holds the ``services.gorilla`` encoding of
+    the window's points and ``count``/``sum``/``min``/``max`` summarize
+    them, so aggregates over whole chunks need no decoding.
+    """
+    series = models.ForeignKey(
+        MonitoringSeries,
+        on_delete=models.CASCADE,
+        related_name='chunks',
+        db_index=False
+    )
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    count = models.PositiveIntegerField()
+    sum = models.FloatField()
+    min = models.FloatField()
+    max = models.FloatField()
+    data = models.BinaryField()
+    
+    class Meta:
+        db_table = 'monitoring_chunks'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['series', 'start', 'end'],
+                name='monitoring_chunk_unique_window'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['start']),
+        ]
+    
+    def __str__(self):
+        return f"{self.series} [{self.start} - {self.end}] ({self.count} points)"
+
+
+class MonitoringRollup(models.Model):
+    """
+    Pre-aggregated statistics for one series over one time bucket.
+    
+    Rollups are kept at 1-minute, 1-hour and 1-day resolution and are
+    maintained incrementally as points are ingested.
+    """
+    RESOLUTION_MINUTE = 60
+    RESOLUTION_HOUR = 3600
+    RESOLUTION_DAY = 86400
+    RESOLUTION_CHOICES = [
+        (RESOLUTION_MINUTE, '1m'),
+        (RESOLUTION_HOUR, '1h'),
+        (RESOLUTION_DAY, '1d'),
+    ]
+    
+    series = models.ForeignKey(
+        MonitoringSeries,
+        on_delete=models.CASCADE,
+        related_name='rollups',
+        db_index=False
+    )
+    resolution = models.PositiveIntegerField(choices=RESOLUTION_CHOICES)
+    bucket = models.DateTimeField()
+    count = models.BigIntegerField()
+    sum = models.FloatField()
+    min = models.FloatField()
+    max = models.FloatField()
+    
+    class Meta:
+        db_table = 'monitoring_rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['series', 'resolution', 'bucket'],
+                name='monitoring_rollup_unique_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'bucket']),
+        ]
+    
+    @property
+    def avg(self):
+        return self.sum / self.count if self.count else None
+    
+    def __str__(self):
+        return f"{self.series} [{self.get_resolution_display()}] @ {self.bucket}"
+
+
+class MonitoringSketch(models.Model):
+    """
+    Quantile sketch of one series' values over one time bucket.
+    
+    Kept at the same resolutions as ``MonitoringRollup`` and maintained with
+    it at ingest. ``sketch`` holds a serialized ``services.sketches.DDSketch``;
+    sketches of any set of buckets merge without loss.
+    """
+    series = models.ForeignKey(
+        MonitoringSeries,
+        on_delete=models.CASCADE,
+        related_name='sketches',
+        db_index=False
+    )
+    resolution = models.PositiveIntegerField(choices=MonitoringRollup.RESOLUTION_CHOICES)
+    bucket = models.DateTimeField()
+    sketch = models.BinaryField()
+    
+    class Meta:
+        db_table = 'monitoring_sketches'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['series', 'resolution', 'bucket'],
+                name='monitoring_sketch_unique_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'bucket']),
+        ]
+    
+    def __str__(self):
+        return f"{self.series} [{self.get_resolution_display()}] @ {self.bucket}"
+
+
+class MonitoringTopMetrics(models.Model):
+    """
+    SpaceSaving summary of the busiest metric names in one hour.
+    
+    One row per hour for all sources (``source`` empty) and one per source.
+    ``counters`` holds ``[metric_name, count, error]`` entries, see
+    ``services.heavy_hitters``; ``total`` is the number of points summarized.
+    """
+    ALL_SOURCES = ''
+    
+    source = models.CharField(max_length=255, blank=True)
+    bucket = models.DateTimeField()
+    total = models.BigIntegerField(default=0)
+    counters = models.JSONField(default=list)
+    
+    class Meta:
+        db_table = 'monitoring_top_metrics'
+        verbose_name_plural = 'monitoring top metrics'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source', 'bucket'],
+                name='monitoring_top_metrics_unique_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['bucket']),
+        ]
+    
+    def __str__(self):
+        return f"{self.source or 'all sources'} @ {self.bucket}"
+
+
+class MonitoringPointCount(models.Model):
+    """
+    Number of monitoring data points per minute of their timestamp.
+
+    Maintained by ingest in the same transaction as the points. Minutes older
+    than the counter retention are folded into a single base row at
+    ``BASE_BUCKET``, so the table stays small and the total is a short SUM.
+    """
+    BASE_BUCKET = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+    bucket = models.DateTimeField(unique=True)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'monitoring_point_counts'
+
+    def __str__(self):
+        return f"{self.bucket}: {self.count}"
+
+
 class MonitoringSource(models.Model):
     """
     Registry of monitoring sources.
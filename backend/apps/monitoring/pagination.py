@@ -0,0 +1,82 @@
+"""
+Keyset (timestamp, id) pagination for time-ordered monitoring queries.
+
+Pages are addressed by an opaque cursor holding the position of the last row
+returned, so fetching page N costs the same as page 1 and rows inserted
+behind the cursor do not shift later pages.
+"""
+
+import base64
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# Extra key carried by dict rows so their cursor can be built without
+# exposing the tiebreaker in the response
+CURSOR_ID = 'cursor_id'
+
+
+def encode_cursor(moment, pk):
+    payload = json.dumps([(moment - EPOCH) // timedelta(microseconds=1), pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    """
+    Return the ``(timestamp, id)`` position encoded in ``value``.
+
+    Raises ValueError for malformed cursors.
+    """
+    try:
+        padded = value + '=' * (-len(value) % 4)
+        micros, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f'Invalid cursor: {value!r}')
+
+
+def keyset_queryset(queryset, cursor=None, time_field='timestamp', id_field='id', descending=False):
+    """
+    Order ``queryset`` by ``(time_field, id_field)`` and skip every row up to
+    and including the ``cursor`` position.
+    """
+    if descending:
+        queryset = queryset.order_by(f'-{time_field}', f'-{id_field}')
+    else:
+        queryset = queryset.order_by(time_field, id_field)
+
+    if cursor:
+        moment, pk = decode_cursor(cursor)
+        after = 'lt' if descending else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{time_field}__{after}': moment})
+            | Q(**{time_field: moment, f'{id_field}__{after}': pk})
+        )
+    return queryset
+
+
+def keyset_page(queryset, limit, time_key='timestamp'):
+    """
+    Fetch one page from a queryset prepared by ``keyset_queryset``.
+
+    Rows may be model instances, or dicts from ``values()`` that include the
+    tiebreaker under ``CURSOR_ID`` (removed before returning).
+
+    Returns ``(rows, next_cursor)``; ``next_cursor`` is None on the last page.
+    """
+    rows = list(queryset[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    last_key = None
+    if rows and isinstance(rows[0], dict):
+        for row in rows:
+            last_key = (row[time_key], row.pop(CURSOR_ID))
+    elif rows:
+        last_key = (getattr(rows[-1], time_key), rows[-1].pk)
+
+    next_cursor = encode_cursor(*last_key) if has_more else None
+    return rows, next_cursor
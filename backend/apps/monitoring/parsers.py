@@ -0,0 +1,42 @@
+"""
+Request parsers for monitoring data ingestion.
+"""
+
+import gzip
+import json
+
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """
+    Lazily parses newline-delimited JSON request bodies.
+
+    Instead of loading the whole payload, ``request.data`` becomes a generator
+    of ``(line_number, record, error)`` tuples read straight from the request
+    stream. Bodies sent with ``Content-Encoding: gzip`` are decompressed on the fly.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get('request')
+        encoding = request.META.get('HTTP_CONTENT_ENCODING', '') if request is not None else ''
+
+        if stream is None:
+            return iter(())
+
+        if encoding.strip().lower() == 'gzip':
+            stream = gzip.GzipFile(fileobj=stream, mode='rb')
+
+        return self._iter_records(stream)
+
+    @staticmethod
+    def _iter_records(stream):
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_number, json.loads(line), None
+            except (UnicodeDecodeError, ValueError) as e:
+                yield line_number, None, {'non_field_errors': [f'Invalid JSON: {e}']}
@@ -0,0 +1,64 @@
+"""
+Response renderers for large API payloads.
+
+``ORJSONRenderer`` is a drop-in replacement for DRF's ``JSONRenderer`` that
+encodes in C, including datetimes and NumPy arrays. ``MessagePackRenderer``
+is chosen by content negotiation (``Accept: application/msgpack``) and
+sends datetimes as MessagePack timestamps. Types neither library knows are
+converted the same way DRF's JSON encoder converts them.
+"""
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # fall back to DRF's encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    return _encoder.default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson; uses DRF's encoder if orjson is missing.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=option)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders responses as MessagePack.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if msgpack is None:
+            raise RuntimeError('msgpack is required for MessagePack responses')
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default, datetime=True, use_bin_type=True)
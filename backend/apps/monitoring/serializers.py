@@ -8,12 +8,16 @@ from .models import MonitoringData, MonitoringSource
 
 class MonitoringDataSerializer(serializers.ModelSerializer):
     """
-    Serializer for monitoring data ingestion and retrieval.
+    Serializer for monitoring data retrieval.
     """
+    source = serializers.CharField(source='series.source', read_only=True)
+    metric_name = serializers.CharField(source='series.metric_name', read_only=True)
+    tags = serializers.JSONField(source='series.tags', read_only=True)
+    
     class Meta:
         model = MonitoringData
-        fields = ['id', 'timestamp', 'source', 'metric_name', 'metric_value', 'tags', 'created_at']
-        read_only_fields = ['id', 'created_at']
+        fields = ['id', 'timestamp', 'source', 'metric_name', 'metric_value', 'tags']
+        read_only_fields = ['id']
 
 
 class MonitoringDataCreateSerializer(serializers.Serializer):
@@ -0,0 +1,3 @@
+"""
+Ingest and storage services for monitoring data.
+"""
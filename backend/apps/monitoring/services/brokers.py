@@ -0,0 +1,210 @@
+"""
+Message broker clients for the monitoring ingest consumer.
+
+``KafkaConsumerClient`` wraps confluent-kafka. ``InMemoryBroker`` is a
+process-local stand-in with topics, partitions, consumer groups and committed
+offsets, used to load-test the consumer without a cluster.
+"""
+
+import itertools
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+
+Message = namedtuple('Message', ['topic', 'partition', 'offset', 'value'])
+
+
+class KafkaConsumerClient:
+    """
+    Consumer-group member backed by a real Kafka cluster.
+
+    Auto-commit is disabled; offsets are only committed through ``commit``.
+    """
+
+    def __init__(self, group_id, topics, bootstrap_servers=None):
+        try:
+            from confluent_kafka import Consumer
+        except ImportError:
+            raise RuntimeError('confluent-kafka is required for the Kafka broker')
+
+        self._consumer = Consumer({
+            'bootstrap.servers': bootstrap_servers or settings.KAFKA_BOOTSTRAP_SERVERS,
+            'group.id': group_id,
+            'enable.auto.commit': False,
+            'auto.offset.reset': 'earliest',
+        })
+        self._consumer.subscribe(list(topics))
+
+    def poll(self, max_records, timeout):
+        messages = []
+        for message in self._consumer.consume(num_messages=max_records, timeout=timeout):
+            if message.error():
+                from confluent_kafka import KafkaException
+                raise KafkaException(message.error())
+            messages.append(Message(message.topic(), message.partition(), message.offset(), message.value()))
+        return messages
+
+    def commit(self, offsets):
+        from confluent_kafka import TopicPartition
+
+        self._consumer.commit(
+            offsets=[
+                TopicPartition(topic, partition, offset)
+                for (topic, partition), offset in offsets.items()
+            ],
+            asynchronous=False
+        )
+
+    def close(self):
+        self._consumer.close()
+
+
+class InMemoryBroker:
+    """
+    Minimal in-process broker with Kafka-like partitioning and group semantics.
+
+    Partitions of a topic are spread round-robin over the live members of a
+    consumer group, and a member joining or leaving rebalances the group.
+    Consumers resume from the group's committed offsets.
+    """
+
+    def __init__(self, partitions=4):
+        self.partitions = partitions
+        self._lock = threading.Lock()
+        self._topics = {}
+        self._committed = {}
+        self._members = {}
+        self._generation = {}
+        self._member_ids = itertools.count(1)
+        self._round_robin = itertools.count()
+
+    def produce(self, topic, value, key=None):
+        if isinstance(value, str):
+            value = value.encode()
+        with self._lock:
+            log = self._topics.setdefault(topic, [[] for _ in range(self.partitions)])
+            if key is None:
+                partition = next(self._round_robin) % self.partitions
+            else:
+                partition = hash(key) % self.partitions
+            log[partition].append(value)
+            return partition, len(log[partition]) - 1
+
+    def consumer(self, group_id, topics):
+        return InMemoryConsumerClient(self, group_id, topics)
+
+    def lag(self, group_id):
+        """
+        Number of messages not yet committed by ``group_id``.
+        """
+        with self._lock:
+            return sum(
+                len(log[partition]) - self._committed.get((group_id, topic, partition), 0)
+                for topic, log in self._topics.items()
+                for partition in range(self.partitions)
+            )
+
+    def _join(self, group_id):
+        with self._lock:
+            member_id = next(self._member_ids)
+            self._members.setdefault(group_id, []).append(member_id)
+            self._generation[group_id] = self._generation.get(group_id, 0) + 1
+            return member_id
+
+    def _leave(self, group_id, member_id):
+        with self._lock:
+            self._members[group_id].remove(member_id)
+            self._generation[group_id] += 1
+
+    def _assignment(self, group_id, member_id, topics):
+        with self._lock:
+            members = self._members[group_id]
+            index = members.index(member_id)
+            assigned = [
+                (topic, partition)
+                for topic in sorted(topics)
+                for partition in range(self.partitions)
+            ]
+            return self._generation[group_id], set(assigned[index::len(members)])
+
+    def _fetch(self, topic, partition, offset, limit):
+        with self._lock:
+            log = self._topics.get(topic)
+            if not log:
+                return []
+            return log[partition][offset:offset + limit]
+
+    def _commit(self, group_id, offsets):
+        with self._lock:
+            for (topic, partition), offset in offsets.items():
+                key = (group_id, topic, partition)
+                self._committed[key] = max(self._committed.get(key, 0), offset)
+
+    def _committed_offset(self, group_id, topic, partition):
+        with self._lock:
+            return self._committed.get((group_id, topic, partition), 0)
+
+
+class InMemoryConsumerClient:
+    """
+    Consumer-group member of an ``InMemoryBroker``.
+    """
+
+    def __init__(self, broker, group_id, topics):
+        self._broker = broker
+        self._group_id = group_id
+        self._topics = list(topics)
+        self._member_id = broker._join(group_id)
+        self._generation = None
+        self._positions = {}
+
+    def poll(self, max_records, timeout):
+        generation, assigned = self._broker._assignment(self._group_id, self._member_id, self._topics)
+        if generation != self._generation:
+            # Rebalanced: resume every assigned partition from the committed offset
+            self._generation = generation
+            self._positions = {
+                topic_partition: self._broker._committed_offset(self._group_id, *topic_partition)
+                for topic_partition in assigned
+            }
+
+        messages = []
+        for (topic, partition), position in sorted(self._positions.items()):
+            remaining = max_records - len(messages)
+            if remaining <= 0:
+                break
+            values = self._broker._fetch(topic, partition, position, remaining)
+            messages.extend(
+                Message(topic, partition, position + index, value)
+                for index, value in enumerate(values)
+            )
+            self._positions[(topic, partition)] = position + len(values)
+
+        if not messages and timeout:
+            threading.Event().wait(min(timeout, 0.05))
+        return messages
+
+    def commit(self, offsets):
+        self._broker._commit(self._group_id, offsets)
+
+    def close(self):
+        self._broker._leave(self._group_id, self._member_id)
+
+
+memory_broker = InMemoryBroker()
+
+
+def get_consumer_client(group_id=None, topics=None, broker=None):
+    """
+    Build a consumer client for the configured broker (``kafka`` or ``memory``).
+    """
+    group_id = group_id or settings.MONITORING_KAFKA_GROUP_ID
+    topics = topics or settings.MONITORING_KAFKA_TOPICS
+    broker = broker or settings.MONITORING_KAFKA_BROKER
+
+    if broker == 'memory':
+        return memory_broker.consumer(group_id, topics)
+    if broker == 'kafka':
+        return KafkaConsumerClient(group_id, topics)
+    raise ValueError(f'Unknown broker: {broker}')
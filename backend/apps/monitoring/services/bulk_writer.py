@@ -0,0 +1,126 @@
+"""
+Bulk writer that loads monitoring points with PostgreSQL ``COPY FROM STDIN``.
+"""
+
+import csv
+import io
+import logging
+from datetime import timezone as dt_timezone
+
+import numpy as np
+from django.db import connections
+
+from ..models import MonitoringData
+
+logger = logging.getLogger(__name__)
+
+COPY_FIELDS = ('series', 'timestamp', 'metric_value')
+
+
+class _CSVStream(io.TextIOBase):
+    """
+    Read-only file object that renders rows to CSV on demand, so COPY can
+    consume arbitrarily large batches without building the payload up front.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator='\n')
+        self._pending = ''
+        self.row_count = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._pending) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._writer.writerow(row)
+            self.row_count += 1
+            if self._buffer.tell() >= 65536:
+                self._pending += self._buffer.getvalue()
+                self._buffer.seek(0)
+                self._buffer.truncate()
+
+        self._pending += self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+
+        if size < 0:
+            size = len(self._pending)
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+
+def _copy_rows(rows):
+    for series_id, timestamp, metric_value in rows:
+        yield (series_id, timestamp.isoformat(), repr(float(metric_value)))
+
+
+def copy_points(rows, using='default'):
+    """
+    Load ``(series_id, timestamp, metric_value)`` rows into ``monitoring_data``
+    with COPY.
+
+    ``rows`` may be any iterable; they are encoded lazily while the server
+    consumes the stream. Falls back to ``bulk_create`` on databases without
+    COPY support.
+
+    Returns the number of rows written.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        created = MonitoringData.objects.using(using).bulk_create(
+            MonitoringData(series_id=series_id, timestamp=timestamp, metric_value=metric_value)
+            for series_id, timestamp, metric_value in rows
+        )
+        return len(created)
+
+    return _copy(connection, _copy_rows(rows))
+
+
+def copy_columns(series_ids, timestamps, values, using='default'):
+    """
+    Load parallel columns into ``monitoring_data`` with COPY.
+
+    ``timestamps`` is a ``datetime64[us]`` array in UTC; it is rendered to
+    text in one vectorized call instead of per row.
+
+    Returns the number of rows written.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return copy_points(
+            zip(
+                np.asarray(series_ids).tolist(),
+                [moment.replace(tzinfo=dt_timezone.utc) for moment in timestamps.astype(object)],
+                np.asarray(values).tolist(),
+            ),
+            using=using
+        )
+
+    return _copy(connection, zip(
+        np.asarray(series_ids).tolist(),
+        np.datetime_as_string(timestamps, unit='us', timezone='UTC').tolist(),
+        np.asarray(values, dtype=np.float64).tolist(),
+    ))
+
+
+def _copy(connection, rows):
+    meta = MonitoringData._meta
+    columns = ', '.join(
+        connection.ops.quote_name(meta.get_field(name).column) for name in COPY_FIELDS
+    )
+    sql = (
+        f'COPY {connection.ops.quote_name(meta.db_table)} ({columns}) '
+        f'FROM STDIN WITH (FORMAT csv)'
+    )
+
+    stream = _CSVStream(rows)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(sql, stream)
+
+    return stream.row_count
@@ -0,0 +1,179 @@
+"""
+Reading compressed chunks of cold monitoring data.
+
+Points older than ``MONITORING_COMPACT_AFTER_DAYS`` are moved out of
+``monitoring_data`` into ``MonitoringChunk`` rows (see ``compaction``), so
+readers of raw points add the chunks overlapping their range to what they
+read from the raw table. ``chunk_points`` decodes them with ``gorilla``;
+``chunk_stats`` takes chunks lying wholly inside the range from their stored
+statistics and decodes only the partial ones at its edges, and
+``chunk_windows`` decodes a long range one chunk window at a time. Readers
+that page through ``monitoring_data`` row by row cannot include chunks, and
+use ``require_raw`` to refuse ranges reaching back before ``compacted_until``.
+
+Filters are lookups on ``MonitoringChunk``, which names its series FK like
+``MonitoringData`` does, so ``series__metric_name=...``, a ``series_filter``
+Q object or ``series_id__in=...`` apply to both tables unchanged.
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Max, Min, Sum
+
+from ..models import MonitoringChunk
+from . import gorilla
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECONDS = 1_000_000
+DECODE_BATCH_SIZE = 500
+
+
+def to_micros(moment):
+    """
+    Epoch microseconds of an aware datetime.
+    """
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(micros):
+    return EPOCH + timedelta(microseconds=int(micros))
+
+
+def as_datetimes(micros):
+    """
+    Aware UTC datetimes for an array of epoch microseconds.
+    """
+    return [
+        moment.replace(tzinfo=dt_timezone.utc)
+        for moment in np.asarray(micros, dtype=np.int64).astype('datetime64[us]').astype(object)
+    ]
+
+
+def _overlapping(start, end, conditions, lookups):
+    queryset = MonitoringChunk.objects.filter(*conditions, end__gt=start, **lookups)
+    if end is not None:
+        queryset = queryset.filter(start__lt=end)
+    return queryset
+
+
+def _decode(rows, start, end):
+    low = to_micros(start)
+    high = None if end is None else to_micros(end)
+    parts = []
+    for series_id, chunk_start, chunk_end, data in rows:
+        micros, values = gorilla.decode(data)
+        if chunk_start < start or (end is not None and chunk_end > end):
+            keep = micros >= low
+            if high is not None:
+                keep &= micros < high
+            micros, values = micros[keep], values[keep]
+        parts.append((np.full(len(micros), series_id, dtype=np.int64), micros, values))
+
+    if not parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+
+def chunk_points(start, end, *conditions, **lookups):
+    """
+    Decode the chunked points in ``[start, end)`` (open-ended if ``end`` is
+    None) of the series matching the filters.
+
+    Returns parallel ``(series_ids, micros, values)`` arrays ordered by
+    series and time.
+    """
+    rows = _overlapping(start, end, conditions, lookups).order_by(
+        'series_id', 'start'
+    ).values_list('series_id', 'start', 'end', 'data')
+    return _decode(rows.iterator(chunk_size=DECODE_BATCH_SIZE), start, end)
+
+
+def chunk_stats(start, end, *conditions, **lookups):
+    """
+    Return the count/sum/min/max of the chunked points in ``[start, end)``
+    (open-ended if ``end`` is None) of the series matching the filters.
+    """
+    queryset = _overlapping(start, end, conditions, lookups)
+    inside = {'start__gte': start}
+    if end is not None:
+        inside['end__lte'] = end
+
+    whole = queryset.filter(**inside).aggregate(
+        count=Sum('count'), sum=Sum('sum'), min=Min('min'), max=Max('max')
+    )
+    _, _, values = _decode(
+        queryset.exclude(**inside).values_list('series_id', 'start', 'end', 'data').iterator(
+            chunk_size=DECODE_BATCH_SIZE
+        ),
+        start, end
+    )
+
+    count = (whole['count'] or 0) + len(values)
+    if not count:
+        return {'count': 0, 'sum': 0.0, 'min': None, 'max': None}
+    lows = [low for low in (whole['min'], values.min() if len(values) else None) if low is not None]
+    highs = [high for high in (whole['max'], values.max() if len(values) else None) if high is not None]
+    return {
+        'count': count,
+        'sum': (whole['sum'] or 0.0) + float(values.sum()),
+        'min': float(min(lows)),
+        'max': float(max(highs)),
+    }
+
+
+def chunk_windows(start, end, *conditions, **lookups):
+    """
+    Decode the chunked points in ``[start, end)`` (either end may be None)
+    of the series matching the filters one chunk window at a time, oldest
+    window first, so memory stays bounded by one window.
+
+    Yields parallel ``(series_ids, micros, values)`` arrays ordered by time.
+    """
+    starts = _overlapping(start or EPOCH, end, conditions, lookups).order_by(
+        'start'
+    ).values_list('start', flat=True).distinct()
+    width = timedelta(seconds=settings.MONITORING_CHUNK_SECONDS)
+    for window in list(starts):
+        window_start = max(window, start) if start is not None else window
+        window_end = min(window + width, end) if end is not None else window + width
+        series_ids, micros, values = chunk_points(window_start, window_end, *conditions, **lookups)
+        order = np.argsort(micros, kind='stable')
+        yield series_ids[order], micros[order], values[order]
+
+
+def compacted_until():
+    """
+    Return the end of the newest chunk, before which points may have been
+    moved out of ``monitoring_data``, or None if nothing was compacted.
+    """
+    return MonitoringChunk.objects.order_by('-start').values_list('end', flat=True).first()
+
+
+def require_raw(start):
+    """
+    Raise ValueError if points at or after ``start`` may have been moved into
+    chunks, for readers that page through ``monitoring_data`` by row.
+    """
+    boundary = compacted_until()
+    if boundary is not None and start < boundary:
+        raise ValueError(
+            f'Points before {boundary.isoformat()} are compacted and cannot be read row by row; '
+            'start at or after it'
+        )
+
+
+def expire_chunks(cutoff):
+    """
+    Delete the chunks that end at or before ``cutoff``.
+
+    Returns the epoch seconds of the deleted points, so that callers can
+    take them off the point counters.
+    """
+    expired = MonitoringChunk.objects.filter(end__lte=cutoff)
+    seconds = []
+    for data in expired.values_list('data', flat=True).iterator(chunk_size=DECODE_BATCH_SIZE):
+        seconds.append(gorilla.decode(data)[0] // MICROSECONDS)
+    expired.delete()
+    return np.concatenate(seconds) if seconds else np.empty(0, dtype=np.int64)
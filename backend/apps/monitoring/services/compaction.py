@@ -0,0 +1,274 @@
+"""
+Compaction of cold monitoring data into Gorilla-encoded chunks.
+
+Raw points older than ``MONITORING_COMPACT_AFTER_DAYS`` are rarely read one
+by one, but each costs a heap tuple and several index entries. They are
+moved into one ``MonitoringChunk`` per series and ``MONITORING_CHUNK_SECONDS``
+window, which takes about a tenth of the space or less.
+
+Compaction is disabled by default. Readers of whole ranges (timeseries
+windows, bucket aggregates, percentiles, PromQL, exports, point counts and
+``backfill_sketches``) read chunks along with the raw table. Readers that
+page through raw rows (the monitoring list and query endpoints, paged or
+streamed timeseries) cannot: they reject start times before the newest
+chunk or flag open-ended responses with ``X-Compacted-Before``.
+
+On a partitioned table a cold partition is encoded while still attached,
+then detached, the points written to it meanwhile merged in and the table
+dropped, all in one transaction that only locks ``monitoring_data`` for the
+last, short step and gives up after ``DETACH_LOCK_TIMEOUT`` rather than
+stall writers. A partition left detached by an interrupted retention run
+is compacted by the next one. Whatever cold rows remain (late
+points, the default partition, an unpartitioned table) are moved a day at a
+time with DELETE, and points that fall into an existing chunk are merged
+into it. Moving points does not change how many there are, so the point
+counters are left alone.
+"""
+
+import logging
+from array import array
+from datetime import timedelta
+from itertools import groupby
+from operator import itemgetter
+
+import numpy as np
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from ..models import MonitoringChunk, MonitoringData
+from . import gorilla
+from .chunks import MICROSECONDS, from_micros, to_micros
+from .partitions import DETACH_LOCK_TIMEOUT, is_partitioned, list_detached_partitions, list_partitions
+from .rollups import floor_time
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 20000
+WRITE_BATCH_SIZE = 1000
+DELETE_BATCH_SIZE = 10000
+
+
+def compact_cold_data(before=None):
+    """
+    Move the raw points older than ``before`` (default
+    ``MONITORING_COMPACT_AFTER_DAYS`` ago) into chunks. The cutoff is
+    aligned down to a chunk window.
+
+    Returns the number of ``points`` moved, ``chunks`` written, their
+    ``bytes`` and the ``partitions`` dropped.
+    """
+    result = {'points': 0, 'chunks': 0, 'bytes': 0, 'partitions': []}
+    if before is None:
+        if not settings.MONITORING_COMPACT_AFTER_DAYS:
+            return result
+        before = timezone.now() - timedelta(days=settings.MONITORING_COMPACT_AFTER_DAYS)
+    cutoff = floor_time(before, settings.MONITORING_CHUNK_SECONDS)
+
+    if is_partitioned():
+        for name, start, end in _detached_partitions():
+            _merge_stats(result, _compact_detached(name, start, end))
+            result['partitions'].append(name)
+        for name, start, end in list_partitions():
+            if end > cutoff:
+                break
+            stats = _compact_partition(name, start, end)
+            if stats is None:
+                # Leave the partition for the next run instead of deleting it row by row
+                cutoff = start
+                break
+            _merge_stats(result, stats)
+            result['partitions'].append(name)
+
+    oldest = MonitoringData.objects.filter(timestamp__lt=cutoff).aggregate(oldest=Min('timestamp'))['oldest']
+    if oldest is not None:
+        day = floor_time(oldest, 86400)
+        while day < cutoff:
+            _merge_stats(result, _compact_range(day, min(day + timedelta(days=1), cutoff)))
+            day += timedelta(days=1)
+
+    if result['points']:
+        logger.info(
+            f"Compacted {result['points']} points into {result['chunks']} chunks "
+            f"({result['bytes'] / result['points']:.1f} bytes/point), "
+            f"dropped {len(result['partitions'])} partitions"
+        )
+    return result
+
+
+def _merge_stats(total, stats):
+    for key in ('points', 'chunks', 'bytes'):
+        total[key] += stats[key]
+
+
+def _detached_partitions():
+    """
+    Return ``(name, start, end)`` for partitions that an interrupted run
+    detached but did not drop, ``end`` being just past their last point.
+    """
+    detached = []
+    with connection.cursor() as cursor:
+        for name in list_detached_partitions():
+            cursor.execute(f'SELECT MIN(timestamp), MAX(timestamp) FROM {connection.ops.quote_name(name)}')
+            start, last = cursor.fetchone()
+            if start is None:
+                cursor.execute(f'DROP TABLE {connection.ops.quote_name(name)}')
+                continue
+            detached.append((name, start, last + timedelta(microseconds=1)))
+    return detached
+
+
+def _compact_partition(name, start, end):
+    """
+    Compact the partition ``name`` while it is still attached, then detach
+    and drop it. Returns None, leaving the partition as it was, if a lock
+    could not be taken within ``DETACH_LOCK_TIMEOUT``.
+
+    Everything happens in one transaction, so the points are always either
+    in the partition or in committed chunks. Encoding only reads the
+    partition; ``monitoring_data`` itself is locked from the DETACH to the
+    commit, which merely encodes the points written since and drops the
+    table. (DETACH ... CONCURRENTLY is not allowed while the table has a
+    default partition.)
+    """
+    table = connection.ops.quote_name(MonitoringData._meta.db_table)
+    quoted_name = connection.ops.quote_name(name)
+    columns = 'id, series_id, timestamp, metric_value'
+    # Ids of points written while the partition is encoded are above the
+    # newest id committed before it started
+    watermark = MonitoringData.objects.aggregate(watermark=Max('id'))['watermark'] or 0
+    late_seen = set()
+
+    def points(cursor):
+        for batch in iter(lambda: cursor.fetchmany(READ_CHUNK_SIZE), []):
+            for pk, *point in batch:
+                if pk > watermark:
+                    late_seen.add(pk)
+                yield point
+
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(f"SET LOCAL lock_timeout = '{DETACH_LOCK_TIMEOUT}'")
+                # Wait for writers still inserting older ids into the partition,
+                # without keeping them out while it is encoded
+                savepoint = transaction.savepoint()
+                cursor.execute(f'LOCK TABLE {quoted_name} IN SHARE MODE')
+                transaction.savepoint_rollback(savepoint)
+
+            with connection.chunked_cursor() as cursor:
+                cursor.execute(f'SELECT {columns} FROM {quoted_name} ORDER BY series_id, timestamp')
+                stats = _write_chunks(points(cursor), start, end)
+
+            with connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {quoted_name}')
+                cursor.execute(
+                    f'SELECT {columns} FROM {quoted_name} WHERE id > %s ORDER BY series_id, timestamp',
+                    [watermark]
+                )
+                late = [row[1:] for row in cursor.fetchall() if row[0] not in late_seen]
+                _merge_stats(stats, _write_chunks(late, start, end))
+                cursor.execute(f'DROP TABLE {quoted_name}')
+    except OperationalError as exc:
+        logger.warning(f"Could not lock partition {name} for compaction, will retry: {exc}")
+        return None
+    logger.info(f"Compacted partition {name} into {stats['chunks']} chunks")
+    return stats
+
+
+def _compact_detached(name, start, end):
+    """
+    Encode the rows of the detached partition ``name`` into chunks and drop it.
+    """
+    quoted_name = connection.ops.quote_name(name)
+    with transaction.atomic():
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(f'SELECT series_id, timestamp, metric_value FROM {quoted_name} ORDER BY series_id, timestamp')
+            rows = (row for batch in iter(lambda: cursor.fetchmany(READ_CHUNK_SIZE), []) for row in batch)
+            stats = _write_chunks(rows, start, end)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE {quoted_name}')
+    logger.info(f"Compacted partition {name} into {stats['chunks']} chunks")
+    return stats
+
+
+def _compact_range(start, end):
+    with transaction.atomic():
+        rows = MonitoringData.objects.filter(
+            timestamp__gte=start, timestamp__lt=end
+        ).order_by('series_id', 'timestamp', 'id').values_list('id', 'series_id', 'timestamp', 'metric_value')
+        # Delete by id so that points written meanwhile are not lost
+        ids = array('q')
+
+        def points():
+            for pk, *point in rows.iterator(chunk_size=READ_CHUNK_SIZE):
+                ids.append(pk)
+                yield point
+
+        stats = _write_chunks(points(), start, end)
+        for offset in range(0, len(ids), DELETE_BATCH_SIZE):
+            MonitoringData.objects.filter(
+                id__in=ids[offset:offset + DELETE_BATCH_SIZE].tolist(), timestamp__gte=start, timestamp__lt=end
+            ).delete()
+    return stats
+
+
+def _fill(chunk, micros, values):
+    chunk.count = len(micros)
+    chunk.sum = float(values.sum())
+    chunk.min = float(values.min())
+    chunk.max = float(values.max())
+    chunk.data = gorilla.encode(micros, values)
+
+
+def _write_chunks(rows, start, end):
+    """
+    Encode ``(series_id, timestamp, metric_value)`` rows in ``[start, end)``,
+    ordered by series and time, into chunks.
+    """
+    width = settings.MONITORING_CHUNK_SECONDS * MICROSECONDS
+    # Chunks from earlier runs that points in this range have to be merged into
+    existing = {
+        (series_id, to_micros(chunk_start)): pk
+        for series_id, chunk_start, pk in MonitoringChunk.objects.filter(
+            start__gte=floor_time(start, settings.MONITORING_CHUNK_SECONDS), start__lt=end
+        ).values_list('series_id', 'start', 'id')
+    }
+
+    stats = {'points': 0, 'chunks': 0, 'bytes': 0}
+    pending = []
+    for series_id, points in groupby(rows, key=itemgetter(0)):
+        points = list(points)
+        micros = np.fromiter((to_micros(point[1]) for point in points), dtype=np.int64, count=len(points))
+        values = np.fromiter((point[2] for point in points), dtype=np.float64, count=len(points))
+        windows = micros // width * width
+        bounds = np.flatnonzero(np.diff(windows)) + 1
+
+        for window, window_micros, window_values in zip(
+            windows[np.concatenate([[0], bounds])].tolist(), np.split(micros, bounds), np.split(values, bounds)
+        ):
+            stats['points'] += len(window_micros)
+            pk = existing.get((series_id, window))
+            if pk is None:
+                chunk = MonitoringChunk(
+                    series_id=series_id, start=from_micros(window), end=from_micros(window + width)
+                )
+                _fill(chunk, window_micros, window_values)
+                pending.append(chunk)
+            else:
+                chunk = MonitoringChunk.objects.select_for_update().get(pk=pk)
+                stored_micros, stored_values = gorilla.decode(chunk.data)
+                merged_micros = np.concatenate([stored_micros, window_micros])
+                order = np.argsort(merged_micros, kind='stable')
+                _fill(chunk, merged_micros[order], np.concatenate([stored_values, window_values])[order])
+                chunk.save(update_fields=['count', 'sum', 'min', 'max', 'data'])
+            stats['chunks'] += 1
+            stats['bytes'] += len(chunk.data)
+
+        if len(pending) >= WRITE_BATCH_SIZE:
+            MonitoringChunk.objects.bulk_create(pending)
+            pending = []
+
+    MonitoringChunk.objects.bulk_create(pending)
+    return stats
@@ -0,0 +1,160 @@
+"""
+Broker consumer that feeds monitoring data into the bulk ingest path.
+
+Messages carry a single JSON point, a JSON array of points, or NDJSON lines.
+Each poll is decoded and validated as one batch and written through
+``stream_ingest``; offsets are committed only after that write succeeds, so a
+crash replays the uncommitted batch (at-least-once delivery).
+
+Scaling out is done by running more consumers with the same group id: the
+broker spreads topic partitions over the members of the group.
+"""
+
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .heartbeat import heartbeat
+from .heavy_hitters import overall_top_metrics
+from .ingest import stream_ingest
+
+logger = logging.getLogger(__name__)
+
+
+def decode_message(value):
+    """
+    Decode a message payload into a list of ``(record, error)`` pairs.
+    """
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', errors='replace')
+    value = value.strip()
+    if not value:
+        return []
+
+    try:
+        payload = json.loads(value)
+    except json.JSONDecodeError:
+        # Not a single document: treat it as NDJSON
+        decoded = []
+        for line in value.splitlines():
+            if not line.strip():
+                continue
+            try:
+                decoded.append((json.loads(line), None))
+            except json.JSONDecodeError as e:
+                decoded.append((None, {'non_field_errors': [f'Invalid JSON: {e.msg}']}))
+        return decoded
+
+    if isinstance(payload, list):
+        return [(record, None) for record in payload]
+    return [(payload, None)]
+
+
+class IngestConsumer:
+    """
+    Poll a broker client in batches and write them to monitoring_data.
+    """
+
+    def __init__(self, client, batch_size=None, batch_timeout=None, max_retries=None, retry_backoff=None):
+        self.client = client
+        self.batch_size = batch_size or settings.MONITORING_KAFKA_BATCH_SIZE
+        self.batch_timeout = batch_timeout or settings.MONITORING_KAFKA_BATCH_TIMEOUT
+        self.max_retries = settings.MONITORING_KAFKA_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_backoff = retry_backoff or settings.MONITORING_KAFKA_RETRY_BACKOFF
+        self.stopped = False
+        self.stats = {'messages': 0, 'accepted': 0, 'rejected': 0, 'batches': 0}
+
+    def stop(self):
+        self.stopped = True
+
+    def poll_batch(self):
+        """
+        Collect up to ``batch_size`` messages, waiting at most ``batch_timeout``
+        seconds for the batch to fill.
+        """
+        messages = []
+        deadline = time.monotonic() + self.batch_timeout
+        while len(messages) < self.batch_size and not self.stopped:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            messages.extend(self.client.poll(self.batch_size - len(messages), remaining))
+        return messages
+
+    def process(self, messages):
+        """
+        Write one batch of messages and commit their offsets.
+
+        Returns the per-batch ingest report.
+        """
+        records = []
+        offsets = {}
+        for message in messages:
+            location = f'{message.topic}[{message.partition}]@{message.offset}'
+            for record, error in decode_message(message.value):
+                if error is None and not isinstance(record, dict):
+                    error = {'non_field_errors': ['Expected a JSON object']}
+                records.append((location, record, error))
+            key = (message.topic, message.partition)
+            offsets[key] = max(offsets.get(key, 0), message.offset + 1)
+
+        report = self._write(records)
+        self.client.commit(offsets)
+
+        self.stats['messages'] += len(messages)
+        self.stats['accepted'] += report['accepted']
+        self.stats['rejected'] += report['rejected']
+        self.stats['batches'] += 1
+        if report['rejected']:
+            logger.warning(
+                f"Rejected {report['rejected']} monitoring records from the broker: {report['errors'][:3]}"
+            )
+        return report
+
+    def _write(self, records):
+        attempt = 0
+        while True:
+            try:
+                reports = stream_ingest(records, chunk_size=max(len(records), 1))
+                break
+            except Exception as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                delay = self.retry_backoff * 2 ** (attempt - 1)
+                logger.warning(f"Broker batch write failed ({str(e)}); retrying in {delay:.1f}s")
+                close_old_connections()
+                time.sleep(delay)
+
+        return {
+            'accepted': sum(report['accepted'] for report in reports),
+            'rejected': sum(report['rejected'] for report in reports),
+            'errors': [error for report in reports for error in report['errors']],
+        }
+
+    def run(self, max_messages=None):
+        """
+        Consume until ``stop`` is called or ``max_messages`` have been processed.
+        """
+        try:
+            while not self.stopped:
+                close_old_connections()
+                messages = self.poll_batch()
+                if messages:
+                    self.process(messages)
+                if max_messages is not None and self.stats['messages'] >= max_messages:
+                    break
+        finally:
+            self.client.close()
+            try:
+                heartbeat.flush()
+            except Exception as e:
+                logger.error(f"Source heartbeat flush failed: {str(e)}")
+            try:
+                overall_top_metrics.flush()
+            except Exception as e:
+                logger.error(f"Top metrics flush failed: {str(e)}")
+        return self.stats
@@ -0,0 +1,177 @@
+"""
+Ingest-maintained point counters for ``monitoring_data``.
+
+Every write adds its points to a per-minute counter row in the same
+transaction, so the number of points in any recent window is a SUM over at
+most a few thousand small rows instead of a COUNT over the raw table.
+Minutes older than ``MONITORING_COUNTER_MINUTE_RETENTION_HOURS`` are folded
+into the base row at ``MonitoringPointCount.BASE_BUCKET`` by
+``compact_counters``; the overall total is the sum of all rows.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from ..models import MonitoringChunk, MonitoringData, MonitoringPointCount
+from .chunks import chunk_stats
+from .rollups import ceil_time, floor_time
+
+logger = logging.getLogger(__name__)
+
+BUCKET_SECONDS = 60
+UPSERT_BATCH_SIZE = 1000
+
+
+def record_counts(epoch_seconds):
+    """
+    Add a batch of points, given by their timestamps in epoch seconds, to the
+    per-minute counters.
+    """
+    epoch_seconds = np.asarray(epoch_seconds, dtype=np.float64).astype(np.int64)
+    if not len(epoch_seconds):
+        return
+    buckets, counts = np.unique(epoch_seconds - epoch_seconds % BUCKET_SECONDS, return_counts=True)
+    _add([
+        (datetime.fromtimestamp(int(bucket), tz=dt_timezone.utc), int(count))
+        for bucket, count in zip(buckets, counts)
+    ])
+
+
+def subtract_counts(bucket_counts):
+    """
+    Remove deleted points from the counters.
+
+    ``bucket_counts`` maps minute buckets to the number of points deleted from
+    them. Minutes that were already compacted are taken off the base row.
+    """
+    if not bucket_counts:
+        return
+    with transaction.atomic():
+        existing = set()
+        buckets = list(bucket_counts)
+        for offset in range(0, len(buckets), UPSERT_BATCH_SIZE):
+            existing.update(MonitoringPointCount.objects.filter(
+                bucket__in=buckets[offset:offset + UPSERT_BATCH_SIZE]
+            ).exclude(
+                bucket=MonitoringPointCount.BASE_BUCKET
+            ).values_list('bucket', flat=True))
+
+        rows = [(bucket, -count) for bucket, count in bucket_counts.items() if bucket in existing]
+        compacted = sum(count for bucket, count in bucket_counts.items() if bucket not in existing)
+        if compacted:
+            rows.append((MonitoringPointCount.BASE_BUCKET, -compacted))
+        _add(rows)
+        MonitoringPointCount.objects.filter(count__lte=0).exclude(
+            bucket=MonitoringPointCount.BASE_BUCKET
+        ).delete()
+
+
+def _add(rows):
+    table = connection.ops.quote_name(MonitoringPointCount._meta.db_table)
+    with connection.cursor() as cursor:
+        for offset in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[offset:offset + UPSERT_BATCH_SIZE]
+            placeholders = ', '.join(['(%s, %s)'] * len(batch))
+            cursor.execute(
+                f'''
+                INSERT INTO {table} (bucket, count)
+                VALUES {placeholders}
+                ON CONFLICT (bucket) DO UPDATE SET count = {table}.count + EXCLUDED.count
+                ''',
+                [
+                    value
+                    for bucket, count in batch
+                    for value in (connection.ops.adapt_datetimefield_value(bucket), count)
+                ]
+            )
+
+
+def count_points(since=None):
+    """
+    Return the number of stored points, or of points timestamped at or after
+    ``since``.
+
+    Whole minutes are read from the counters and only the partial first
+    minute from the raw table. Windows reaching back past the minute
+    retention have been compacted away and are counted from the raw table.
+    """
+    counters = MonitoringPointCount.objects.all()
+    if since is None:
+        return counters.aggregate(total=Sum('count'))['total'] or 0
+
+    retention = timedelta(hours=settings.MONITORING_COUNTER_MINUTE_RETENTION_HOURS)
+    if since < timezone.now() - retention:
+        return _count_stored(since)
+
+    boundary = ceil_time(since, BUCKET_SECONDS)
+    total = counters.filter(bucket__gte=boundary).aggregate(total=Sum('count'))['total'] or 0
+    if boundary > since:
+        total += _count_stored(since, boundary)
+    return total
+
+
+def _count_stored(since, until=None):
+    # Points live in the raw table or, once compacted, in chunks
+    raw = MonitoringData.objects.filter(timestamp__gte=since)
+    if until is not None:
+        raw = raw.filter(timestamp__lt=until)
+    return raw.count() + chunk_stats(since, until)['count']
+
+
+def estimate_total():
+    """
+    Return the planner's row estimate for ``monitoring_data`` (summed over its
+    partitions), as of the last VACUUM/ANALYZE, plus the points held in
+    chunks.
+
+    Falls back to the exact counter total on other databases.
+    """
+    if connection.vendor != 'postgresql':
+        return count_points()
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            '''
+            SELECT COALESCE(SUM(GREATEST(reltuples, 0)), 0)
+            FROM pg_class
+            WHERE oid = %s::regclass
+               OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)
+            ''',
+            [MonitoringData._meta.db_table, MonitoringData._meta.db_table]
+        )
+        raw = int(cursor.fetchone()[0])
+    return raw + (MonitoringChunk.objects.aggregate(total=Sum('count'))['total'] or 0)
+
+
+def compact_counters():
+    """
+    Fold minute counters older than the retention into the base row.
+
+    The retention is not a parameter because ``count_points`` relies on it to
+    know which windows are still covered by minute rows.
+
+    Returns the number of minute rows folded.
+    """
+    retention = timedelta(hours=settings.MONITORING_COUNTER_MINUTE_RETENTION_HOURS)
+    cutoff = floor_time(timezone.now() - retention, BUCKET_SECONDS)
+
+    with transaction.atomic():
+        # Lock the rows so concurrent ingest into old minutes is not lost
+        expired = list(MonitoringPointCount.objects.select_for_update().filter(
+            bucket__lt=cutoff
+        ).exclude(
+            bucket=MonitoringPointCount.BASE_BUCKET
+        ).values_list('id', 'count'))
+        if not expired:
+            return 0
+        folded = sum(count for _, count in expired)
+        MonitoringPointCount.objects.filter(id__in=[pk for pk, _ in expired]).delete()
+        _add([(MonitoringPointCount.BASE_BUCKET, folded)])
+    logger.info(f"Compacted {len(expired)} minute counters ({folded} points) into the base counter")
+    return len(expired)
@@ -0,0 +1,101 @@
+"""
+Gorilla-style compression of the points of one series.
+
+As in Facebook's Gorilla, timestamps are stored as delta-of-deltas and each
+value as the XOR with the previous one. Instead of a bit stream every field
+is byte-aligned, so a whole chunk is encoded or decoded with a handful of
+NumPy operations rather than a loop over points:
+
+- delta-of-deltas are counted in the coarsest unit (second, millisecond or
+  microsecond) all timestamps align to and written at the narrowest signed
+  width that holds them, which is zero bytes for a regular series;
+- an XOR is cut down to its significant bytes, after a one-byte header with
+  the number of trailing zero bytes and of significant bytes, so a repeated
+  value costs the header byte only.
+"""
+
+import struct
+
+import numpy as np
+
+FORMAT_VERSION = 1
+# version, points, first timestamp (microseconds), timestamp unit (microseconds),
+# first delta (units), delta-of-delta width
+HEADER = struct.Struct('<BIqIqB')
+UNITS = (1_000_000, 1_000, 1)
+
+_BYTE_POSITIONS = np.arange(8)
+
+
+def _width(dods):
+    if not dods.any():
+        return 0
+    low, high = dods.min(), dods.max()
+    for width in (1, 2, 4):
+        info = np.iinfo(f'i{width}')
+        if info.min <= low and high <= info.max:
+            return width
+    return 8
+
+
+def _byte_mask(trailing, significant):
+    return (_BYTE_POSITIONS >= trailing[:, None]) & (_BYTE_POSITIONS < (trailing + significant)[:, None])
+
+
+def encode(micros, values):
+    """
+    Encode epoch ``micros`` (int64, ascending) and their float64 ``values``.
+    """
+    micros = np.asarray(micros, dtype=np.int64)
+    bits = np.ascontiguousarray(values, dtype='<f8').view('<u8')
+    count = len(micros)
+
+    offsets = micros - micros[0] if count else micros
+    unit = next(unit for unit in UNITS if not (offsets % unit).any())
+    deltas = np.diff(offsets) // unit
+    dods = np.diff(deltas)
+    width = _width(dods)
+
+    xors = bits ^ np.concatenate([np.zeros(1, dtype='<u8'), bits[:-1]])
+    byte_matrix = xors.view(np.uint8).reshape(count, 8)
+    nonzero = byte_matrix != 0
+    present = nonzero.any(axis=1)
+    trailing = np.where(present, nonzero.argmax(axis=1), 0)
+    significant = np.where(present, 8 - nonzero[:, ::-1].argmax(axis=1) - trailing, 0)
+
+    return b''.join([
+        HEADER.pack(
+            FORMAT_VERSION, count, int(micros[0]) if count else 0,
+            unit, int(deltas[0]) if len(deltas) else 0, width
+        ),
+        dods.astype(f'<i{width}').tobytes() if width else b'',
+        (trailing << 4 | significant).astype(np.uint8).tobytes(),
+        byte_matrix[_byte_mask(trailing, significant)].tobytes(),
+    ])
+
+
+def decode(data):
+    """
+    Return the ``(micros, values)`` arrays of an encoded chunk.
+    """
+    data = bytes(data)
+    version, count, first, unit, delta, width = HEADER.unpack_from(data)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported chunk format version: {version}")
+    offset = HEADER.size
+
+    n_dods = max(count - 2, 0)
+    if width:
+        dods = np.frombuffer(data, dtype=f'<i{width}', count=n_dods, offset=offset).astype(np.int64)
+        offset += width * n_dods
+    else:
+        dods = np.zeros(n_dods, dtype=np.int64)
+    deltas = delta + np.concatenate([np.zeros(1, dtype=np.int64), np.cumsum(dods)])
+    micros = first + unit * np.concatenate([np.zeros(1, dtype=np.int64), np.cumsum(deltas)])[:count]
+
+    headers = np.frombuffer(data, dtype=np.uint8, count=count, offset=offset).astype(np.int64)
+    offset += count
+    byte_matrix = np.zeros((count, 8), dtype=np.uint8)
+    byte_matrix[_byte_mask(headers >> 4, headers & 0xF)] = np.frombuffer(data, dtype=np.uint8, offset=offset)
+    values = np.bitwise_xor.accumulate(byte_matrix.view('<u8').reshape(count)).view('<f8')
+    return micros, values.astype(np.float64)
@@ -0,0 +1,159 @@
+"""
+Coalesced ``MonitoringSource.last_seen`` tracking.
+
+Ingest paths record source activity in memory and publish it to the shared
+cache, so readers on any worker see the freshest value. Pending updates are
+written to ``monitoring_sources`` by a background timer as a single multi-row
+``INSERT ... ON CONFLICT DO UPDATE`` at most once per flush interval, instead
+of one ``update_or_create`` per source per request. The upsert keeps the
+later of the stored and flushed ``last_seen``, so a process flushing an
+older value cannot move it backwards.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from ..models import MonitoringSource
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'monitoring:last_seen:'
+
+
+def _cache_key(source_name):
+    return CACHE_KEY_PREFIX + hashlib.md5(source_name.encode()).hexdigest()
+
+
+class SourceHeartbeat:
+    """
+    Debounces last_seen writes for monitoring sources.
+    """
+
+    def __init__(self, flush_interval, publish_interval, cache_timeout):
+        self.flush_interval = flush_interval
+        self.publish_interval = publish_interval
+        self.cache_timeout = cache_timeout
+
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._published = {}
+        self._timer = None
+
+    def touch(self, source_names, seen_at=None):
+        """
+        Record that the given sources sent data at ``seen_at`` (default: now).
+        """
+        seen_at = seen_at or timezone.now()
+        now = time.monotonic()
+        to_publish = {}
+
+        with self._lock:
+            for name in source_names:
+                previous = self._pending.get(name)
+                if previous is None or seen_at > previous:
+                    self._pending[name] = seen_at
+                if now - self._published.get(name, float('-inf')) >= self.publish_interval:
+                    self._published[name] = now
+                    to_publish[_cache_key(name)] = seen_at
+
+            if self._pending and (self._timer is None or not self._timer.is_alive()):
+                self._timer = threading.Timer(self.flush_interval, self._flush_in_background)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if to_publish:
+            try:
+                cache.set_many(to_publish, timeout=self.cache_timeout)
+            except Exception as e:
+                logger.warning(f"Could not publish source heartbeats: {str(e)}")
+
+    def latest(self, source_names):
+        """
+        Return the freshest known last_seen per source name.
+        """
+        source_names = list(source_names)
+        keys = {_cache_key(name): name for name in source_names}
+        try:
+            cached = cache.get_many(keys)
+        except Exception as e:
+            logger.warning(f"Could not read source heartbeats: {str(e)}")
+            cached = {}
+
+        latest = {keys[key]: value for key, value in cached.items()}
+        with self._lock:
+            for name in source_names:
+                pending = self._pending.get(name)
+                if pending is not None and (name not in latest or pending > latest[name]):
+                    latest[name] = pending
+        return latest
+
+    def flush(self):
+        """
+        Upsert all pending last_seen values in one statement.
+
+        Returns the number of sources written.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        try:
+            _upsert(pending)
+        except Exception:
+            # Keep the values for the next attempt unless newer ones arrived
+            with self._lock:
+                for name, seen_at in pending.items():
+                    if name not in self._pending or self._pending[name] < seen_at:
+                        self._pending[name] = seen_at
+            raise
+        return len(pending)
+
+    def _flush_in_background(self):
+        try:
+            count = self.flush()
+            logger.debug(f"Flushed last_seen for {count} monitoring sources")
+        except Exception as e:
+            logger.error(f"Source heartbeat flush failed: {str(e)}")
+        finally:
+            connection.close()
+
+
+def _upsert(last_seen):
+    table = connection.ops.quote_name(MonitoringSource._meta.db_table)
+    if connection.vendor == 'postgresql':
+        latest = f'GREATEST({table}.last_seen, EXCLUDED.last_seen)'
+    else:
+        latest = f'MAX(COALESCE({table}.last_seen, EXCLUDED.last_seen), EXCLUDED.last_seen)'
+
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    placeholders = ', '.join(["(%s, '', %s, %s, '{}', %s, %s)"] * len(last_seen))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            INSERT INTO {table} (name, description, is_active, last_seen, metadata, created_at, updated_at)
+            VALUES {placeholders}
+            ON CONFLICT (name) DO UPDATE SET
+                last_seen = {latest},
+                updated_at = EXCLUDED.updated_at
+            ''',
+            [
+                value
+                for name, seen_at in last_seen.items()
+                for value in (name, True, connection.ops.adapt_datetimefield_value(seen_at), now, now)
+            ]
+        )
+
+
+heartbeat = SourceHeartbeat(
+    flush_interval=settings.MONITORING_HEARTBEAT_FLUSH_INTERVAL,
+    publish_interval=settings.MONITORING_HEARTBEAT_PUBLISH_INTERVAL,
+    cache_timeout=settings.MONITORING_HEARTBEAT_CACHE_TIMEOUT,
+)
@@ -0,0 +1,313 @@
+"""
+Streaming top-K of metric names by point volume.
+
+Ingest keeps a SpaceSaving summary of at most ``MONITORING_TOP_METRICS_CAPACITY``
+metric names per hour, once over all sources and once per source. Summaries
+are mergeable: adding two of them and keeping the largest counters preserves
+the SpaceSaving guarantees, so any range of hours is answered by merging its
+rows. Each reported count overestimates the true one by at most its
+``error``, which is itself at most ``total / capacity``, and any metric not
+reported has at most the smallest reported count.
+
+Per-source summaries are merged inside the ingest transaction, locking only
+the ``(source, hour)`` rows the batch touches. Every writer would lock the
+same all-sources row, so each process instead adds its committed counts to
+an in-memory buffer that a background timer merges into that row at most
+once per ``MONITORING_TOP_METRICS_FLUSH_INTERVAL``; readers in the process
+overlay what is still buffered.
+"""
+
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import MonitoringTopMetrics
+from .rollups import floor_time
+
+logger = logging.getLogger(__name__)
+
+BUCKET_SECONDS = 3600
+UPSERT_BATCH_SIZE = 1000
+
+
+class SpaceSaving:
+    """
+    SpaceSaving summary: ``counters`` maps an item to ``[count, error]``
+    where ``count - error`` is a lower bound on its true frequency.
+    """
+
+    def __init__(self, capacity, counters=None, total=0):
+        self.capacity = capacity
+        self.counters = counters or {}
+        self.total = total
+
+    @classmethod
+    def from_counts(cls, capacity, counts):
+        """
+        Exact summary of ``{item: count}``, truncated to ``capacity`` items.
+        """
+        summary = cls(capacity, {item: [count, 0] for item, count in counts.items()}, sum(counts.values()))
+        summary._truncate()
+        return summary
+
+    @classmethod
+    def from_json(cls, capacity, counters, total):
+        return cls(capacity, {item: [count, error] for item, count, error in counters}, total)
+
+    def to_json(self):
+        return [[item, count, error] for item, (count, error) in self._ranked()]
+
+    @property
+    def floor(self):
+        # Upper bound on the count of any item not in the summary
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(count for count, _ in self.counters.values())
+
+    def merge(self, other):
+        """
+        Return the merge of this summary and ``other``.
+
+        An item missing from a full summary may have occurred up to that
+        summary's floor times, which is added to both its count and error.
+        """
+        floor, other_floor = self.floor, other.floor
+        counters = {}
+        for item in self.counters.keys() | other.counters.keys():
+            count, error = self.counters.get(item, (floor, floor))
+            other_count, other_error = other.counters.get(item, (other_floor, other_floor))
+            counters[item] = [count + other_count, error + other_error]
+        merged = SpaceSaving(max(self.capacity, other.capacity), counters, self.total + other.total)
+        merged._truncate()
+        return merged
+
+    def top(self, limit):
+        """
+        Return up to ``limit`` ``(item, count, error)`` tuples, largest first.
+        """
+        return [(item, count, error) for item, (count, error) in self._ranked()[:limit]]
+
+    def _ranked(self):
+        return sorted(self.counters.items(), key=lambda entry: (-entry[1][0], entry[0]))
+
+    def _truncate(self):
+        if len(self.counters) > self.capacity:
+            self.counters = dict(self._ranked()[:self.capacity])
+
+
+def update_heavy_hitters(epoch_seconds, sources, metric_names):
+    """
+    Fold a batch of points into the hourly summaries.
+
+    ``epoch_seconds``, ``sources`` and ``metric_names`` are parallel sequences.
+    The per-source summaries are updated in the current transaction; the
+    all-sources counts are buffered once it commits.
+    """
+    epoch_seconds = np.asarray(epoch_seconds, dtype=np.float64).astype(np.int64)
+    if not len(epoch_seconds):
+        return
+    hours = (epoch_seconds - epoch_seconds % BUCKET_SECONDS).tolist()
+
+    per_source = Counter(zip(hours, sources, metric_names))
+    batch = {}
+    overall = {}
+    for (hour, source, metric_name), count in per_source.items():
+        counts = batch.setdefault((source, hour), {})
+        counts[metric_name] = counts.get(metric_name, 0) + count
+        counts = overall.setdefault(hour, {})
+        counts[metric_name] = counts.get(metric_name, 0) + count
+    _merge_into(batch)
+    transaction.on_commit(lambda: overall_top_metrics.add(overall))
+
+
+def _merge_into(batch):
+    """
+    Merge ``{(source, epoch_hour): {metric_name: count}}`` into the stored
+    summaries, locking each row before it is read.
+    """
+    keys = sorted(batch)
+    with transaction.atomic():
+        for offset in range(0, len(keys), UPSERT_BATCH_SIZE):
+            _merge_chunk(keys[offset:offset + UPSERT_BATCH_SIZE], batch)
+
+
+def _merge_chunk(keys, batch):
+    capacity = settings.MONITORING_TOP_METRICS_CAPACITY
+    table = connection.ops.quote_name(MonitoringTopMetrics._meta.db_table)
+    buckets = {hour: datetime.fromtimestamp(hour, tz=dt_timezone.utc) for _, hour in keys}
+
+    # Missing rows are inserted empty first so that every row can be locked
+    with connection.cursor() as cursor:
+        placeholders = ', '.join(['(%s, %s, 0, %s)'] * len(keys))
+        cursor.execute(
+            f'''
+            INSERT INTO {table} (source, bucket, total, counters)
+            VALUES {placeholders}
+            ON CONFLICT (source, bucket) DO NOTHING
+            ''',
+            [
+                value
+                for source, hour in keys
+                for value in (source, connection.ops.adapt_datetimefield_value(buckets[hour]), '[]')
+            ]
+        )
+
+    # Lock exactly the batch's rows, not every source x hour combination
+    sources = {}
+    for source, hour in keys:
+        sources.setdefault(hour, []).append(source)
+    condition = Q()
+    for hour, hour_sources in sources.items():
+        condition |= Q(bucket=buckets[hour], source__in=hour_sources)
+    stored = MonitoringTopMetrics.objects.select_for_update().filter(condition).order_by('id')
+    rows = {(row.source, int(row.bucket.timestamp())): row for row in stored}
+
+    updated = []
+    for key in keys:
+        row = rows[key]
+        summary = SpaceSaving.from_json(capacity, row.counters, row.total).merge(
+            SpaceSaving.from_counts(capacity, batch[key])
+        )
+        row.counters = summary.to_json()
+        row.total = summary.total
+        updated.append(row)
+    MonitoringTopMetrics.objects.bulk_update(updated, ['counters', 'total'])
+
+
+class OverallTopMetrics:
+    """
+    Buffers this process's all-sources metric counts per hour and merges
+    them into the stored summaries from a background timer.
+    """
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._timer = None
+
+    def add(self, counts):
+        """
+        Buffer ``{epoch_hour: {metric_name: count}}`` of committed points.
+        """
+        with self._lock:
+            for hour, metric_counts in counts.items():
+                self._pending.setdefault(hour, Counter()).update(metric_counts)
+
+            if self._pending and (self._timer is None or not self._timer.is_alive()):
+                self._timer = threading.Timer(self.flush_interval, self._flush_in_background)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def pending(self, start, end=None):
+        """
+        Return a copy of the counts buffered for the hours in ``[start, end)``.
+        """
+        with self._lock:
+            return {
+                hour: dict(counts)
+                for hour, counts in self._pending.items()
+                if hour >= start and (end is None or hour < end)
+            }
+
+    def flush(self):
+        """
+        Merge all buffered counts into their summaries in one transaction.
+
+        Returns the number of hours written.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        try:
+            _merge_into({
+                (MonitoringTopMetrics.ALL_SOURCES, hour): dict(counts) for hour, counts in pending.items()
+            })
+        except Exception:
+            # Keep the counts for the next attempt
+            with self._lock:
+                for hour, counts in pending.items():
+                    self._pending.setdefault(hour, Counter()).update(counts)
+            raise
+        return len(pending)
+
+    def _flush_in_background(self):
+        try:
+            count = self.flush()
+            logger.debug(f"Flushed top metric counts for {count} hours")
+        except Exception as e:
+            logger.error(f"Top metrics flush failed: {str(e)}")
+        finally:
+            connection.close()
+
+
+overall_top_metrics = OverallTopMetrics(flush_interval=settings.MONITORING_TOP_METRICS_FLUSH_INTERVAL)
+
+
+def merged_summary(start, end=None, source=None):
+    """
+    Merge the hourly summaries of the hours overlapping ``[start, end)``.
+
+    ``source`` selects one source's summaries instead of the overall ones,
+    which include the counts this process has not flushed yet.
+    """
+    capacity = settings.MONITORING_TOP_METRICS_CAPACITY
+    start = floor_time(start, BUCKET_SECONDS)
+    rows = MonitoringTopMetrics.objects.filter(
+        source=source or MonitoringTopMetrics.ALL_SOURCES,
+        bucket__gte=start
+    )
+    if end is not None:
+        rows = rows.filter(bucket__lt=end)
+
+    summary = SpaceSaving(capacity)
+    for counters, total in rows.values_list('counters', 'total'):
+        summary = summary.merge(SpaceSaving.from_json(capacity, counters, total))
+    if not source:
+        pending = overall_top_metrics.pending(
+            int(start.timestamp()), None if end is None else end.timestamp()
+        )
+        for counts in pending.values():
+            summary = summary.merge(SpaceSaving.from_counts(capacity, counts))
+    return summary
+
+
+def top_metrics(start, limit=10, source=None):
+    """
+    Return the ``limit`` metric names with the most points since ``start``
+    as ``{'metric_name', 'count', 'error'}`` dicts.
+
+    Whole hours are summarized, so the window starts at the beginning of the
+    hour containing ``start``.
+    """
+    return [
+        {'metric_name': metric_name, 'count': count, 'error': error}
+        for metric_name, count, error in merged_summary(start, source=source).top(limit)
+    ]
+
+
+def expire_heavy_hitters():
+    """
+    Delete hourly summaries older than ``MONITORING_TOP_METRICS_RETENTION_DAYS``.
+
+    Returns the number of rows deleted.
+    """
+    days = settings.MONITORING_TOP_METRICS_RETENTION_DAYS
+    if not days:
+        return 0
+    deleted, _ = MonitoringTopMetrics.objects.filter(
+        bucket__lt=timezone.now() - timedelta(days=days)
+    ).delete()
+    if deleted:
+        logger.info(f"Expired {deleted} top metric summaries")
+    return deleted
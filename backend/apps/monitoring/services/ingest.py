@@ -0,0 +1,145 @@
+"""
+Ingest pipeline for monitoring data points.
+"""
+
+import logging
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from ..models import MonitoringData
+from ..signals import points_ingested
+from .bulk_writer import copy_columns
+from .counters import record_counts
+from .heartbeat import heartbeat
+from .heavy_hitters import update_heavy_hitters
+from .rollups import update_rollups
+from .series import series_catalog
+from .sketches import update_sketches
+from .validation import PointBatch, validate_points
+
+logger = logging.getLogger(__name__)
+
+
+def write_points(points):
+    """
+    Persist validated monitoring points through the COPY bulk writer.
+
+    Points are resolved to series ids and copied in batches of
+    ``MONITORING_COPY_BATCH_SIZE``, so any iterable can be written with
+    bounded memory. Rollups, sketches, top metric summaries and point
+    counters are updated in the same transaction as each batch.
+
+    Returns the number of rows written.
+    """
+    points = iter(points)
+    total = 0
+    while True:
+        batch = list(islice(points, settings.MONITORING_COPY_BATCH_SIZE))
+        if not batch:
+            return total
+        total += write_batch(PointBatch.from_points(batch))
+
+
+def write_batch(batch):
+    """
+    Persist a columnar ``PointBatch`` (as returned by ``validate_points``).
+
+    Returns the number of rows written.
+    """
+    total = 0
+    batch_size = settings.MONITORING_COPY_BATCH_SIZE
+    for offset in range(0, len(batch), batch_size):
+        part = batch[offset:offset + batch_size]
+        with transaction.atomic():
+            series_ids = series_catalog.resolve_columns(part.sources, part.metric_names, part.tags)
+            total += copy_columns(series_ids, part.timestamps, part.values)
+            epoch_seconds = part.epoch_seconds()
+            update_rollups(series_ids, epoch_seconds, part.values)
+            update_sketches(series_ids, epoch_seconds, part.values)
+            update_heavy_hitters(epoch_seconds, part.sources, part.metric_names)
+            record_counts(epoch_seconds)
+            _notify_on_commit(part.metric_names, part.sources, int(epoch_seconds.min()))
+    return total
+
+
+def _notify_on_commit(metric_names, sources, oldest):
+    metric_names, sources = set(metric_names), set(sources)
+    transaction.on_commit(lambda: points_ingested.send(
+        sender=MonitoringData, metric_names=metric_names, sources=sources, oldest=oldest
+    ))
+
+
+def write_point(point):
+    """
+    Persist a single validated point and return the created row.
+    """
+    with transaction.atomic():
+        series_id = series_catalog.resolve([point])[0]
+        data = MonitoringData.objects.create(
+            series_id=series_id,
+            timestamp=point['timestamp'],
+            metric_value=point['metric_value']
+        )
+        epoch_seconds = [point['timestamp'].timestamp()]
+        update_rollups([series_id], epoch_seconds, [point['metric_value']])
+        update_sketches([series_id], epoch_seconds, [point['metric_value']])
+        update_heavy_hitters(epoch_seconds, [point['source']], [point['metric_name']])
+        record_counts(epoch_seconds)
+        _notify_on_commit([point['metric_name']], [point['source']], epoch_seconds[0])
+    return data
+
+
+def touch_sources(source_names):
+    """
+    Mark the given sources as seen now.
+
+    The database write is coalesced by the source heartbeat tracker.
+    """
+    heartbeat.touch(source_names)
+
+
+def stream_ingest(records, chunk_size=None):
+    """
+    Validate and write a stream of ``(line_number, record, error)`` tuples in
+    bounded chunks, as produced by ``NDJSONParser``.
+
+    Only one chunk is held in memory at a time. Each chunk is written in its
+    own statement, so earlier chunks stay committed if a later one is rejected.
+
+    Returns a list of per-chunk reports.
+    """
+    chunk_size = chunk_size or settings.MONITORING_INGEST_CHUNK_SIZE
+    max_errors = settings.MONITORING_INGEST_MAX_REPORTED_ERRORS
+    records = iter(records)
+    sources = set()
+    reports = []
+
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+
+        batch, row_errors = validate_points([record for _, record, error in chunk if error is None])
+        row_errors = iter(row_errors)
+        errors = []
+        for line_number, _, error in chunk:
+            if error is None:
+                error = next(row_errors)
+            if error:
+                errors.append({'line': line_number, 'errors': error})
+
+        accepted = write_batch(batch) if len(batch) else 0
+        sources.update(batch.sources)
+
+        reports.append({
+            'chunk': len(reports),
+            'accepted': accepted,
+            'rejected': len(errors),
+            'errors': errors[:max_errors],
+        })
+        logger.debug(f"Ingest chunk {len(reports) - 1}: {accepted} accepted, {len(errors)} rejected")
+
+    touch_sources(sources)
+    return reports
@@ -0,0 +1,283 @@
+"""
+Range partition management for ``monitoring_data``.
+
+The table is partitioned by ``timestamp`` into fixed windows of
+``MONITORING_PARTITION_DAYS`` days, aligned to the Unix epoch and named
+``monitoring_data_pYYYYMMDD`` after their lower bound. A default partition
+catches points outside every window. Future partitions are created ahead of
+time, and retention drops whole partitions instead of deleting rows.
+"""
+
+import logging
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+
+from ..models import MonitoringData
+from .chunks import expire_chunks
+from .counters import BUCKET_SECONDS, subtract_counts
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+DEFAULT_PARTITION_SUFFIX = '_default'
+# DETACH locks all of monitoring_data; give up rather than stall writers for longer
+DETACH_LOCK_TIMEOUT = '5s'
+
+_BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def _table():
+    return MonitoringData._meta.db_table
+
+
+def _parse_bound(value):
+    return datetime.fromisoformat(value).astimezone(dt_timezone.utc)
+
+
+def partition_window(moment, days=None):
+    """
+    Return the ``(start, end)`` of the partition window containing ``moment``.
+    """
+    width = timedelta(days=days or settings.MONITORING_PARTITION_DAYS)
+    start = EPOCH + ((moment - EPOCH) // width) * width
+    return start, start + width
+
+
+def partition_name(start):
+    return f'{_table()}_p{start:%Y%m%d}'
+
+
+def is_partitioned():
+    """
+    Whether ``monitoring_data`` is a partitioned table on this database.
+    """
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass',
+            [_table()]
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions():
+    """
+    Return ``(name, start, end)`` for each ranged partition, oldest first.
+
+    The default partition is not included.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            '''
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = %s::regclass
+            ''',
+            [_table()]
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        match = _BOUND_RE.search(bound or '')
+        if match:
+            partitions.append((name, _parse_bound(match.group(1)), _parse_bound(match.group(2))))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def list_detached_partitions():
+    """
+    Return the names of partitions detached from ``monitoring_data`` but not
+    dropped, e.g. by a run interrupted between the two.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            '''
+            SELECT relname FROM pg_class
+            WHERE relkind = 'r' AND NOT relispartition AND pg_table_is_visible(oid) AND relname ~ %s
+            ORDER BY relname
+            ''',
+            [f'^{_table()}_p[0-9]{{8}}$']
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def detach_partition(name):
+    """
+    Detach the partition ``name`` in a transaction of its own.
+
+    DETACH needs an ACCESS EXCLUSIVE lock on ``monitoring_data``. As the only
+    statement of its transaction it holds no lock that writers could be
+    waiting on, and ``DETACH_LOCK_TIMEOUT`` bounds how long they queue behind
+    it. (DETACH ... CONCURRENTLY is not allowed while the table has a default
+    partition.)
+
+    Returns False if the lock could not be taken in time.
+    """
+    table = connection.ops.quote_name(_table())
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"SET LOCAL lock_timeout = '{DETACH_LOCK_TIMEOUT}'")
+            cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {connection.ops.quote_name(name)}')
+    except OperationalError as exc:
+        logger.warning(f"Could not detach partition {name}, will retry: {exc}")
+        return False
+    return True
+
+
+def create_partition(start, end):
+    """
+    Create and attach the partition for ``[start, end)``.
+
+    Rows for the window that already landed in the default partition are
+    moved into the new partition first, so attaching it cannot fail.
+    """
+    table = connection.ops.quote_name(_table())
+    name = partition_name(start)
+    quoted_name = connection.ops.quote_name(name)
+    default = connection.ops.quote_name(_table() + DEFAULT_PARTITION_SUFFIX)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE {quoted_name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(
+            f'''
+            WITH moved AS (
+                DELETE FROM {default}
+                WHERE timestamp >= %s AND timestamp < %s
+                RETURNING *
+            )
+            INSERT INTO {quoted_name} SELECT * FROM moved
+            ''',
+            [start, end]
+        )
+        if cursor.rowcount:
+            logger.info(f"Moved {cursor.rowcount} rows from the default partition into {name}")
+        cursor.execute(
+            f'ALTER TABLE {table} ATTACH PARTITION {quoted_name} FOR VALUES FROM (%s) TO (%s)',
+            [start, end]
+        )
+    logger.info(f"Created partition {name} for [{start.isoformat()}, {end.isoformat()})")
+    return name
+
+
+def ensure_partitions(start=None, premake_days=None):
+    """
+    Create any missing partitions from ``start`` (default: now) up to
+    ``premake_days`` days ahead.
+
+    Returns the names of the partitions created.
+    """
+    if premake_days is None:
+        premake_days = settings.MONITORING_PARTITION_PREMAKE_DAYS
+    now = timezone.now()
+    existing = {partition_start for _, partition_start, _ in list_partitions()}
+
+    created = []
+    window_start, window_end = partition_window(start or now)
+    horizon = now + timedelta(days=premake_days)
+    while window_start <= horizon:
+        if window_start not in existing:
+            created.append(create_partition(window_start, window_end))
+        window_start, window_end = partition_window(window_end)
+    return created
+
+
+def _minute_counts(cursor, rows_sql, params):
+    """
+    Count the rows produced by ``rows_sql`` (which must return a
+    ``timestamp`` column) per point counter bucket.
+    """
+    cursor.execute(
+        f'''
+        WITH selected AS ({rows_sql})
+        SELECT to_timestamp(floor(extract(epoch FROM timestamp) / %s) * %s), count(*)
+        FROM selected
+        GROUP BY 1
+        ''',
+        list(params) + [BUCKET_SECONDS, BUCKET_SECONDS]
+    )
+    return dict(cursor.fetchall())
+
+
+def drop_expired_partitions(retention_days=None):
+    """
+    Drop partitions that lie entirely before the retention cutoff, prune
+    expired rows from the default partition and delete expired chunks.
+
+    Each partition is detached on its own first, then counted and dropped,
+    and its points subtracted from the point counters, in one transaction
+    that no longer blocks ``monitoring_data``. Expired partitions left
+    detached by an interrupted run are dropped the same way.
+
+    Returns the names of the partitions dropped.
+    """
+    if retention_days is None:
+        retention_days = settings.MONITORING_RAW_RETENTION_DAYS
+    if not retention_days:
+        return []
+
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    dropped = []
+
+    for name in list_detached_partitions():
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT MAX(timestamp) FROM {connection.ops.quote_name(name)}')
+            last = cursor.fetchone()[0]
+        if last is None or last < cutoff:
+            _drop_detached(name)
+            dropped.append(name)
+
+    for name, _, end in list_partitions():
+        if end > cutoff:
+            break
+        if not detach_partition(name):
+            break
+        _drop_detached(name)
+        dropped.append(name)
+
+    default = connection.ops.quote_name(_table() + DEFAULT_PARTITION_SUFFIX)
+    with transaction.atomic(), connection.cursor() as cursor:
+        counts = _minute_counts(
+            cursor,
+            f'DELETE FROM {default} WHERE timestamp < %s RETURNING timestamp',
+            [cutoff]
+        )
+        subtract_counts(counts)
+
+    with transaction.atomic():
+        seconds = expire_chunks(cutoff)
+        buckets, counts = np.unique(seconds - seconds % BUCKET_SECONDS, return_counts=True)
+        subtract_counts({
+            datetime.fromtimestamp(int(bucket), tz=dt_timezone.utc): int(count)
+            for bucket, count in zip(buckets, counts)
+        })
+    return dropped
+
+
+def _drop_detached(name):
+    quoted_name = connection.ops.quote_name(name)
+    with transaction.atomic(), connection.cursor() as cursor:
+        counts = _minute_counts(cursor, f'SELECT timestamp FROM {quoted_name}', [])
+        cursor.execute(f'DROP TABLE {quoted_name}')
+        subtract_counts(counts)
+    logger.info(f"Dropped expired partition {name}")
+
+
+def maintain_partitions():
+    """
+    Pre-create upcoming partitions and apply raw data retention.
+    """
+    if not is_partitioned():
+        logger.debug("monitoring_data is not partitioned; skipping partition maintenance")
+        return {'created': [], 'dropped': []}
+    return {
+        'created': ensure_partitions(),
+        'dropped': drop_expired_partitions(),
+    }
@@ -0,0 +1,148 @@
+"""
+Versioned, stale-while-revalidate cache for read endpoints.
+
+Each cached value records the data versions it was computed from. Ingest
+bumps the version of every scope it touches (see ``signals.py``): ``global``
+for any write, ``sources`` for source activity, ``metric:<digest>`` per
+metric name and ``sealed:<digest>`` per metric name when the batch reaches
+back into time that chunked caches treat as final. An entry is fresh while it is younger than its TTL and its
+versions still match; after that it is served stale for up to
+``METRICS_CACHE_STALE_TTL`` seconds while exactly one worker, holding a lock
+in the cache, recomputes it in the background.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils.http import quote_etag
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'metrics:response:'
+VERSION_PREFIX = 'metrics:version:'
+LOCK_PREFIX = 'metrics:lock:'
+WAIT_INTERVAL = 0.05
+
+
+def metric_scope(metric_name):
+    return 'metric:' + hashlib.md5(metric_name.encode()).hexdigest()
+
+
+def sealed_scope(metric_name):
+    return 'sealed:' + hashlib.md5(metric_name.encode()).hexdigest()
+
+
+def bump_versions(scopes):
+    """
+    Invalidate every cached value that depends on one of ``scopes``.
+    """
+    version = time.time_ns()
+    try:
+        cache.set_many({VERSION_PREFIX + scope: version for scope in scopes}, timeout=None)
+    except Exception as e:
+        logger.warning(f"Could not bump cache versions: {str(e)}")
+
+
+def _current_versions(scopes):
+    keys = [VERSION_PREFIX + scope for scope in scopes]
+    found = cache.get_many(keys)
+    return [found.get(key, 0) for key in keys]
+
+
+def data_versions(scopes):
+    """
+    Current versions of ``scopes``, or None when the cache is unavailable.
+    """
+    try:
+        return _current_versions(scopes)
+    except Exception as e:
+        logger.warning(f"Response cache unavailable: {str(e)}")
+        return None
+
+
+def response_etag(versions, *parts):
+    """
+    Quoted ETag for a response computed from data ``versions`` (as returned
+    by ``data_versions``) and ``parts`` describing the request and result.
+    """
+    return quote_etag(hashlib.md5(repr((versions, parts)).encode()).hexdigest())
+
+
+def _store(key, scopes, compute, ttl, stale_ttl):
+    versions = _current_versions(scopes)
+    value = compute()
+    now = time.time()
+    cache.set(
+        key,
+        {
+            'value': value,
+            'versions': versions,
+            'fresh_until': now + ttl,
+            'stale_until': now + ttl + stale_ttl,
+        },
+        timeout=int(ttl + stale_ttl) + 1
+    )
+    return value
+
+
+def _revalidate_in_background(key, lock_key, scopes, compute, ttl, stale_ttl):
+    def run():
+        try:
+            _store(key, scopes, compute, ttl, stale_ttl)
+        except Exception as e:
+            logger.error(f"Background recompute of {key} failed: {str(e)}")
+        finally:
+            cache.delete(lock_key)
+            connection.close()
+
+    threading.Thread(target=run, name='metrics-cache-revalidate', daemon=True).start()
+
+
+def cached(name, scopes, compute, ttl=None, stale_ttl=None):
+    """
+    Return the cached value of ``compute()`` for ``name``.
+
+    ``scopes`` lists the data versions the value depends on. Cold and expired
+    entries are recomputed by a single worker; others wait for it, or are
+    served the stale value while it is recomputed.
+    """
+    ttl = settings.METRICS_CACHE_TTL if ttl is None else ttl
+    stale_ttl = settings.METRICS_CACHE_STALE_TTL if stale_ttl is None else stale_ttl
+    key = KEY_PREFIX + hashlib.md5(name.encode()).hexdigest()
+    lock_key = LOCK_PREFIX + key
+    lock_timeout = settings.METRICS_CACHE_LOCK_TIMEOUT
+
+    try:
+        entry = cache.get(key)
+        versions = _current_versions(scopes)
+    except Exception as e:
+        logger.warning(f"Response cache unavailable: {str(e)}")
+        return compute()
+
+    now = time.time()
+    if entry is not None and now < entry['stale_until']:
+        if entry['versions'] == versions and now < entry['fresh_until']:
+            return entry['value']
+        if cache.add(lock_key, 1, timeout=lock_timeout):
+            _revalidate_in_background(key, lock_key, scopes, compute, ttl, stale_ttl)
+        return entry['value']
+
+    # Nothing servable: one worker computes, the rest wait for its result
+    deadline = time.monotonic() + lock_timeout
+    while not cache.add(lock_key, 1, timeout=lock_timeout):
+        if time.monotonic() >= deadline:
+            return compute()
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None and time.time() < entry['stale_until']:
+            return entry['value']
+
+    try:
+        return _store(key, scopes, compute, ttl, stale_ttl)
+    finally:
+        cache.delete(lock_key)
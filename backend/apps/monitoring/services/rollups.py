@@ -0,0 +1,260 @@
+"""
+Rollup tiers for monitoring data.
+
+Every ingested batch is folded into per-series min/max/sum/count buckets at
+1-minute, 1-hour and 1-day resolution. Readers use ``choose_resolution`` to
+pick the coarsest tier that still satisfies a requested step, and
+``plan_segments`` to split a time range into whole rollup buckets plus raw
+edges. Both only use a tier that is still retained (see
+``MONITORING_ROLLUP_RETENTION_DAYS``) at the start of what it would cover.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+
+from ..models import MonitoringData, MonitoringRollup
+from .chunks import chunk_stats
+
+logger = logging.getLogger(__name__)
+
+TIERS = (
+    MonitoringRollup.RESOLUTION_MINUTE,
+    MonitoringRollup.RESOLUTION_HOUR,
+    MonitoringRollup.RESOLUTION_DAY,
+)
+
+UPSERT_BATCH_SIZE = 1000
+
+
+def floor_time(moment, resolution):
+    """
+    Align ``moment`` down to a multiple of ``resolution`` seconds since the epoch.
+    """
+    seconds = int(moment.timestamp())
+    return datetime.fromtimestamp(seconds - seconds % resolution, tz=dt_timezone.utc)
+
+
+def ceil_time(moment, resolution):
+    floored = floor_time(moment, resolution)
+    return floored if floored == moment else floored + timedelta(seconds=resolution)
+
+
+def is_retained(resolution, moment, now=None):
+    """
+    Whether the ``resolution`` tier (raw points for None) still holds data
+    at ``moment``.
+    """
+    if resolution is None:
+        days = settings.MONITORING_RAW_RETENTION_DAYS
+    else:
+        days = settings.MONITORING_ROLLUP_RETENTION_DAYS.get(resolution)
+    return not days or moment >= (now or timezone.now()) - timedelta(days=days)
+
+
+def choose_resolution(start, end, step=None, max_points=None):
+    """
+    Return the coarsest rollup resolution (in seconds) whose buckets are no
+    wider than the requested ``step``, or than ``(end - start) / max_points``.
+
+    Tiers that have expired at ``start`` are skipped; if that leaves none
+    fine enough, the next coarser retained tier is used.
+
+    Returns None when raw data is needed.
+    """
+    targets = []
+    if step:
+        targets.append(step)
+    if max_points:
+        targets.append((end - start).total_seconds() / max_points)
+    if not targets:
+        return None
+
+    target = min(targets)
+    if target < TIERS[0]:
+        return None
+    now = timezone.now()
+    retained = [resolution for resolution in TIERS if is_retained(resolution, start, now)]
+    eligible = [resolution for resolution in retained if resolution <= target]
+    if eligible:
+        return max(eligible)
+    coarser = [resolution for resolution in retained if resolution > target]
+    return min(coarser) if coarser else None
+
+
+def plan_segments(start, end, tiers=TIERS, now=None):
+    """
+    Split ``[start, end)`` into ``(resolution, start, end)`` segments that use
+    the coarsest whole rollup buckets possible, with raw segments
+    (``resolution`` None) at the unaligned edges.
+
+    A tier is only used for a segment if it is retained at the segment's
+    start. Where neither a finer tier nor raw data is retained at the old
+    edge, the enclosing bucket of the coarser tier is used whole instead.
+    """
+    if start >= end:
+        return []
+    now = now or timezone.now()
+
+    for index in range(len(tiers) - 1, -1, -1):
+        resolution = tiers[index]
+        if not is_retained(resolution, start, now):
+            continue
+        inner_start = ceil_time(start, resolution)
+        inner_end = floor_time(end, resolution)
+        if inner_start < inner_end:
+            finer = tuple(tier for tier in tiers[:index] if is_retained(tier, start, now))
+            if inner_start > start and not finer and not is_retained(None, start, now):
+                inner_start = floor_time(start, resolution)
+            return (
+                plan_segments(start, inner_start, finer, now)
+                + [(resolution, inner_start, inner_end)]
+                + plan_segments(inner_end, end, tiers[:index], now)
+            )
+
+    return [(None, start, end)]
+
+
+def summarize(start, end, **series_filters):
+    """
+    Return avg/min/max/count over ``[start, end)`` for the series matching
+    ``series_filters`` (lookups on ``MonitoringSeries``), reading whole rollup
+    buckets where possible and raw points (rows or compacted chunks) only at
+    the edges.
+    """
+    lookups = {f'series__{key}': value for key, value in series_filters.items()}
+    count, total, low, high = 0, 0.0, None, None
+
+    for resolution, segment_start, segment_end in plan_segments(start, end):
+        if resolution is None:
+            stats = MonitoringData.objects.filter(
+                timestamp__gte=segment_start, timestamp__lt=segment_end, **lookups
+            ).aggregate(
+                count=Count('id'), sum=Sum('metric_value'),
+                min=Min('metric_value'), max=Max('metric_value')
+            )
+            _add_stats(stats, chunk_stats(segment_start, segment_end, **lookups))
+        else:
+            stats = MonitoringRollup.objects.filter(
+                resolution=resolution, bucket__gte=segment_start, bucket__lt=segment_end, **lookups
+            ).aggregate(
+                count=Sum('count'), sum=Sum('sum'), min=Min('min'), max=Max('max')
+            )
+
+        if not stats['count']:
+            continue
+        count += stats['count']
+        total += stats['sum']
+        low = stats['min'] if low is None else min(low, stats['min'])
+        high = stats['max'] if high is None else max(high, stats['max'])
+
+    return {
+        'avg': total / count if count else None,
+        'min': low,
+        'max': high,
+        'count': count,
+    }
+
+
+def _add_stats(stats, extra):
+    if not extra['count']:
+        return
+    if not stats['count']:
+        stats.update(extra)
+        return
+    stats['count'] += extra['count']
+    stats['sum'] += extra['sum']
+    stats['min'] = min(stats['min'], extra['min'])
+    stats['max'] = max(stats['max'], extra['max'])
+
+
+def update_rollups(series_ids, epoch_seconds, values):
+    """
+    Fold a batch of points into every rollup tier.
+
+    ``series_ids``, ``epoch_seconds`` and ``values`` are parallel arrays.
+    """
+    series_ids = np.asarray(series_ids, dtype=np.int64)
+    epoch_seconds = np.asarray(epoch_seconds, dtype=np.float64).astype(np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return
+
+    for resolution in TIERS:
+        buckets = epoch_seconds - epoch_seconds % resolution
+        keys = np.stack([series_ids, buckets], axis=1)
+        unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+
+        counts = np.bincount(inverse)
+        sums = np.bincount(inverse, weights=values)
+        mins = np.full(len(unique_keys), np.inf)
+        maxs = np.full(len(unique_keys), -np.inf)
+        np.minimum.at(mins, inverse, values)
+        np.maximum.at(maxs, inverse, values)
+
+        rows = [
+            (
+                int(series_id),
+                resolution,
+                datetime.fromtimestamp(int(bucket), tz=dt_timezone.utc),
+                int(count),
+                float(total),
+                float(low),
+                float(high),
+            )
+            for (series_id, bucket), count, total, low, high
+            in zip(unique_keys, counts, sums, mins, maxs)
+        ]
+        _upsert(rows)
+
+
+def _upsert(rows):
+    table = connection.ops.quote_name(MonitoringRollup._meta.db_table)
+    if connection.vendor == 'postgresql':
+        least, greatest = 'LEAST', 'GREATEST'
+    else:
+        least, greatest = 'MIN', 'MAX'
+
+    with connection.cursor() as cursor:
+        for offset in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[offset:offset + UPSERT_BATCH_SIZE]
+            placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(batch))
+            cursor.execute(
+                f'''
+                INSERT INTO {table} (series_id, resolution, bucket, count, sum, min, max)
+                VALUES {placeholders}
+                ON CONFLICT (series_id, resolution, bucket) DO UPDATE SET
+                    count = {table}.count + EXCLUDED.count,
+                    sum = {table}.sum + EXCLUDED.sum,
+                    min = {least}({table}.min, EXCLUDED.min),
+                    max = {greatest}({table}.max, EXCLUDED.max)
+                ''',
+                [value for row in batch for value in row]
+            )
+
+
+def expire_rollups():
+    """
+    Delete rollups older than their tier's retention.
+
+    Returns the number of rows deleted.
+    """
+    now = timezone.now()
+    deleted = 0
+    for resolution, days in settings.MONITORING_ROLLUP_RETENTION_DAYS.items():
+        if not days:
+            continue
+        count, _ = MonitoringRollup.objects.filter(
+            resolution=resolution,
+            bucket__lt=now - timedelta(days=days)
+        ).delete()
+        deleted += count
+    if deleted:
+        logger.info(f"Expired {deleted} rollup buckets")
+    return deleted
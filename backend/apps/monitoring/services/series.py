@@ -0,0 +1,111 @@
+"""
+Series catalog: interns (source, metric_name, tags) into integer series ids.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+
+from ..models import MonitoringSeries
+
+
+def series_key(source, metric_name, tags):
+    """
+    Stable digest identifying a series, independent of tag ordering.
+    """
+    identity = json.dumps([source, metric_name, tags or {}], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(identity.encode()).hexdigest()
+
+
+class SeriesCatalog:
+    """
+    Resolves points to series ids through an in-process LRU cache, creating
+    catalog rows for series that have not been seen before.
+    """
+
+    def __init__(self, cache_size):
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, points):
+        """
+        Return the series id for each point, in order.
+        """
+        return self.resolve_columns(
+            [point['source'] for point in points],
+            [point['metric_name'] for point in points],
+            [point.get('tags') for point in points],
+        )
+
+    def resolve_columns(self, sources, metric_names, tags):
+        """
+        Return the series id for each row of parallel source, metric name and
+        tags columns, in order.
+
+        Keys are only digested once per distinct series in the batch.
+        """
+        identities = [
+            (source, metric_name, json.dumps(point_tags, sort_keys=True) if point_tags else '')
+            for source, metric_name, point_tags in zip(sources, metric_names, tags)
+        ]
+        distinct = {}
+        for identity, point_tags in zip(identities, tags):
+            if identity not in distinct:
+                distinct[identity] = (series_key(identity[0], identity[1], point_tags), point_tags)
+
+        ids = {}
+        missing = {}
+        with self._lock:
+            for identity, (key, point_tags) in distinct.items():
+                series_id = self._cache.get(key)
+                if series_id is not None:
+                    self._cache.move_to_end(key)
+                    ids[key] = series_id
+                else:
+                    missing[key] = {'source': identity[0], 'metric_name': identity[1], 'tags': point_tags}
+
+        if missing:
+            ids.update(self._load(missing))
+
+        return [ids[distinct[identity][0]] for identity in identities]
+
+    def _load(self, missing):
+        MonitoringSeries.objects.bulk_create(
+            [
+                MonitoringSeries(
+                    key=key,
+                    source=point['source'],
+                    metric_name=point['metric_name'],
+                    tags=point.get('tags') or {},
+                )
+                for key, point in missing.items()
+            ],
+            ignore_conflicts=True,
+        )
+        resolved = dict(
+            MonitoringSeries.objects.filter(key__in=list(missing)).values_list('key', 'id')
+        )
+
+        # Only cache ids once the catalog rows are committed, so a rolled back
+        # ingest cannot leave ids in the cache that do not exist
+        transaction.on_commit(partial(self._remember, resolved))
+        return resolved
+
+    def _remember(self, resolved):
+        with self._lock:
+            self._cache.update(resolved)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+series_catalog = SeriesCatalog(settings.MONITORING_SERIES_CACHE_SIZE)
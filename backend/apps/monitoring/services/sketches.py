@@ -0,0 +1,395 @@
+"""
+Mergeable quantile sketches for monitoring data.
+
+Values are summarized per series and rollup bucket with DDSketch: each value
+is counted in a logarithmic bin, so any quantile can be answered with a
+relative error of at most ``RELATIVE_ACCURACY`` and sketches merge exactly by
+adding bin counts. Ingest folds every batch into the sketches of all rollup
+tiers; ``quantiles`` merges whole buckets over a range and adds the raw
+values at its unaligned edges, like ``rollups.summarize``.
+"""
+
+import logging
+import struct
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import MonitoringData, MonitoringSketch
+from .chunks import chunk_points
+from .rollups import TIERS, plan_segments
+
+logger = logging.getLogger(__name__)
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = np.log(GAMMA)
+# Values closer to zero than this are counted as zero
+MIN_INDEXABLE_VALUE = 1e-9
+
+FORMAT_VERSION = 1
+# version, bytes per count, zero count, negative bins, positive bins
+HEADER = struct.Struct('<BBQII')
+UPSERT_BATCH_SIZE = 1000
+LOCK_BATCH_BUCKETS = 100
+
+_EMPTY_BINS = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.uint64))
+
+
+def _bin_index(magnitudes):
+    return np.ceil(np.log(magnitudes) / LOG_GAMMA).astype(np.int32)
+
+
+def _bin_value(indices):
+    return 2 * np.power(GAMMA, indices.astype(np.float64)) / (GAMMA + 1)
+
+
+def _merge_bins(parts):
+    indices = np.concatenate([part[0] for part in parts])
+    counts = np.concatenate([part[1] for part in parts])
+    if not len(indices):
+        return _EMPTY_BINS
+    unique, inverse = np.unique(indices, return_inverse=True)
+    return unique.astype(np.int32), np.bincount(inverse, weights=counts).astype(np.uint64)
+
+
+class DDSketch:
+    """
+    Sparse DDSketch with separate bins for negative and positive values.
+
+    ``negative`` and ``positive`` are ``(indices, counts)`` array pairs sorted
+    by index, where bin ``i`` holds magnitudes in ``(GAMMA**(i-1), GAMMA**i]``.
+    """
+
+    def __init__(self, zero_count=0, negative=_EMPTY_BINS, positive=_EMPTY_BINS):
+        self.zero_count = int(zero_count)
+        self.negative = negative
+        self.positive = positive
+
+    @property
+    def count(self):
+        return self.zero_count + int(self.negative[1].sum()) + int(self.positive[1].sum())
+
+    @classmethod
+    def from_values(cls, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        magnitudes = np.abs(values)
+        indexable = magnitudes >= MIN_INDEXABLE_VALUE
+
+        stores = []
+        for mask in (indexable & (values < 0), indexable & (values > 0)):
+            indices = _bin_index(magnitudes[mask])
+            stores.append(_merge_bins([(indices, np.ones(len(indices), dtype=np.uint64))]))
+        return cls(np.count_nonzero(~indexable), *stores)
+
+    @classmethod
+    def merge(cls, sketches):
+        sketches = list(sketches)
+        return cls(
+            sum(sketch.zero_count for sketch in sketches),
+            _merge_bins([sketch.negative for sketch in sketches] + [_EMPTY_BINS]),
+            _merge_bins([sketch.positive for sketch in sketches] + [_EMPTY_BINS]),
+        )
+
+    def encode(self):
+        """
+        Serialize to bytes: a fixed header, then the int32 bin indices and
+        the bin counts (uint32, or uint64 when a count needs it), negative
+        bins first.
+        """
+        counts = np.concatenate([self.negative[1], self.positive[1]])
+        width = 8 if len(counts) and counts.max() > np.iinfo(np.uint32).max else 4
+        return b''.join([
+            HEADER.pack(FORMAT_VERSION, width, self.zero_count, len(self.negative[0]), len(self.positive[0])),
+            np.concatenate([self.negative[0], self.positive[0]]).astype('<i4').tobytes(),
+            counts.astype(f'<u{width}').tobytes(),
+        ])
+
+    @classmethod
+    def decode(cls, data):
+        data = bytes(data)
+        version, width, zero_count, n_negative, n_positive = HEADER.unpack_from(data)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported sketch format version: {version}")
+        n_bins = n_negative + n_positive
+        indices = np.frombuffer(data, dtype='<i4', count=n_bins, offset=HEADER.size).astype(np.int32)
+        counts = np.frombuffer(
+            data, dtype=f'<u{width}', count=n_bins, offset=HEADER.size + 4 * n_bins
+        ).astype(np.uint64)
+        return cls(
+            zero_count,
+            (indices[:n_negative], counts[:n_negative]),
+            (indices[n_negative:], counts[n_negative:]),
+        )
+
+    def quantiles(self, qs):
+        """
+        Return the estimated value at each quantile in ``qs`` (0..1), or
+        Nones when the sketch is empty.
+        """
+        if not self.count:
+            return [None] * len(qs)
+
+        # Ascending value order: largest negative magnitudes first, then zero, then positives
+        values = np.concatenate([
+            -_bin_value(self.negative[0][::-1]),
+            [0.0],
+            _bin_value(self.positive[0]),
+        ])
+        counts = np.concatenate([
+            self.negative[1][::-1],
+            [self.zero_count],
+            self.positive[1],
+        ]).astype(np.float64)
+        cumulative = np.cumsum(counts)
+        ranks = np.asarray(qs, dtype=np.float64) * (cumulative[-1] - 1)
+        positions = np.searchsorted(cumulative, ranks, side='right')
+        return [float(value) for value in values[positions]]
+
+
+def update_sketches(series_ids, epoch_seconds, values):
+    """
+    Fold a batch of points into the sketches of every rollup tier.
+
+    ``series_ids``, ``epoch_seconds`` and ``values`` are parallel arrays.
+    Each value's bin is computed once for the whole batch. Every tier then
+    counts ``(series, bucket, sign, bin)`` rows with one sort, merges them
+    with the stored bins the same way and encodes the result from slices of
+    shared buffers, so no sketch object is built per series.
+    """
+    series_ids = np.asarray(series_ids, dtype=np.int64)
+    epoch_seconds = np.asarray(epoch_seconds, dtype=np.float64).astype(np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    if not finite.all():
+        series_ids, epoch_seconds, values = series_ids[finite], epoch_seconds[finite], values[finite]
+    if not len(values):
+        return
+
+    # Sign -1/1 for the negative/positive stores, 0 for the zero bin
+    magnitudes = np.abs(values)
+    indexable = magnitudes >= MIN_INDEXABLE_VALUE
+    signs = np.where(indexable, np.sign(values), 0).astype(np.int64)
+    indices = np.zeros(len(values), dtype=np.int64)
+    indices[indexable] = _bin_index(magnitudes[indexable])
+
+    for resolution in TIERS:
+        buckets = epoch_seconds - epoch_seconds % resolution
+        _merge_into(resolution, *_count_bins(series_ids, buckets, signs, indices))
+
+
+def _count_bins(series_ids, buckets, signs, indices, counts=None):
+    """
+    Sum ``counts`` (default one each) per distinct ``(series, bucket, sign,
+    index)``. Returns the distinct rows as columns, sorted, and their totals.
+    """
+    order = np.lexsort((indices, signs, buckets, series_ids))
+    columns = [column[order] for column in (series_ids, buckets, signs, indices)]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = np.any([np.diff(column) != 0 for column in columns], axis=0)
+    totals = np.bincount(
+        np.cumsum(first) - 1, weights=None if counts is None else counts[order]
+    ).astype(np.int64)
+    return [column[first] for column in columns] + [totals]
+
+
+def _decode_bins(series_ids, buckets, blobs):
+    """
+    The bins of stored sketches as ``_count_bins`` columns (unsorted).
+    """
+    parts = []
+    for series_id, bucket, data in zip(series_ids, buckets, blobs):
+        version, width, zero_count, n_negative, n_positive = HEADER.unpack_from(data)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported sketch format version: {version}")
+        n_bins = n_negative + n_positive
+        indices = np.frombuffer(data, dtype='<i4', count=n_bins, offset=HEADER.size)
+        counts = np.frombuffer(data, dtype=f'<u{width}', count=n_bins, offset=HEADER.size + 4 * n_bins)
+        parts.append((
+            series_id, bucket, n_negative, n_positive,
+            np.concatenate([indices, [0]]), np.concatenate([counts, [zero_count]])
+        ))
+
+    sizes = np.array([part[2] + part[3] + 1 for part in parts])
+    signs = np.concatenate([
+        np.repeat([-1, 1, 0], [part[2], part[3], 1]) for part in parts
+    ])
+    return (
+        np.repeat([part[0] for part in parts], sizes),
+        np.repeat([part[1] for part in parts], sizes),
+        signs,
+        np.concatenate([part[4] for part in parts]).astype(np.int64),
+        np.concatenate([part[5] for part in parts]).astype(np.int64),
+    )
+
+
+def _encode_bins(key_starts, signs, indices, counts):
+    """
+    Encode one sketch per key from ``_count_bins`` columns, where each key's
+    rows start at ``key_starts`` and run to the next start.
+
+    The output is byte for byte what ``DDSketch.encode`` produces.
+    """
+    n_keys = len(key_starts)
+    key_of_row = np.repeat(np.arange(n_keys), np.diff(np.append(key_starts, len(signs))))
+    zero = signs == 0
+    zero_counts = np.bincount(key_of_row[zero], weights=counts[zero], minlength=n_keys).astype(np.int64)
+
+    # Without the zero bins each key's negative then positive bins are contiguous
+    key_of_row, signs, indices, counts = key_of_row[~zero], signs[~zero], indices[~zero], counts[~zero]
+    n_negative = np.bincount(key_of_row[signs < 0], minlength=n_keys)
+    n_positive = np.bincount(key_of_row[signs > 0], minlength=n_keys)
+    bounds = np.concatenate([[0], np.cumsum(n_negative + n_positive)]).tolist()
+    wide = np.bincount(key_of_row[counts > np.iinfo(np.uint32).max], minlength=n_keys) > 0
+
+    index_bytes = indices.astype('<i4').tobytes()
+    count_bytes = counts.astype('<u4').tobytes()
+    encoded = []
+    for key, (negative, positive, zero_count, start, end) in enumerate(zip(
+        n_negative.tolist(), n_positive.tolist(), zero_counts.tolist(), bounds[:-1], bounds[1:]
+    )):
+        if wide[key]:
+            body = counts[start:end].astype('<u8').tobytes()
+        else:
+            body = count_bytes[4 * start:4 * end]
+        encoded.append(b''.join([
+            HEADER.pack(FORMAT_VERSION, 8 if wide[key] else 4, zero_count, negative, positive),
+            index_bytes[4 * start:4 * end],
+            body,
+        ]))
+    return encoded
+
+
+def _merge_into(resolution, series_ids, buckets, signs, indices, counts):
+    """
+    Merge sorted ``_count_bins`` columns of epoch buckets into the stored
+    sketches.
+
+    Missing rows are inserted empty first, so that every row can be locked
+    before it is read and concurrent writers merge instead of overwriting.
+    Only the batch's exact (series, bucket) pairs are locked.
+    """
+    table = connection.ops.quote_name(MonitoringSketch._meta.db_table)
+    empty = DDSketch().encode()
+
+    def key_starts():
+        new_key = np.ones(len(series_ids), dtype=bool)
+        new_key[1:] = (np.diff(series_ids) != 0) | (np.diff(buckets) != 0)
+        return np.flatnonzero(new_key)
+
+    starts = key_starts()
+    rows = [
+        (series_id, resolution, datetime.fromtimestamp(bucket, tz=dt_timezone.utc))
+        for series_id, bucket in zip(series_ids[starts].tolist(), buckets[starts].tolist())
+    ]
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        _upsert(cursor, table, [row + (empty,) for row in rows], 'DO NOTHING')
+
+        # A batch spans few buckets, so its pairs are matched as series lists per bucket
+        by_bucket = {}
+        for series_id, _, bucket in rows:
+            by_bucket.setdefault(bucket, []).append(series_id)
+        groups = list(by_bucket.items())
+
+        stored = ([], [], [])
+        for offset in range(0, len(groups), LOCK_BATCH_BUCKETS):
+            pairs = Q()
+            for bucket, bucket_series in groups[offset:offset + LOCK_BATCH_BUCKETS]:
+                pairs |= Q(bucket=bucket, series_id__in=bucket_series)
+            existing = MonitoringSketch.objects.select_for_update().filter(
+                pairs, resolution=resolution
+            ).order_by('id').values_list('series_id', 'bucket', 'sketch')
+            for series_id, bucket, data in existing:
+                data = bytes(data)
+                if data != empty:
+                    stored[0].append(series_id)
+                    stored[1].append(int(bucket.timestamp()))
+                    stored[2].append(data)
+
+        if stored[2]:
+            series_ids, buckets, signs, indices, counts = _count_bins(*(
+                np.concatenate([batch_column, stored_column])
+                for batch_column, stored_column in zip(
+                    (series_ids, buckets, signs, indices, counts), _decode_bins(*stored)
+                )
+            ))
+        merged = [row + (data,) for row, data in zip(rows, _encode_bins(key_starts(), signs, indices, counts))]
+        _upsert(cursor, table, merged, 'DO UPDATE SET sketch = EXCLUDED.sketch')
+
+
+def _upsert(cursor, table, rows, on_conflict):
+    # Rows share a few buckets; adapt each once
+    adapted = {bucket: connection.ops.adapt_datetimefield_value(bucket) for bucket in {row[2] for row in rows}}
+    for offset in range(0, len(rows), UPSERT_BATCH_SIZE):
+        batch = rows[offset:offset + UPSERT_BATCH_SIZE]
+        placeholders = ', '.join(['(%s, %s, %s, %s)'] * len(batch))
+        cursor.execute(
+            f'''
+            INSERT INTO {table} (series_id, resolution, bucket, sketch)
+            VALUES {placeholders}
+            ON CONFLICT (series_id, resolution, bucket) {on_conflict}
+            ''',
+            [
+                value
+                for series_id, resolution, bucket, data in batch
+                for value in (series_id, resolution, adapted[bucket], data)
+            ]
+        )
+
+
+def merged_sketch(start, end, **series_filters):
+    """
+    Return one sketch of all values in ``[start, end)`` for the series
+    matching ``series_filters`` (lookups on ``MonitoringSeries``).
+    """
+    lookups = {f'series__{key}': value for key, value in series_filters.items()}
+    sketches = []
+
+    for resolution, segment_start, segment_end in plan_segments(start, end):
+        if resolution is None:
+            values = MonitoringData.objects.filter(
+                timestamp__gte=segment_start, timestamp__lt=segment_end, **lookups
+            ).order_by().values_list('metric_value', flat=True)
+            compacted = chunk_points(segment_start, segment_end, **lookups)[2]
+            sketches.append(DDSketch.from_values(np.concatenate([np.fromiter(values, dtype=np.float64), compacted])))
+        else:
+            stored = MonitoringSketch.objects.filter(
+                resolution=resolution, bucket__gte=segment_start, bucket__lt=segment_end, **lookups
+            ).values_list('sketch', flat=True)
+            sketches.extend(DDSketch.decode(data) for data in stored.iterator())
+
+    return DDSketch.merge(sketches)
+
+
+def quantiles(start, end, qs, **series_filters):
+    """
+    Estimate the values at quantiles ``qs`` (0..1) over ``[start, end)``.
+    """
+    return merged_sketch(start, end, **series_filters).quantiles(qs)
+
+
+def expire_sketches():
+    """
+    Delete sketches older than their tier's rollup retention.
+
+    Returns the number of rows deleted.
+    """
+    now = timezone.now()
+    deleted = 0
+    for resolution, days in settings.MONITORING_ROLLUP_RETENTION_DAYS.items():
+        if not days:
+            continue
+        count, _ = MonitoringSketch.objects.filter(
+            resolution=resolution,
+            bucket__lt=now - timedelta(days=days)
+        ).delete()
+        deleted += count
+    if deleted:
+        logger.info(f"Expired {deleted} sketch buckets")
+    return deleted
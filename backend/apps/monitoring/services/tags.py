@@ -0,0 +1,88 @@
+"""
+Tag filters on the series catalog.
+
+A filter is written ``key=value``, ``key=v1,v2`` (any of the values) or
+``key!=value`` / ``key!=v1,v2`` (none of them; series without the tag pass).
+Filters combine with AND and compare string tag values.
+
+On PostgreSQL they become ``@>`` containment tests answered by the
+``jsonb_path_ops`` GIN index on ``monitoring_series.tags``. All equalities
+are folded into one containment document, so a multi-tag intersection is a
+single index probe; each value list adds a bitmap OR of probes.
+"""
+
+import re
+from collections import namedtuple
+
+from django.db import connection
+from django.db.models import Q, TextField
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast
+from django.db.models.lookups import In, IsNull
+
+TagFilter = namedtuple('TagFilter', ['key', 'values', 'negate'])
+
+_FILTER_RE = re.compile(r'^([^=!,]+?)\s*(!?=)(.*)$')
+
+
+def parse_tag_filters(expressions):
+    """
+    Parse ``tag`` parameters into a tuple of TagFilters, in a canonical
+    order so that equivalent requests compare equal.
+
+    Raises ValueError for malformed filters.
+    """
+    if isinstance(expressions, str):
+        expressions = [expressions]
+    filters = set()
+    for expression in expressions:
+        match = _FILTER_RE.match(str(expression).strip())
+        values = match and tuple(sorted({value.strip() for value in match.group(3).split(',') if value.strip()}))
+        if not values:
+            raise ValueError(
+                f'Invalid tag filter: {expression!r} (expected key=value, key=v1,v2 or key!=value)'
+            )
+        filters.add(TagFilter(match.group(1).strip(), values, match.group(2) == '!='))
+    return tuple(sorted(filters))
+
+
+def tag_condition(filters, field='series__tags'):
+    """
+    Q object matching rows whose ``field`` tags satisfy every filter.
+    """
+    condition = Q()
+    if not filters:
+        return condition
+
+    if connection.vendor == 'postgresql':
+        equal = {tag.key: tag.values[0] for tag in filters if not tag.negate and len(tag.values) == 1}
+        if equal:
+            condition &= Q(**{f'{field}__contains': equal})
+        for tag in filters:
+            if tag.key in equal:
+                continue
+            any_of = Q()
+            for value in tag.values:
+                any_of |= Q(**{f'{field}__contains': {tag.key: value}})
+            condition &= ~any_of if tag.negate else any_of
+        return condition
+
+    # Same semantics without containment support, compared as text
+    for tag in filters:
+        value = Cast(KeyTextTransform(tag.key, field), TextField())
+        if tag.negate:
+            condition &= Q(IsNull(value, True)) | ~Q(In(value, list(tag.values)))
+        else:
+            condition &= Q(In(value, list(tag.values)))
+    return condition
+
+
+def tags_match(tags, filters):
+    """
+    Whether a series' ``tags`` dict satisfies every filter.
+    """
+    for tag in filters:
+        value = (tags or {}).get(tag.key)
+        if (isinstance(value, str) and value in tag.values) == tag.negate:
+            return False
+    return True
@@ -0,0 +1,310 @@
+"""
+Columnar validation for bulk monitoring ingest.
+
+``validate_points`` enforces the same rules as ``MonitoringDataCreateSerializer``
+on a whole batch at once and returns a ``PointBatch`` of NumPy columns ready
+for the bulk writer, plus DRF ``many=True``-shaped per-row errors.
+
+The common shapes are handled column-wise: canonical ISO 8601 timestamps
+(``YYYY-MM-DDTHH:MM:SS[.ffffff][Z|+00:00]``) are parsed from a character
+matrix, numeric values are converted in one NumPy call, and repeated source
+and metric names are validated once per distinct value. Anything else is
+passed to the serializer's own fields, and rows that fail are re-validated by
+the serializer itself, so accepted values and error messages are identical.
+"""
+
+import json
+from collections.abc import Mapping
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import empty
+
+from ..serializers import MonitoringDataCreateSerializer
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+_MAX_TIMESTAMP_LENGTH = 32
+_DIGIT_COLUMNS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]
+_FRACTION_COLUMNS = np.arange(20, 26)
+_FRACTION_WEIGHTS = 10 ** (5 - np.arange(6))
+_UTC_SUFFIX = np.array([ord(char) for char in '+00:00'], dtype=np.uint32)
+
+
+class PointBatch:
+    """
+    Validated monitoring points as parallel columns.
+
+    ``timestamps`` is a ``datetime64[us]`` array in UTC and ``values`` a
+    float64 array; ``sources``, ``metric_names`` and ``tags`` are lists.
+    """
+
+    def __init__(self, timestamps, sources, metric_names, values, tags):
+        self.timestamps = timestamps
+        self.sources = sources
+        self.metric_names = metric_names
+        self.values = values
+        self.tags = tags
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, key):
+        return PointBatch(
+            self.timestamps[key],
+            self.sources[key],
+            self.metric_names[key],
+            self.values[key],
+            self.tags[key],
+        )
+
+    @classmethod
+    def from_points(cls, points):
+        """
+        Build a batch from validated point dicts (serializer ``validated_data``).
+        """
+        points = list(points)
+        return cls(
+            np.array(
+                [_to_micros(point['timestamp']) for point in points], dtype=np.int64
+            ).astype('datetime64[us]'),
+            [point['source'] for point in points],
+            [point['metric_name'] for point in points],
+            np.array([point['metric_value'] for point in points], dtype=np.float64),
+            [point.get('tags', {}) for point in points],
+        )
+
+    def epoch_seconds(self):
+        return self.timestamps.astype(np.int64) // 1_000_000
+
+    def points(self):
+        """
+        Yield the points as dicts shaped like serializer ``validated_data``.
+        """
+        for micros, source, metric_name, value, tags in zip(
+            self.timestamps.astype(np.int64).tolist(), self.sources,
+            self.metric_names, self.values.tolist(), self.tags
+        ):
+            yield {
+                'timestamp': EPOCH + micros * ONE_MICROSECOND,
+                'source': source,
+                'metric_name': metric_name,
+                'metric_value': value,
+                'tags': tags,
+            }
+
+
+def _to_micros(moment):
+    return (moment - EPOCH) // ONE_MICROSECOND
+
+
+def _parse_iso_timestamps(strings, naive_is_utc):
+    """
+    Parse canonical ISO 8601 strings column-wise.
+
+    Returns ``(micros, parsed)`` where ``parsed`` marks the rows that matched
+    the canonical shape and hold a real date; other rows must be validated
+    individually.
+    """
+    count = len(strings)
+    lengths = np.fromiter(map(len, strings), dtype=np.int64, count=count)
+    parsed = (lengths >= 19) & (lengths <= _MAX_TIMESTAMP_LENGTH)
+    if not parsed.any():
+        return np.zeros(count, dtype=np.int64), parsed
+    if not parsed.all():
+        strings = [string if ok else '' for string, ok in zip(strings, parsed)]
+        # Blanked rows must not index past the end of the character matrix
+        lengths = np.where(parsed, lengths, 0)
+
+    codes = np.array(strings, dtype=f'U{_MAX_TIMESTAMP_LENGTH}').view(np.uint32).reshape(count, -1)
+    rows = np.arange(count)
+
+    # Timezone suffix: "Z", "+00:00", or none (naive, current timezone)
+    zulu = codes[rows, np.maximum(lengths - 1, 0)] == ord('Z')
+    suffix_columns = np.clip(lengths[:, None] - 6 + np.arange(6), 0, _MAX_TIMESTAMP_LENGTH - 1)
+    offset = (lengths >= 25) & (codes[rows[:, None], suffix_columns] == _UTC_SUFFIX).all(axis=1)
+    core = lengths - np.where(zulu, 1, np.where(offset, 6, 0))
+    if not naive_is_utc:
+        parsed &= zulu | offset
+
+    parsed &= (core == 19) | ((core >= 21) & (core <= 26) & (codes[:, 19] == ord('.')))
+    parsed &= (codes[:, 4] == ord('-')) & (codes[:, 7] == ord('-'))
+    parsed &= (codes[:, 10] == ord('T')) | (codes[:, 10] == ord(' '))
+    parsed &= (codes[:, 13] == ord(':')) & (codes[:, 16] == ord(':'))
+
+    digits = codes[:, _DIGIT_COLUMNS].astype(np.int64) - ord('0')
+    parsed &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+
+    fraction_used = _FRACTION_COLUMNS < core[:, None]
+    fraction = codes[:, _FRACTION_COLUMNS].astype(np.int64) - ord('0')
+    parsed &= (~fraction_used | ((fraction >= 0) & (fraction <= 9))).all(axis=1)
+    micros_part = (np.where(fraction_used, fraction, 0) * _FRACTION_WEIGHTS).sum(axis=1)
+
+    digits = np.where(parsed[:, None], digits, 0)
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month = digits[:, 4] * 10 + digits[:, 5]
+    day = digits[:, 6] * 10 + digits[:, 7]
+    hour = digits[:, 8] * 10 + digits[:, 9]
+    minute = digits[:, 10] * 10 + digits[:, 11]
+    second = digits[:, 12] * 10 + digits[:, 13]
+
+    parsed &= (year >= 1) & (month >= 1) & (month <= 12)
+    month_start = (
+        (np.where(parsed, year, 1970) - 1970).astype('datetime64[Y]')
+        + (np.where(parsed, month, 1) - 1).astype('timedelta64[M]')
+    )
+    first_day = month_start.astype('datetime64[D]').astype(np.int64)
+    days_in_month = (month_start + np.timedelta64(1, 'M')).astype('datetime64[D]').astype(np.int64) - first_day
+    parsed &= (day >= 1) & (day <= days_in_month) & (hour < 24) & (minute < 60) & (second < 60)
+
+    micros = (
+        (first_day + day - 1) * 86_400_000_000
+        + ((hour * 60 + minute) * 60 + second) * 1_000_000
+        + micros_part
+    )
+    return np.where(parsed, micros, 0), parsed
+
+
+def _validate_strings(field, column, invalid):
+    """
+    Validate a CharField column, once per distinct value where possible.
+    """
+    if set(map(type, column)) == {str}:
+        cleaned = {}
+        for value in set(column):
+            try:
+                cleaned[value] = field.run_validation(value)
+            except ValidationError:
+                cleaned[value] = None
+        result = list(map(cleaned.__getitem__, column))
+        if None not in cleaned.values():
+            return result
+    else:
+        result = []
+        for value in column:
+            try:
+                result.append(field.run_validation(value))
+            except ValidationError:
+                result.append(None)
+
+    for index, value in enumerate(result):
+        if value is None:
+            invalid[index] = True
+    return result
+
+
+def validate_points(records):
+    """
+    Validate a list of ingest records.
+
+    Returns ``(batch, errors)``: a ``PointBatch`` holding the valid rows in
+    input order, and a list with one entry per record that is empty for valid
+    rows and holds the serializer's errors otherwise.
+    """
+    serializer = MonitoringDataCreateSerializer()
+    fields = serializer.fields
+    records = list(records)
+    count = len(records)
+
+    if set(map(type, records)) <= {dict}:
+        invalid = np.zeros(count, dtype=bool)
+        rows = records
+    else:
+        invalid = np.array([not isinstance(record, Mapping) for record in records], dtype=bool)
+        rows = [record if isinstance(record, Mapping) else {} for record in records]
+
+    # timestamp
+    column = [row.get('timestamp', empty) for row in rows]
+    naive_is_utc = timezone.get_current_timezone_name() == 'UTC'
+    micros = np.zeros(count, dtype=np.int64)
+    parsed = np.zeros(count, dtype=bool)
+    if set(map(type, column)) == {str}:
+        micros, parsed = _parse_iso_timestamps(column, naive_is_utc)
+    else:
+        text_rows = np.array([type(value) is str for value in column], dtype=bool)
+        text_index = np.flatnonzero(text_rows)
+        text_micros, text_parsed = _parse_iso_timestamps(
+            [column[index] for index in text_index], naive_is_utc
+        )
+        micros[text_index] = text_micros
+        parsed[text_index] = text_parsed
+    for index in np.flatnonzero(~parsed & ~invalid):
+        try:
+            micros[index] = _to_micros(fields['timestamp'].run_validation(column[index]))
+        except ValidationError:
+            invalid[index] = True
+
+    # source, metric_name
+    sources = _validate_strings(fields['source'], [row.get('source', empty) for row in rows], invalid)
+    metric_names = _validate_strings(
+        fields['metric_name'], [row.get('metric_name', empty) for row in rows], invalid
+    )
+
+    # metric_value
+    column = [row.get('metric_value', empty) for row in rows]
+    values = None
+    if set(map(type, column)) <= {int, float}:
+        try:
+            values = np.array(column, dtype=np.float64)
+        except (OverflowError, ValueError):
+            values = None
+    if values is None:
+        values = np.zeros(count, dtype=np.float64)
+        for index, value in enumerate(column):
+            if type(value) is float or type(value) is int:
+                values[index] = value
+                continue
+            try:
+                values[index] = fields['metric_value'].run_validation(value)
+            except ValidationError:
+                invalid[index] = True
+
+    # tags: plain dicts only need the JSON check, done for the whole column at once
+    column = [row.get('tags', empty) for row in rows]
+    if set(map(type, column)) == {dict}:
+        try:
+            json.dumps(column)
+            tags = column
+        except (TypeError, ValueError):
+            tags = None
+    else:
+        tags = None
+    if tags is None:
+        tags = []
+        for index, value in enumerate(column):
+            try:
+                tags.append(fields['tags'].run_validation(value))
+            except ValidationError:
+                tags.append(None)
+                invalid[index] = True
+
+    errors = [{} for _ in range(count)]
+    for index in np.flatnonzero(invalid):
+        try:
+            point = serializer.run_validation(records[index])
+        except ValidationError as exc:
+            errors[index] = exc.detail
+            continue
+        # Shapes the column paths gave up on but the serializer accepts
+        invalid[index] = False
+        micros[index] = _to_micros(point['timestamp'])
+        sources[index] = point['source']
+        metric_names[index] = point['metric_name']
+        values[index] = point['metric_value']
+        tags[index] = point['tags']
+
+    if not invalid.any():
+        return PointBatch(micros.astype('datetime64[us]'), sources, metric_names, values, tags), errors
+
+    valid = np.flatnonzero(~invalid)
+    batch = PointBatch(
+        micros[valid].astype('datetime64[us]'),
+        [sources[index] for index in valid],
+        [metric_names[index] for index in valid],
+        values[valid],
+        [tags[index] for index in valid],
+    )
+    return batch, errors
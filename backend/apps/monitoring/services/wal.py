@@ -0,0 +1,251 @@
+"""
+Write-behind ingest log.
+
+Points accepted in write-behind mode are appended to a local, segmented,
+append-only log and acknowledged immediately. A background flusher drains
+sealed segments into Postgres in large COPY batches.
+
+Each process appends to its own ``.open`` segment and holds an exclusive
+``flock`` on it for as long as it is writing. A segment is sealed (renamed to
+``.log``) once it is large or old enough. Because the lock dies with its
+process, an ``.open`` segment that can be locked by someone else belongs to a
+process that crashed or restarted; the flusher seals and replays it. A new
+segment is created and locked under a ``.new`` name and only then renamed to
+``.open``, so that it is never seen unlocked.
+
+Delivery is at-least-once: a crash between the database commit and the
+segment unlink replays that segment again.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.utils.dateparse import parse_datetime
+
+from .ingest import touch_sources, write_points
+
+try:
+    import fcntl
+except ImportError:  # Windows local development: single process, no locking
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+PENDING_SUFFIX = '.new'
+OPEN_SUFFIX = '.open'
+SEALED_SUFFIX = '.log'
+# Left behind when a process dies between creating and opening a segment
+STALE_PENDING_SECONDS = 60
+
+
+def _try_lock(fd):
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+class IngestWAL:
+    """
+    Per-process appender for the write-behind ingest log.
+    """
+
+    def __init__(self, directory, segment_bytes, max_segment_age, fsync=True):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.max_segment_age = max_segment_age
+        self.fsync = fsync
+
+        self._lock = threading.Lock()
+        self._fd = None
+        self._path = None
+        self._size = 0
+        self._opened_at = 0.0
+        self._sequence = 0
+
+    def append(self, points):
+        """
+        Durably append validated points to the active segment.
+        """
+        data = ''.join(
+            json.dumps(point, cls=DjangoJSONEncoder) + '\n' for point in points
+        ).encode()
+
+        with self._lock:
+            if self._fd is None:
+                self._open_segment()
+            os.write(self._fd, data)
+            if self.fsync:
+                os.fsync(self._fd)
+            self._size += len(data)
+            if self._size >= self.segment_bytes:
+                self._seal()
+
+    def seal_if_stale(self):
+        """
+        Seal the active segment if it holds data older than the maximum age.
+        """
+        with self._lock:
+            if (
+                self._fd is not None
+                and self._size
+                and time.monotonic() - self._opened_at >= self.max_segment_age
+            ):
+                self._seal()
+
+    def _open_segment(self):
+        self._sequence += 1
+        pending = self.directory / f'{int(time.time() * 1000)}-{os.getpid()}-{self._sequence:06d}{PENDING_SUFFIX}'
+        self._fd = os.open(pending, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        self._path = pending.with_suffix(OPEN_SUFFIX)
+        os.rename(pending, self._path)
+        self._size = 0
+        self._opened_at = time.monotonic()
+
+    def _seal(self):
+        os.rename(self._path, self._path.with_suffix(SEALED_SUFFIX))
+        os.close(self._fd)
+        self._fd = None
+        self._path = None
+
+
+def _read_segment(handle, sources):
+    for line_number, line in enumerate(handle, start=1):
+        try:
+            point = json.loads(line)
+            point['timestamp'] = parse_datetime(point['timestamp'])
+        except (ValueError, KeyError, TypeError):
+            # A torn final line from a crash mid-append; nothing was acknowledged for it
+            logger.warning(f"Skipping unreadable WAL record at {handle.name}:{line_number}")
+            continue
+        sources.add(point['source'])
+        yield point
+
+
+def drain_segment(path):
+    """
+    Write one sealed segment to the database and delete it.
+
+    Returns the number of points written, or None if another flusher holds it.
+    """
+    with open(path, 'rb') as handle:
+        if not _try_lock(handle.fileno()):
+            return None
+
+        sources = set()
+        with transaction.atomic():
+            count = write_points(_read_segment(handle, sources))
+        touch_sources(sources)
+
+        os.unlink(path)
+        return count
+
+
+def recover_orphans(directory):
+    """
+    Seal ``.open`` segments whose writer process is gone and remove stale
+    ``.new`` segments, which never received a point.
+    """
+    for path in sorted(Path(directory).glob(f'*{OPEN_SUFFIX}')):
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            # Sealed by its writer meanwhile
+            continue
+        try:
+            if _try_lock(fd):
+                os.rename(path, path.with_suffix(SEALED_SUFFIX))
+                logger.info(f"Recovered unflushed WAL segment {path.name}")
+        except FileNotFoundError:
+            pass
+        finally:
+            os.close(fd)
+
+    for path in Path(directory).glob(f'*{PENDING_SUFFIX}'):
+        try:
+            if time.time() - path.stat().st_mtime >= STALE_PENDING_SECONDS:
+                path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def flush_wal(directory=None):
+    """
+    Replay orphaned segments and drain every sealed segment.
+
+    Returns the number of points written.
+    """
+    directory = Path(directory or settings.MONITORING_WAL_DIR)
+    if not directory.exists():
+        return 0
+
+    recover_orphans(directory)
+
+    total = 0
+    for path in sorted(directory.glob(f'*{SEALED_SUFFIX}')):
+        try:
+            count = drain_segment(path)
+        except FileNotFoundError:
+            continue
+        if count is not None:
+            total += count
+            logger.info(f"Flushed {count} points from WAL segment {path.name}")
+    return total
+
+
+class WALFlusher(threading.Thread):
+    """
+    Background thread that periodically seals and drains the ingest log.
+    """
+
+    def __init__(self, wal, interval):
+        super().__init__(name='monitoring-wal-flusher', daemon=True)
+        self.wal = wal
+        self.interval = interval
+
+    def run(self):
+        while True:
+            close_old_connections()
+            try:
+                self.wal.seal_if_stale()
+                flush_wal(self.wal.directory)
+            except Exception as e:
+                logger.error(f"WAL flush failed: {str(e)}")
+            time.sleep(self.interval)
+
+
+_wal = None
+_wal_pid = None
+_wal_lock = threading.Lock()
+
+
+def get_wal():
+    """
+    Return this process's ingest log, starting its flusher on first use.
+    """
+    global _wal, _wal_pid
+
+    with _wal_lock:
+        if _wal is None or _wal_pid != os.getpid():
+            _wal = IngestWAL(
+                settings.MONITORING_WAL_DIR,
+                segment_bytes=settings.MONITORING_WAL_SEGMENT_BYTES,
+                max_segment_age=settings.MONITORING_WAL_FLUSH_INTERVAL,
+                fsync=settings.MONITORING_WAL_FSYNC,
+            )
+            _wal_pid = os.getpid()
+            WALFlusher(_wal, settings.MONITORING_WAL_FLUSH_INTERVAL).start()
+        return _wal
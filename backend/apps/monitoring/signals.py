@@ -0,0 +1,27 @@
+"""
+Signals sent by the monitoring ingest pipeline.
+"""
+
+import time
+
+from django.conf import settings
+from django.dispatch import Signal, receiver
+
+# Sent once per committed ingest batch with ``metric_names`` and ``sources``
+# (sets of the names present in the batch) and ``oldest``, the epoch seconds
+# of its earliest point.
+points_ingested = Signal()
+
+
+@receiver(points_ingested)
+def invalidate_cached_responses(sender, metric_names, sources, oldest=None, **kwargs):
+    """
+    Mark cached read responses that depend on the ingested data as stale.
+    """
+    from .services.response_cache import bump_versions, metric_scope, sealed_scope
+
+    scopes = ['global', 'sources'] + [metric_scope(name) for name in metric_names]
+    # Late points land in chunks that the timeseries chunk cache keeps as final
+    if oldest is None or oldest < time.time() - settings.METRICS_CHUNK_SEAL_SECONDS:
+        scopes += [sealed_scope(name) for name in metric_names]
+    bump_versions(scopes)
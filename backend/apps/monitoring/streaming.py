@@ -0,0 +1,82 @@
+"""
+Streamed JSON responses for large monitoring result sets.
+
+Rows are read from a server-side cursor in chunks and written out as they
+arrive, so memory stays constant and the first bytes leave before the query
+has finished. The document has the same shape as the buffered response: the
+rows are written under ``rows_key`` and the ``count`` comes last.
+"""
+
+import json
+from itertools import islice
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+from .pagination import CURSOR_ID
+
+STREAM_CHUNK_SIZE = 2000
+
+
+def _dumps(value):
+    return json.dumps(value, cls=JSONEncoder, ensure_ascii=False)
+
+
+def _encode_chunk(rows, first):
+    for row in rows:
+        if isinstance(row, dict):
+            row.pop(CURSOR_ID, None)
+    body = _dumps(rows)[1:-1]
+    return body if first else ',' + body
+
+
+def _document_head(fields, rows_key):
+    head = _dumps(fields)
+    return (head[:-1] + ',' if fields else '{') + f'{_dumps(rows_key)}:['
+
+
+def _sync_stream(queryset, fields, rows_key, chunk_size):
+    yield _document_head(fields, rows_key)
+    rows = queryset.iterator(chunk_size=chunk_size)
+    count = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        yield _encode_chunk(chunk, count == 0)
+        count += len(chunk)
+    yield f'],"count":{count}}}'
+
+
+async def _async_stream(queryset, fields, rows_key, chunk_size):
+    yield _document_head(fields, rows_key)
+    chunk = []
+    count = 0
+    async for row in queryset.aiterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield _encode_chunk(chunk, count == 0)
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        yield _encode_chunk(chunk, count == 0)
+        count += len(chunk)
+    yield f'],"count":{count}}}'
+
+
+def stream_json(request, queryset, fields=None, rows_key='data', chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Stream ``{**fields, rows_key: [...], "count": n}`` for a ``values()`` queryset.
+
+    Under ASGI the rows are fetched through the async ORM so the event loop
+    is not blocked; under WSGI a plain server-side cursor iterator is used.
+    """
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        content = _async_stream(queryset, fields or {}, rows_key, chunk_size)
+    else:
+        content = _sync_stream(queryset, fields or {}, rows_key, chunk_size)
+
+    response = StreamingHttpResponse(content, content_type='application/json')
+    response['X-Accel-Buffering'] = 'no'
+    return response
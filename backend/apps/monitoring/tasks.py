@@ -0,0 +1,54 @@
+"""
+Background tasks for monitoring data maintenance.
+"""
+
+import logging
+
+from quantum.celery import app as celery_app
+
+from .services.compaction import compact_cold_data
+from .services.counters import compact_counters
+from .services.heavy_hitters import expire_heavy_hitters
+from .services.partitions import maintain_partitions
+from .services.rollups import expire_rollups
+from .services.sketches import expire_sketches
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task
+def maintain_partitions_task():
+    """
+    Pre-create upcoming monitoring_data partitions and drop expired ones.
+    """
+    result = maintain_partitions()
+    if result['created'] or result['dropped']:
+        logger.info(
+            f"Partition maintenance created {len(result['created'])} "
+            f"and dropped {len(result['dropped'])} partitions"
+        )
+    return result
+
+
+@celery_app.task
+def expire_rollups_task():
+    """
+    Delete rollup, sketch and top metric buckets past their retention.
+    """
+    return expire_rollups() + expire_sketches() + expire_heavy_hitters()
+
+
+@celery_app.task
+def compact_counters_task():
+    """
+    Fold minute point counters past their retention into the base counter.
+    """
+    return compact_counters()
+
+
+@celery_app.task
+def compact_cold_data_task():
+    """
+    Move cold raw points into compressed per-series chunks.
+    """
+    return compact_cold_data()
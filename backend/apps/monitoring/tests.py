@@ -0,0 +1,32 @@
+"""
+Tests for the monitoring app.
+"""
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from .services.validation import validate_points
+
+
+class ValidatePointsTests(SimpleTestCase):
+
+    def point(self, timestamp):
+        return {'timestamp': timestamp, 'source': 'web-1', 'metric_name': 'cpu_usage', 'metric_value': 1.5}
+
+    def test_mixed_batch_with_over_long_timestamps(self):
+        """
+        Timestamps too long for the column-wise parser are validated one by
+        one instead of breaking the rest of the batch.
+        """
+        batch, errors = validate_points([
+            self.point('2024-01-02T03:04:05Z'),
+            self.point('2024-01-02T03:04:05.000000000+00:00'),
+            self.point('2024-01-02T03:04:05+00:00 and then some text'),
+        ])
+
+        self.assertEqual(errors[0], {})
+        self.assertEqual(errors[1], {})
+        self.assertIn('timestamp', errors[2])
+        np.testing.assert_array_equal(
+            batch.timestamps, np.array(['2024-01-02T03:04:05', '2024-01-02T03:04:05'], dtype='datetime64[us]')
+        )
@@ -4,18 +4,32 @@ API views for monitoring endpoints.
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
+from django.conf import settings
+from django.db.models import F, Q
 from django.utils import timezone
-from django.db.models import Q
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
 
+from .export import FORMATS as EXPORT_FORMATS, stream_export
 from .models import MonitoringData, MonitoringSource
+from .pagination import keyset_page, keyset_queryset
+from .parsers import NDJSONParser
 from .serializers import (
     MonitoringDataSerializer,
     MonitoringDataCreateSerializer,
     MonitoringSourceSerializer
 )
+from .services.chunks import compacted_until, require_raw
+from .services.heartbeat import heartbeat
+from .services.ingest import stream_ingest, touch_sources, write_batch, write_point
+from .services.response_cache import cached
+from .services.tags import parse_tag_filters, tag_condition
+from .services.validation import validate_points
+from .services.wal import get_wal
+from .streaming import stream_json
 from apps.authentication.permissions import CanIngestData, IsViewer, IsDeveloper
 
 logger = logging.getLogger(__name__)
@@ -26,10 +40,15 @@ class MonitoringViewSet(viewsets.ModelViewSet):
     API endpoints for monitoring data ingestion and retrieval.
     
     Permissions:
-    - GET (list, retrieve, query): Requires Viewer role or above
+    - GET (list, retrieve, query, export): Requires Viewer role or above
     - POST (create, batch_ingest): Requires Developer role or above
+    
+    List and query page through raw rows, so they do not include points
+    compacted into chunks: query refuses a ``start_time`` before the newest
+    chunk, and open-ended responses carry that time as ``X-Compacted-Before``.
+    Export includes compacted points.
     """
-    queryset = MonitoringData.objects.all()
+    queryset = MonitoringData.objects.select_related('series').order_by('-timestamp')
     serializer_class = MonitoringDataSerializer
     permission_classes = [CanIngestData]
     
@@ -37,29 +56,58 @@ class MonitoringViewSet(viewsets.ModelViewSet):
         """
         Override to set different permissions for different actions.
         """
-        if self.action in ['list', 'retrieve', 'query', 'sources']:
+        if self.action in ['list', 'retrieve', 'query', 'export', 'sources']:
             return [IsViewer()]
         return [IsDeveloper()]
     
+    def list(self, request, *args, **kwargs):
+        """
+        List monitoring data, newest first.
+        """
+        return self._flag_compacted(super().list(request, *args, **kwargs))
+    
+    def _flag_compacted(self, response):
+        """
+        Tell clients of raw-row reads before which time points may be missing.
+        """
+        boundary = compacted_until()
+        if boundary is not None:
+            response['X-Compacted-Before'] = boundary.isoformat()
+        return response
+    
     def create(self, request):
         """
         Ingest single monitoring data point.
         
         POST /api/v1/monitoring/ingest
+        
+        With MONITORING_WRITE_BEHIND enabled the point is appended to the
+        local ingest log and acknowledged with 202 before it reaches Postgres.
         """
         serializer = MonitoringDataCreateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
+        if settings.MONITORING_WRITE_BEHIND:
+            # Acknowledge once durable in the local log; the flusher writes it to Postgres
+            get_wal().append([serializer.validated_data])
+            
+            return Response(
+                {
+                    'status': 'accepted',
+                    'message': 'Monitoring data queued for ingestion',
+                    'timestamp': serializer.validated_data['timestamp']
+                },
+                status=status.HTTP_202_ACCEPTED
+            )
+        
         # Create monitoring data
-        data = MonitoringData.objects.create(**serializer.validated_data)
+        validated = serializer.validated_data
+        data = write_point(validated)
         
         # Update source last_seen
-        MonitoringSource.objects.update_or_create(
-            name=data.source,
-            defaults={'last_seen': timezone.now()}
-        )
+        touch_sources([validated['source']])
         
-        logger.info(f"Ingested monitoring data: {data.source} - {data.metric_name}")
+        logger.info(f"Ingested monitoring data: {validated['source']} - {validated['metric_name']}")
         
         return Response(
             {
@@ -71,87 +119,195 @@ class MonitoringViewSet(viewsets.ModelViewSet):
             status=status.HTTP_201_CREATED
         )
     
-    @action(detail=False, methods=['post'], permission_classes=[IsDeveloper])
+    @action(
+        detail=False,
+        methods=['post'],
+        permission_classes=[IsDeveloper],
+        parser_classes=[JSONParser, NDJSONParser]
+    )
     def batch_ingest(self, request):
         """
         Ingest multiple monitoring data points in batch.
         
         POST /api/v1/monitoring/batch-ingest
+        
+        Accepts either a JSON array, or newline-delimited JSON
+        (Content-Type: application/x-ndjson, optionally Content-Encoding: gzip)
+        which is validated and written in bounded chunks.
         """
+        if request.content_type.split(';')[0].strip() == NDJSONParser.media_type:
+            return self._stream_ingest(request)
+        
         if not isinstance(request.data, list):
             return Response(
                 {'error': 'Expected a list of monitoring data'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        serializer = MonitoringDataCreateSerializer(data=request.data, many=True)
-        serializer.is_valid(raise_exception=True)
+        # Columnar validation; same rules and error shape as the serializer with many=True
+        batch, errors = validate_points(request.data)
+        if any(errors):
+            raise ValidationError(errors)
         
         # Bulk create monitoring data
-        monitoring_data = [
-            MonitoringData(**item)
-            for item in serializer.validated_data
-        ]
-        created = MonitoringData.objects.bulk_create(monitoring_data)
+        count = write_batch(batch)
         
         # Update sources
-        sources = set(item['source'] for item in serializer.validated_data)
-        for source_name in sources:
-            MonitoringSource.objects.update_or_create(
-                name=source_name,
-                defaults={'last_seen': timezone.now()}
-            )
+        touch_sources(set(batch.sources))
         
-        logger.info(f"Batch ingested {len(created)} monitoring data points")
+        logger.info(f"Batch ingested {count} monitoring data points")
         
         return Response(
             {
                 'status': 'success',
-                'message': f'Ingested {len(created)} monitoring data points',
-                'count': len(created)
+                'message': f'Ingested {count} monitoring data points',
+                'count': count
             },
             status=status.HTTP_201_CREATED
         )
     
+    def _stream_ingest(self, request):
+        """
+        Ingest an NDJSON body chunk by chunk, reporting per-chunk results.
+        """
+        try:
+            chunks = stream_ingest(request.data)
+        except (OSError, EOFError) as e:
+            logger.warning(f"Aborted NDJSON ingest: {str(e)}")
+            return Response(
+                {'error': f'Could not read request body: {str(e)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        accepted = sum(chunk['accepted'] for chunk in chunks)
+        rejected = sum(chunk['rejected'] for chunk in chunks)
+        
+        logger.info(f"Stream ingested {accepted} monitoring data points ({rejected} rejected)")
+        
+        return Response(
+            {
+                'status': 'success' if not rejected else 'partial',
+                'message': f'Ingested {accepted} monitoring data points',
+                'count': accepted,
+                'rejected': rejected,
+                'chunks': chunks
+            },
+            status=status.HTTP_201_CREATED if accepted or not rejected else status.HTTP_400_BAD_REQUEST
+        )
+    
     @action(detail=False, methods=['get'], permission_classes=[IsViewer])
     def query(self, request):
         """
         Query monitoring data with filters.
         
-        GET /api/v1/monitoring/query?source=&metric_name=&start_time=&end_time=&limit=100
+        GET /api/v1/monitoring/query?source=&metric_name=&tag=env=prod&tag=region=eu,us&start_time=&end_time=&limit=100&cursor=
+        
+        ``tag`` may be repeated: ``key=value``, ``key=v1,v2`` (any of) or
+        ``key!=value`` (excluded); all of them must hold.
+        
+        Rows are returned newest first and paginated by (timestamp, id):
+        pass ``next_cursor`` back as ``cursor`` to fetch the next page.
+        With ``stream=true`` every matching row from the cursor onwards is
+        streamed in chunks instead.
+        
+        Points compacted into chunks are not included; a ``start_time``
+        before the newest chunk is rejected.
         """
-        source = request.query_params.get('source')
-        metric_name = request.query_params.get('metric_name')
-        start_time = request.query_params.get('start_time')
-        end_time = request.query_params.get('end_time')
         limit = int(request.query_params.get('limit', 100))
+        cursor = request.query_params.get('cursor')
         
-        # Build query
-        queryset = self.get_queryset()
+        try:
+            condition, start, end = self._filters(request.query_params)
+            queryset = self.get_queryset().filter(condition)
+            if start is not None:
+                require_raw(start)
+                queryset = queryset.filter(timestamp__gte=start)
+            if end is not None:
+                queryset = queryset.filter(timestamp__lt=end)
+            queryset = keyset_queryset(queryset, cursor, descending=True)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if request.query_params.get('stream') == 'true':
+            response = stream_json(request, queryset.values(
+                'id', 'timestamp', 'metric_value',
+                source=F('series__source'),
+                metric_name=F('series__metric_name'),
+                tags=F('series__tags')
+            ))
+        else:
+            # Fetch one page
+            data_points, next_cursor = keyset_page(queryset, limit)
+            
+            serializer = self.get_serializer(data_points, many=True)
+            
+            response = Response({
+                'data': serializer.data,
+                'count': len(serializer.data),
+                'next_cursor': next_cursor
+            })
+        return response if start is not None else self._flag_compacted(response)
+    
+    def _filters(self, params):
+        """
+        Parse the source, metric_name, tag, start_time and end_time filters
+        into a series condition and a ``[start, end)`` range (either end may
+        be None; ``end_time`` itself is inclusive).
         
-        if source:
-            queryset = queryset.filter(source=source)
+        Raises ValueError for a malformed tag filter or timestamp.
+        """
+        condition = Q()
         
-        if metric_name:
-            queryset = queryset.filter(metric_name=metric_name)
+        if params.get('source'):
+            condition &= Q(series__source=params['source'])
         
-        if start_time:
-            start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-            queryset = queryset.filter(timestamp__gte=start_dt)
+        if params.get('metric_name'):
+            condition &= Q(series__metric_name=params['metric_name'])
         
-        if end_time:
-            end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-            queryset = queryset.filter(timestamp__lte=end_dt)
+        tags = parse_tag_filters(params.getlist('tag'))
+        if tags:
+            condition &= tag_condition(tags)
         
-        # Limit results
-        queryset = queryset[:limit]
+        start = end = None
+        if params.get('start_time'):
+            start = self._parse_time(params['start_time'])
         
-        serializer = self.get_serializer(queryset, many=True)
+        if params.get('end_time'):
+            end = self._parse_time(params['end_time']) + timedelta(microseconds=1)
         
-        return Response({
-            'data': serializer.data,
-            'count': len(serializer.data)
-        })
+        return condition, start, end
+    
+    def _parse_time(self, value):
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsViewer])
+    def export(self, request):
+        """
+        Bulk export of monitoring data in a columnar format.
+        
+        GET /api/v1/monitoring/export?output=arrow|parquet&source=&metric_name=&tag=&start_time=&end_time=
+        
+        Every matching row is streamed oldest first, as an Arrow IPC stream
+        (default) or a zstd-compressed Parquet file, with dictionary-encoded
+        source, metric_name and tags (JSON) columns. Rows are read from a
+        server-side cursor in record batches, and points compacted into
+        chunks one chunk window at a time, so memory stays bounded.
+        """
+        output = request.query_params.get('output', 'arrow')
+        if output not in EXPORT_FORMATS:
+            return Response(
+                {'error': f"output must be one of: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            condition, start, end = self._filters(request.query_params)
+            return stream_export(request, condition, output, start=start, end=end)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except RuntimeError as e:
+            return Response({'error': str(e)}, status=status.HTTP_501_NOT_IMPLEMENTED)
     
     @action(detail=False, methods=['get'], permission_classes=[IsViewer])
     def sources(self, request):
@@ -159,10 +315,25 @@ class MonitoringViewSet(viewsets.ModelViewSet):
         Get list of monitoring sources.
         
         GET /api/v1/monitoring/sources
-        """
-        sources = MonitoringSource.objects.filter(is_active=True)
-        serializer = MonitoringSourceSerializer(sources, many=True)
         
+        Cached; ingest marks the list stale so last_seen catches up within
+        one background recompute.
+        """
         return Response({
-            'sources': serializer.data
+            'sources': cached('sources', ['sources'], self._sources_data)
         })
+    
+    def _sources_data(self):
+        """
+        Compute the active source list (uncached).
+        """
+        sources = list(MonitoringSource.objects.filter(is_active=True))
+        
+        # Overlay heartbeats that have not been flushed to the database yet
+        latest = heartbeat.latest(source.name for source in sources)
+        for source in sources:
+            seen_at = latest.get(source.name)
+            if seen_at and (source.last_seen is None or seen_at > source.last_seen):
+                source.last_seen = seen_at
+        
+        return list(MonitoringSourceSerializer(sources, many=True).data)
@@ -15,6 +15,12 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quantum.settings')
 django_asgi_app = get_asgi_application()
 
 import apps.realtime.routing
+from django.conf import settings
+
+if settings.MONITORING_WRITE_BEHIND:
+    # Start the flusher at boot so segments left by a previous run are replayed
+    from apps.monitoring.services.wal import get_wal
+    get_wal()
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
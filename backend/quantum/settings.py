@@ -130,7 +130,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 100,
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'apps.monitoring.renderers.ORJSONRenderer',
+        'apps.monitoring.renderers.MessagePackRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
@@ -200,10 +201,105 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'maintain-monitoring-partitions': {
+        'task': 'apps.monitoring.tasks.maintain_partitions_task',
+        'schedule': 3600.0,
+    },
+    'expire-monitoring-rollups': {
+        'task': 'apps.monitoring.tasks.expire_rollups_task',
+        'schedule': 3600.0,
+    },
+    'compact-monitoring-counters': {
+        'task': 'apps.monitoring.tasks.compact_counters_task',
+        'schedule': 3600.0,
+    },
+    'compact-monitoring-data': {
+        'task': 'apps.monitoring.tasks.compact_cold_data_task',
+        'schedule': 3600.0,
+    },
+}
 
 # ML Service Configuration
 ML_SERVICE_URL = os.environ.get('ML_SERVICE_URL', 'http://ml-service:8001')
 
+# Monitoring Ingest Configuration
+MONITORING_INGEST_CHUNK_SIZE = int(os.environ.get('MONITORING_INGEST_CHUNK_SIZE', '5000'))
+MONITORING_INGEST_MAX_REPORTED_ERRORS = int(os.environ.get('MONITORING_INGEST_MAX_REPORTED_ERRORS', '20'))
+MONITORING_COPY_BATCH_SIZE = int(os.environ.get('MONITORING_COPY_BATCH_SIZE', '50000'))
+MONITORING_SERIES_CACHE_SIZE = int(os.environ.get('MONITORING_SERIES_CACHE_SIZE', '100000'))
+MONITORING_EXPORT_BATCH_ROWS = int(os.environ.get('MONITORING_EXPORT_BATCH_ROWS', '65536'))  # rows per Arrow batch / Parquet row group
+
+# monitoring_data is range-partitioned by timestamp; retention drops whole partitions
+MONITORING_PARTITION_DAYS = int(os.environ.get('MONITORING_PARTITION_DAYS', '1'))
+MONITORING_PARTITION_PREMAKE_DAYS = int(os.environ.get('MONITORING_PARTITION_PREMAKE_DAYS', '7'))
+MONITORING_RAW_RETENTION_DAYS = int(os.environ.get('MONITORING_RAW_RETENTION_DAYS', '0'))  # 0 keeps data forever
+
+# Cold raw points are compacted into Gorilla-encoded chunks of one series per window.
+# Off by default: the monitoring list/query endpoints and paged or streamed timeseries
+# page through raw rows only, and refuse or flag ranges reaching back into the chunks.
+MONITORING_COMPACT_AFTER_DAYS = int(os.environ.get('MONITORING_COMPACT_AFTER_DAYS', '0'))  # 0 disables compaction
+MONITORING_CHUNK_SECONDS = int(os.environ.get('MONITORING_CHUNK_SECONDS', '7200'))
+
+# Rollup tiers (resolution in seconds -> retention in days, 0 keeps forever)
+MONITORING_ROLLUP_RETENTION_DAYS = {
+    60: int(os.environ.get('MONITORING_ROLLUP_1M_RETENTION_DAYS', '30')),
+    3600: int(os.environ.get('MONITORING_ROLLUP_1H_RETENTION_DAYS', '400')),
+    86400: int(os.environ.get('MONITORING_ROLLUP_1D_RETENTION_DAYS', '0')),
+}
+
+# Hourly top-K summaries of metric names by volume (SpaceSaving counters per hour)
+MONITORING_TOP_METRICS_CAPACITY = int(os.environ.get('MONITORING_TOP_METRICS_CAPACITY', '200'))
+MONITORING_TOP_METRICS_RETENTION_DAYS = int(os.environ.get('MONITORING_TOP_METRICS_RETENTION_DAYS', '30'))
+MONITORING_TOP_METRICS_FLUSH_INTERVAL = float(os.environ.get('MONITORING_TOP_METRICS_FLUSH_INTERVAL', '10'))  # seconds between all-sources summary writes
+
+# Per-minute point counters are kept this long, then folded into one base counter
+MONITORING_COUNTER_MINUTE_RETENTION_HOURS = int(os.environ.get('MONITORING_COUNTER_MINUTE_RETENTION_HOURS', '48'))
+
+# Write-behind ingest: acknowledge single points once they are in the local log
+MONITORING_WRITE_BEHIND = os.environ.get('MONITORING_WRITE_BEHIND', 'False') == 'True'
+MONITORING_WAL_DIR = os.environ.get('MONITORING_WAL_DIR', str(BASE_DIR / 'var' / 'ingest-wal'))
+MONITORING_WAL_SEGMENT_BYTES = int(os.environ.get('MONITORING_WAL_SEGMENT_BYTES', str(16 * 1024 * 1024)))
+MONITORING_WAL_FLUSH_INTERVAL = float(os.environ.get('MONITORING_WAL_FLUSH_INTERVAL', '2'))
+MONITORING_WAL_FSYNC = os.environ.get('MONITORING_WAL_FSYNC', 'True') == 'True'
+
+# Source last_seen updates are coalesced and flushed on an interval (seconds)
+MONITORING_HEARTBEAT_FLUSH_INTERVAL = float(os.environ.get('MONITORING_HEARTBEAT_FLUSH_INTERVAL', '10'))
+MONITORING_HEARTBEAT_PUBLISH_INTERVAL = float(os.environ.get('MONITORING_HEARTBEAT_PUBLISH_INTERVAL', '1'))
+MONITORING_HEARTBEAT_CACHE_TIMEOUT = int(os.environ.get('MONITORING_HEARTBEAT_CACHE_TIMEOUT', '86400'))
+
+# Kafka ingest consumer (manage.py consume_monitoring); "memory" uses the in-process broker
+KAFKA_BOOTSTRAP_SERVERS = os.environ.get('KAFKA_BOOTSTRAP_SERVERS', 'kafka:9092')
+MONITORING_KAFKA_BROKER = os.environ.get('MONITORING_KAFKA_BROKER', 'kafka')
+MONITORING_KAFKA_TOPICS = os.environ.get('MONITORING_KAFKA_TOPICS', 'monitoring.metrics').split(',')
+MONITORING_KAFKA_GROUP_ID = os.environ.get('MONITORING_KAFKA_GROUP_ID', 'quantum-monitoring-ingest')
+MONITORING_KAFKA_BATCH_SIZE = int(os.environ.get('MONITORING_KAFKA_BATCH_SIZE', '5000'))
+MONITORING_KAFKA_BATCH_TIMEOUT = float(os.environ.get('MONITORING_KAFKA_BATCH_TIMEOUT', '1'))
+MONITORING_KAFKA_MAX_RETRIES = int(os.environ.get('MONITORING_KAFKA_MAX_RETRIES', '5'))
+MONITORING_KAFKA_RETRY_BACKOFF = float(os.environ.get('MONITORING_KAFKA_RETRY_BACKOFF', '0.5'))
+
+# Metrics API
+METRICS_BATCH_MAX_SERIES = int(os.environ.get('METRICS_BATCH_MAX_SERIES', '50'))
+METRICS_MAX_BUCKETS = int(os.environ.get('METRICS_MAX_BUCKETS', '10000'))
+
+# Query language (metrics/query): cost limits checked before a query runs
+METRICS_QUERY_MAX_SERIES = int(os.environ.get('METRICS_QUERY_MAX_SERIES', '10000'))
+METRICS_QUERY_MAX_ROWS = int(os.environ.get('METRICS_QUERY_MAX_ROWS', '5000000'))
+METRICS_QUERY_LOOKBACK = int(os.environ.get('METRICS_QUERY_LOOKBACK', '300'))  # seconds an instant selector looks back
+
+# Async metrics views: independent queries run concurrently on a worker pool
+METRICS_QUERY_WORKERS = int(os.environ.get('METRICS_QUERY_WORKERS', '16'))
+METRICS_QUERY_TIMEOUT = float(os.environ.get('METRICS_QUERY_TIMEOUT', '10'))  # seconds per query, 0 disables
+
+# Read endpoint cache: fresh for TTL seconds, then served stale while one worker recomputes
+METRICS_CACHE_TTL = float(os.environ.get('METRICS_CACHE_TTL', '10'))
+METRICS_CACHE_STALE_TTL = float(os.environ.get('METRICS_CACHE_STALE_TTL', '60'))
+METRICS_CACHE_LOCK_TIMEOUT = int(os.environ.get('METRICS_CACHE_LOCK_TIMEOUT', '30'))
+
+# Timeseries chunk cache: chunks ending this many seconds ago are final and cached
+METRICS_CHUNK_SEAL_SECONDS = int(os.environ.get('METRICS_CHUNK_SEAL_SECONDS', '120'))
+METRICS_CHUNK_CACHE_TTL = int(os.environ.get('METRICS_CHUNK_CACHE_TTL', '86400'))
+
 # Logging Configuration
 LOGGING = {
     'version': 1,
@@ -9,3 +9,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quantum.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings
+
+if settings.MONITORING_WRITE_BEHIND:
+    # Start the flusher at boot so segments left by a previous run are replayed
+    from apps.monitoring.services.wal import get_wal
+    get_wal()